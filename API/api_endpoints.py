@@ -1,19 +1,21 @@
-from fastapi import FastAPI, Query
+import math
+from fastapi import FastAPI, Query, Request, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import List, Optional
-from pydantic import BaseModel
-from serpapi import GoogleSearch
-from langchain_community.document_loaders import ScrapingAntLoader
-import dotenv
-import os
+from pydantic import BaseModel, ConfigDict
+import providers
+import metrics
+from fare_matrix import matrix_cells, fare_matrix, matrix_events
+from resilience import ProviderError, ProviderUnavailable, quota_report
 
 
-dotenv.load_dotenv()
-serp_api = os.getenv("SERP_API_KEY")
-ant_scrap = os.getenv("ANT_SCRAPY_API_KEY")
-
 app = FastAPI()
+metrics.instrument(app)
 
 class HotelRequest(BaseModel):
+    # Unknown fields get a 422 instead of being dropped; "page" was replaced by max_pages
+    model_config = ConfigDict(extra="forbid")
+
     stay_city_and_type: str
     check_in_date: str
     check_out_date: str
@@ -22,113 +24,92 @@ class HotelRequest(BaseModel):
     max_price: int
     num_children: int = 0
     children_ages: List[int] = [0]
-    page: int = 3
+    max_pages: int = 3
 
 @app.get("/flights")
 def get_flight_details(from_location_ID: str, to_location_ID: str, departure_date: str):
-    params = {
-        "engine": "google_flights",
-        "hl": "en",
-        "gl": "us",
-        "departure_id": from_location_ID,
-        "arrival_id": to_location_ID,
-        "outbound_date": departure_date,
-        "currency": "INR",
-        "type": 2,
-        "api_key": serp_api,
-    }
-    search = GoogleSearch(params)
-    results = search.get_dict()
-    return results
+    return providers.get_flights(from_location_ID, to_location_ID, departure_date)
+
+@app.get("/flights/matrix")
+def get_fare_matrix(origins: List[str] = Query(...), destinations: List[str] = Query(...),
+                    start_date: str = Query(...), end_date: Optional[str] = None):
+    """Cheapest flight per route and date; origins and destinations are airport codes or cities"""
+    return fare_matrix(matrix_request(origins, destinations, start_date, end_date))
+
+@app.get("/flights/matrix/stream")
+def stream_fare_matrix(origins: List[str] = Query(...), destinations: List[str] = Query(...),
+                       start_date: str = Query(...), end_date: Optional[str] = None):
+    """The fare matrix as server-sent events, one per cell as it completes"""
+    return StreamingResponse(
+        matrix_events(matrix_request(origins, destinations, start_date, end_date)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def matrix_request(origins, destinations, start_date, end_date):
+    try:
+        return matrix_cells(origins, destinations, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 @app.post("/hotels")
 def get_hotel_details(request: HotelRequest):
-    all_properties = []
-    for _ in range(3):
-        params = {
-            "engine": "google_hotels",
-            "hl": "en",
-            "gl": "us",
-            "q": request.stay_city_and_type,
-            "check_in_date": request.check_in_date,
-            "check_out_date": request.check_out_date,
-            "adults": request.num_adults,
-            "children": request.num_children,
-            "children_ages": request.children_ages,
-            "min_price": request.min_price,
-            "max_price": request.max_price,
-            "currency": "INR",
-            "api_key": serp_api,
-            "start": request.page * 10,
-        }
-        search = GoogleSearch(params)
-        results = search.get_dict()
-        properties = results.get("properties", [])
-        if not properties:
-            break
-        all_properties.extend(properties)
-    return all_properties
+    hotels = providers.get_hotels(**request.model_dump())
+    # Store queries should find hotels users already searched live
+    providers.store_hotel_offers(request.stay_city_and_type, request.check_in_date, request.check_out_date,
+                                 request.num_adults, request.num_children, hotels,
+                                 complete=not request.min_price and not request.max_price and request.max_pages >= 3)
+    return hotels
 
 @app.get("/activities")
 def get_local_activities(activity_query: str, destination_city: str, num_pages: int = 3):
-    all_places = []
-    for page in range(num_pages):
-        params = {
-            "api_key": serp_api,
-            "engine": "google_local",
-            "google_domain": "google.com",
-            "q": f"{activity_query} in {destination_city}",
-            "hl": "en",
-            "gl": "us",
-            "start": page * 20,
-        }
-        search = GoogleSearch(params)
-        results = search.get_dict()
-        places = results.get("local_results", [])
-        if not places:
-            break
-        all_places.extend(places)
-    return all_places
+    return providers.get_activities(activity_query, destination_city, num_pages)
 
 @app.get("/tourist-places")
 def get_tourist_places(place_type: str, destination_city: str, num_pages: int = 3):
-    all_places = []
-    for page in range(num_pages):
-        params = {
-            "api_key": serp_api,
-            "engine": "google_local",
-            "google_domain": "google.com",
-            "q": f"{place_type} in {destination_city}",
-            "hl": "en",
-            "gl": "us",
-            "start": page * 20,
-        }
-        search = GoogleSearch(params)
-        results = search.get_dict()
-        places = results.get("local_results", [])
-        if not places:
-            break
-        all_places.extend(places)
-    return all_places
+    return providers.get_tourist_places(place_type, destination_city, num_pages)
 
 @app.get("/train-details")
 def get_train_details(departure_code: str, departure_name: str,
                       destination_code: str, destination_name: str,
-                      journey_date: str):
-    base_url = (
-        "https://www.railyatri.in/trains-between-stations-v2"
-        f"?from_code={departure_code}"
-        f"&from_name={departure_name.upper().replace(' ', '%20')}"
-        f"&to_code={destination_code}"
-        f"&to_name={destination_name.upper().replace(' ', '%20')}"
-        f"&journey_date={journey_date}"
-        f"&user_id=-1743734480&user_token=&device_type_id=6"
-        f"&src=ttb_landing&from_sta_code={departure_code}&to_sta_code={destination_code}"
-    )
-    loader = ScrapingAntLoader(
-        [base_url],
-        api_key=ant_scrap,
-        continue_on_failure=True
-    )
-    docs = loader.load()
-    return {"page_content": docs[0].page_content if docs else ""}
+                      journey_date: str, availability: bool = False):
+    return providers.get_trains(departure_code, departure_name, destination_code,
+                                destination_name, journey_date, availability)
+
+@app.get("/hotels/search")
+def search_hotels(city: str, check_in_date: str, check_out_date: str, num_adults: int = 2,
+                  num_children: int = 0, children_ages: List[int] = Query([0]),
+                  min_price: Optional[float] = None, max_price: Optional[float] = None,
+                  min_rating: Optional[float] = None, sort: str = "price", limit: int = Query(10, ge=1, le=100),
+                  lat: Optional[float] = None, lon: Optional[float] = None, radius_km: Optional[float] = None):
+    """Hotels from the local offer store; the provider is only called when the stay was not searched or expired"""
+    try:
+        return providers.search_hotels(city, check_in_date, check_out_date, num_adults, num_children,
+                                       children_ages, min_price, max_price, min_rating, sort, limit,
+                                       lat, lon, radius_km)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/places/search")
+def search_places(city: str, category: str = "tourist attractions", max_price_level: Optional[int] = None,
+                  min_rating: Optional[float] = None, sort: str = "rating", limit: int = Query(10, ge=1, le=100),
+                  lat: Optional[float] = None, lon: Optional[float] = None, radius_km: Optional[float] = None):
+    """Places such as restaurants or tourist attractions from the local offer store"""
+    try:
+        return providers.search_places(city, category, max_price_level, min_rating, sort, limit,
+                                       lat, lon, radius_km)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.exception_handler(ProviderError)
+def provider_error_handler(request: Request, exc: ProviderError):
+    # Refused locally (circuit open, rate limit, quota) -> 503; upstream failed -> 502
+    if isinstance(exc, ProviderUnavailable):
+        headers = {"Retry-After": str(math.ceil(exc.retry_after))} if exc.retry_after else None
+        return JSONResponse(status_code=503, content={"detail": str(exc)}, headers=headers)
+    return JSONResponse(status_code=502, content={"detail": str(exc)})
+
+@app.get("/quota")
+def get_quota():
+    """Upstream calls this month, circuit state and guard counters per provider"""
+    return quota_report()
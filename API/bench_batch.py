@@ -0,0 +1,109 @@
+"""Benchmark /generate-itinerary/batch against one /generate-itinerary call per request.
+
+Uses the bench_e2e provider stub (recorded payloads), fake LLM and uvicorn
+setup. Takes requests from the itinerary request log, repeating a few so the
+batch has identical items, sends them one call at a time as a client does
+today, then as one batch call. Reports wall time, provider calls and LLM
+calls for each, and for the batch the time to the first and last NDJSON line,
+which shows results arrive as they finish rather than at the end.
+
+Run from the API directory:
+    python bench_batch.py [--requests 12] [--duplicates 4] [--fake-models]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from bench_e2e import FakeLLM, ITINERARY, ProviderStub, isolate, itinerary_requests, start_app, start_stub
+
+
+class CountingLLM(FakeLLM):
+    calls = 0
+
+    def invoke(self, prompt):
+        type(self).calls += 1
+        return super().invoke(prompt)
+
+    async def ainvoke(self, prompt):
+        type(self).calls += 1
+        return await super().ainvoke(prompt)
+
+
+async def one_by_one(client, bodies):
+    start = time.perf_counter()
+    errors = 0
+    for body in bodies:
+        response = await client.post("/generate-itinerary", json=body)
+        errors += response.status_code >= 400
+    return time.perf_counter() - start, errors
+
+
+async def batch(client, bodies):
+    start, first, lines = time.perf_counter(), None, []
+    async with client.stream("POST", "/generate-itinerary/batch", json={"requests": bodies}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.strip():
+                first = first or time.perf_counter() - start
+                lines.append(json.loads(line))
+    return time.perf_counter() - start, first, lines
+
+
+async def run(base_url, bodies):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        ProviderStub.hits, CountingLLM.calls = 0, 0
+        elapsed, errors = await one_by_one(client, bodies)
+        print(f"One by one: {elapsed:.2f}s, {ProviderStub.hits} provider calls, {CountingLLM.calls} LLM calls, "
+              f"{errors} errors")
+
+        ProviderStub.hits, CountingLLM.calls = 0, 0
+        elapsed, first, lines = await batch(client, bodies)
+        summary, results = lines[-1], lines[:-1]
+        print(f"Batch:      {elapsed:.2f}s, {ProviderStub.hits} provider calls, {CountingLLM.calls} LLM calls, "
+              f"{summary['failed']} errors; first line after {first:.2f}s")
+        print(f"            {summary['itineraries']} itineraries for {summary['items']} requests, "
+              f"{summary['trips_fetched']} trips fetched")
+        assert summary["done"] and len(results) == len(bodies)
+        assert sorted(r["index"] for r in results) == list(range(len(bodies)))
+
+
+def main(args):
+    # Response and itinerary caches stay off, so only the batch's own sharing is measured
+    isolate(argparse.Namespace(response_cache=False, itinerary_cache=False))
+    stub, stub_url = start_stub(args.upstream_delay)
+    import providers
+    import resources
+    providers.SERPAPI_URL = f"{stub_url}/search.json"
+    providers.SCRAPINGANT_URL = f"{stub_url}/v2/markdown"
+    resources.override(llm=CountingLLM(ITINERARY, args.llm_delay))
+    if args.fake_models:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        from embeddings import BatchingEmbeddings, EmbeddingCache, EMBEDDING_CACHE_DIR
+        resources.override(embeddings=BatchingEmbeddings(
+            DeterministicFakeEmbedding(size=384), EmbeddingCache(EMBEDDING_CACHE_DIR)
+        ))
+
+    import main as app_module
+    server = start_app(app_module.app, args.port)
+    bodies = itinerary_requests(args.requests)
+    bodies += bodies[:args.duplicates]
+    print(f"{len(bodies)} requests ({args.duplicates} repeated), upstream delay {args.upstream_delay}s, "
+          f"LLM delay {args.llm_delay}s")
+    asyncio.run(run(f"http://127.0.0.1:{args.port}", bodies))
+    server.should_exit = True
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=12, help="distinct requests")
+    parser.add_argument("--duplicates", type=int, default=4, help="requests sent twice")
+    parser.add_argument("--upstream-delay", type=float, default=0.2, help="seconds per stubbed provider call")
+    parser.add_argument("--llm-delay", type=float, default=1.0, help="seconds per fake LLM call")
+    parser.add_argument("--fake-models", action="store_true", help="hash embeddings instead of the model")
+    parser.add_argument("--port", type=int, default=8768)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,78 @@
+"""Compare prompt context assembly strategies on the synthetic fixtures.
+
+Stores the fixture documents for one trip in an in-memory Chroma collection
+and builds the context three ways:
+- stuff: every document, as a "stuff" chain over all of them would
+- template query: the default retriever (top 4) queried with the filled-in
+  instruction template, as prepare_prompt used to do
+- budgeted: per-category retrieval with quotas, de-duplication and the
+  CONTEXT_TOKEN_BUDGET (prompt_context.py)
+
+Reports prompt tokens, documents per category and build time.
+
+Run from the API directory:
+    python bench_context.py
+    python bench_context.py --fake-models   # no model download; retrieval order is arbitrary
+"""
+import sys
+import time
+
+import chromadb
+
+import resources
+from bench_documents import load_fixtures
+from bench_e2e import SYNTHETIC_NOTE
+from documents import build_documents
+from main import build_prompt
+from prompt_context import build_context, count_tokens
+from trips import trip_scope, trip_store
+
+USER_INPUT = {
+    "from_city": "Mumbai", "to_city": "Goa",
+    "departure_date": "2025-05-15", "return_date": "2025-05-20",
+    "num_adults": 2, "num_children": 0, "children_ages": [],
+    "min_price": 2000, "max_price": 8000, "budget": 30000, "days": 5,
+    "from_station": "CSTM", "to_station": "MAO",
+}
+
+
+def categories(docs):
+    counts = {}
+    for doc in docs:
+        counts[doc.metadata.get("category")] = counts.get(doc.metadata.get("category"), 0) + 1
+    return counts
+
+
+def strategies(store, docs, embeddings):
+    def stuff():
+        return "\n\n".join(doc.page_content for doc in docs), categories(docs)
+
+    def template_query():
+        found = store.as_retriever().invoke(build_prompt(USER_INPUT, "{context}"))
+        return "\n\n".join(doc.page_content for doc in found), categories(found)
+
+    def budgeted():
+        context, report = build_context(store, embeddings, USER_INPUT)
+        return context, {c: n for c, n in report["documents"].items() if n}
+
+    return {"stuff": stuff, "template query": template_query, "budgeted": budgeted}
+
+
+if __name__ == "__main__":
+    if "--fake-models" in sys.argv:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        resources.override(embeddings=DeterministicFakeEmbedding(size=384))
+    embeddings = resources.get_embeddings()
+    scope = trip_scope(USER_INPUT)
+    docs = [doc for category, data in load_fixtures().items() for doc in build_documents(category, data, scope)]
+    store = trip_store(chromadb.EphemeralClient(), embeddings, scope)
+    store.add_documents(docs)
+
+    print(SYNTHETIC_NOTE)
+    print(f"{'strategy':<15} {'prompt tokens':>13} {'build':>8}  documents per category")
+    for name, build in strategies(store, docs, embeddings).items():
+        start = time.perf_counter()
+        context, counts = build()
+        elapsed = (time.perf_counter() - start) * 1000
+        tokens = count_tokens(build_prompt(USER_INPUT, context))
+        print(f"{name:<15} {tokens:>13} {elapsed:>6.1f}ms  {counts}")
@@ -0,0 +1,72 @@
+"""Benchmark the structured document builder against str(dict) chunking.
+
+Uses the synthetic provider payloads in fixtures/ and reports, per category,
+how many chunks and characters each approach would embed and send to the LLM.
+
+Run from the API directory:
+    python bench_documents.py
+"""
+import json
+import os
+import time
+
+from bench_e2e import SYNTHETIC_NOTE
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from documents import build_documents
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixtures():
+    def load_json(name):
+        with open(os.path.join(FIXTURES_DIR, name)) as f:
+            return json.load(f)
+
+    with open(os.path.join(FIXTURES_DIR, "railyatri_CSTM_MAO.md")) as f:
+        train_page = f.read()
+    return {
+        "Flights": load_json("google_flights.json"),
+        "Hotels": load_json("google_hotels.json")["properties"],
+        "Activities": load_json("google_local_restaurants.json")["local_results"],
+        "Trains": {"page_content": train_page},
+        "Tourist Places": load_json("google_local_attractions.json")["local_results"],
+    }
+
+
+def legacy_chunks(category, data):
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    return text_splitter.split_text(f"Category: {category}\n{str(data)}")
+
+
+def structured_chunks(category, data):
+    return [doc.page_content for doc in build_documents(category, data, {"trip_id": "bench"})]
+
+
+def measure(build, fixtures, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        chunks = {category: build(category, data) for category, data in fixtures.items()}
+    elapsed = (time.perf_counter() - start) / repeat
+    return chunks, elapsed
+
+
+if __name__ == "__main__":
+    fixtures = load_fixtures()
+    legacy, legacy_time = measure(legacy_chunks, fixtures)
+    structured, structured_time = measure(structured_chunks, fixtures)
+
+    print(SYNTHETIC_NOTE)
+    print(f"{'category':<15} {'legacy chunks':>13} {'legacy chars':>13} {'new chunks':>11} {'new chars':>10}")
+    totals = [0, 0, 0, 0]
+    for category in fixtures:
+        row = [len(legacy[category]), sum(map(len, legacy[category])),
+               len(structured[category]), sum(map(len, structured[category]))]
+        totals = [t + r for t, r in zip(totals, row)]
+        print(f"{category:<15} {row[0]:>13} {row[1]:>13} {row[2]:>11} {row[3]:>10}")
+    print(f"{'total':<15} {totals[0]:>13} {totals[1]:>13} {totals[2]:>11} {totals[3]:>10}")
+    # Rough token estimate of 4 characters per token
+    print(f"Estimated tokens: {totals[1] // 4} -> {totals[3] // 4} "
+          f"({totals[1] / max(totals[3], 1):.1f}x smaller)")
+    print(f"Build time: {legacy_time * 1000:.2f}ms -> {structured_time * 1000:.2f}ms")
@@ -0,0 +1,413 @@
+"""End-to-end benchmark of the API against recorded provider payloads.
+
+SerpAPI and ScrapingAnt are replaced by a local stub server that replays
+payloads recorded from the real APIs (fixtures/e2e_recording.json, written by
+the record mode), falling back to the synthetic per-engine fixtures for
+searches that were not recorded. The record mode makes every upstream call of
+every itinerary body the replay sends for the same --requests, and a replay
+with a recording only sends bodies it covers; the output reports how many
+upstream responses came from the recording and how many from the fixtures.
+The LLM is a deterministic fake with a fixed delay. The app
+runs under uvicorn in this process and is driven over HTTP at the given
+concurrency, so the numbers include routing, JSON and the thread pool.
+
+For each endpoint it reports p50/p95/p99 latency, throughput and errors, plus
+embedding time (from the stage metrics) and peak memory. Every run is saved as
+JSON; pass an earlier run with --baseline to print the change per endpoint.
+State (caches, Chroma, jobs, quota, offers) lives in a fresh temporary directory, and
+the response and itinerary caches are off unless asked for, so every request
+exercises the whole pipeline.
+
+Run from the API directory:
+    python bench_e2e.py record --requests 20         # once, needs SERP_API_KEY and ANT_SCRAPY_API_KEY
+    python bench_e2e.py --concurrency 8 --requests 40 --fake-models
+    python bench_e2e.py --baseline bench_results/latest.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(API_DIR, "fixtures")
+RECORDING_PATH = os.path.join(FIXTURES_DIR, "e2e_recording.json")
+RESULTS_DIR = os.path.join(API_DIR, "bench_results")
+ITINERARY_LOG = os.path.join(FIXTURES_DIR, "itinerary_requests.jsonl")
+# The per-engine fixtures are hand-written in the shape of SerpAPI, ScrapingAnt
+# and RailYatri responses, not recorded: hotel prices rise with the ratings and
+# the addresses are made up. Results on them show relative costs only.
+SYNTHETIC_NOTE = "Data: synthetic fixtures in API/fixtures/, not recorded provider responses"
+
+REQUEST = {
+    "from_city": "Mumbai", "to_city": "Goa",
+    "departure_date": "2025-05-15", "return_date": "2025-05-20",
+    "num_adults": 2, "num_children": 0, "children_ages": [],
+    "min_price": 2000, "max_price": 8000, "budget": 50000, "days": 5,
+    "from_station": "CSTM", "to_station": "MAO",
+}
+# Endpoint -> (method, path, query params or JSON body)
+ENDPOINTS = {
+    "flights": ("GET", "/flights", {
+        "from_location_ID": "BOM", "to_location_ID": "GOI", "departure_date": REQUEST["departure_date"],
+    }),
+    "hotels": ("POST", "/hotels", {
+        "stay_city_and_type": "Goa hotels", "check_in_date": REQUEST["departure_date"],
+        "check_out_date": REQUEST["return_date"], "num_adults": 2, "min_price": 2000, "max_price": 8000,
+    }),
+    "activities": ("GET", "/activities", {"activity_query": "Restaurants in Goa", "destination_city": "Goa"}),
+    "tourist-places": ("GET", "/tourist-places", {"place_type": "tourist attractions", "destination_city": "Goa"}),
+    "train-details": ("GET", "/train-details", {
+        "departure_code": "CSTM", "departure_name": "Mumbai", "destination_code": "MAO",
+        "destination_name": "Goa", "journey_date": REQUEST["departure_date"],
+    }),
+}
+ITINERARY = " ".join(["Day 1: Morning at Fort Aguada, lunch at Thalassa, sunset at Baga Beach."] * 40)
+
+
+def query_key(kind, url):
+    """Recording key: provider plus the sorted query string without the API key."""
+    pairs = sorted((k, v) for k, v in parse_qsl(urlparse(url).query) if k != "api_key")
+    return json.dumps([kind, pairs])
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f) if name.endswith(".json") else f.read()
+
+
+def fixture_search(params):
+    """Per-engine fixture for a search that was not recorded."""
+    if params.get("engine") == "google_flights":
+        return load_fixture("google_flights.json")
+    if params.get("engine") == "google_hotels":
+        return {"properties": load_fixture("google_hotels.json")["properties"]}
+    if int(params.get("start", 0)) > 0:
+        return {"error": "Google hasn't returned any results for this query."}
+    if params.get("q", "").startswith("Restaurants"):
+        return load_fixture("google_local_restaurants.json")
+    return load_fixture("google_local_attractions.json")
+
+
+class ProviderStub(BaseHTTPRequestHandler):
+    """Serves recorded SerpAPI and ScrapingAnt responses after a fixed delay."""
+
+    recording = {}
+    # Itinerary bodies whose upstream calls are all in the recording
+    recorded_requests = []
+    delay = 0.0
+    hits = 0
+    recorded_hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        time.sleep(self.delay)
+        kind = "scrapingant" if self.path.startswith("/v2/markdown") else "serpapi"
+        entry = self.recording.get(query_key(kind, self.path))
+        if entry is not None:
+            type(self).recorded_hits += 1
+            status, body = entry["status"], entry["body"]
+        elif kind == "scrapingant":
+            url = dict(parse_qsl(urlparse(self.path).query)).get("url")
+            status, body = 200, json.dumps({"url": url, "markdown": load_fixture("railyatri_CSTM_MAO.md")})
+        else:
+            status, body = 200, json.dumps(fixture_search(dict(parse_qsl(urlparse(self.path).query))))
+        body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeLLM:
+    """Returns the same itinerary for every prompt after a fixed delay."""
+
+    def __init__(self, text, delay):
+        self.text = text
+        self.delay = delay
+
+    def invoke(self, prompt):
+        from langchain_core.messages import AIMessage
+        time.sleep(self.delay)
+        return AIMessage(content=self.text)
+
+    async def ainvoke(self, prompt):
+        from langchain_core.messages import AIMessage
+        await asyncio.sleep(self.delay)
+        return AIMessage(content=self.text)
+
+
+def isolate(args):
+    """Point every on-disk store at a fresh directory; must run before the app is imported."""
+    work_dir = tempfile.mkdtemp(prefix="bench_e2e_")
+    os.environ.update({
+        "CACHE_DB_PATH": os.path.join(work_dir, "response_cache.db"),
+        "CHROMA_DB_PATH": os.path.join(work_dir, "chroma_db"),
+        "EMBEDDING_CACHE_DIR": os.path.join(work_dir, "embedding_cache"),
+        "JOB_DB_PATH": os.path.join(work_dir, "jobs.db"),
+        "QUOTA_DB_PATH": os.path.join(work_dir, "quota.db"),
+        "ITINERARY_CACHE_DB_PATH": os.path.join(work_dir, "itinerary_cache.db"),
+        "OFFER_DB_PATH": os.path.join(work_dir, "offers.db"),
+        # The stub is local, so the provider rate limits would only measure themselves
+        "SERPAPI_RATE": "10000", "SERPAPI_BURST": "10000",
+        "SCRAPINGANT_RATE": "10000", "SCRAPINGANT_BURST": "10000",
+        "RESOURCE_WARM_UP": "1",
+    })
+    if not args.response_cache:
+        # Every stored response is evicted at once
+        os.environ["CACHE_MAX_ENTRIES"] = "0"
+    if not args.itinerary_cache:
+        os.environ["ITINERARY_CACHE_TTL"] = "0"
+    return work_dir
+
+
+def record(count):
+    """Call the real providers for every search a replay of count requests makes and save the responses.
+
+    Covers each distinct itinerary body itinerary_requests(count) returns,
+    including the return searches, plus the endpoint searches. A body is
+    only listed as recorded when all of its calls succeeded.
+    """
+    import providers
+    from fetch import fan_out
+    from locations import UnknownCity
+    from providers import itinerary_calls
+
+    recording = {}
+    real_get = providers.session.get
+
+    def recording_get(url, **kwargs):
+        response = real_get(url, **kwargs)
+        kind = "scrapingant" if url == providers.SCRAPINGANT_URL else "serpapi"
+        recording[query_key(kind, response.request.url)] = {"status": response.status_code, "body": response.text}
+        return response
+
+    providers.session.get = recording_get
+    recorded = []
+    for body in [REQUEST] + itinerary_requests(count):
+        if body in recorded:
+            continue
+        try:
+            providers.check_cities(body)
+        except UnknownCity as e:
+            print(f"Skipping {body['from_city']} -> {body['to_city']}: {e}")
+            continue
+        _, errors, _ = fan_out(itinerary_calls(body))
+        for name, error in errors.items():
+            print(f"{body['from_city']} -> {body['to_city']} {name} failed: {error}")
+        if not errors:
+            recorded.append(body)
+    # Endpoint searches that differ from the itinerary's own
+    providers.get_flights(**ENDPOINTS["flights"][2])
+    providers.get_hotels(**ENDPOINTS["hotels"][2])
+    with open(RECORDING_PATH, "w") as f:
+        json.dump({"requests": recorded, "responses": recording}, f)
+    print(f"Recorded {len(recording)} responses for {len(recorded)} itinerary requests to {RECORDING_PATH}")
+
+
+def start_stub(delay):
+    if os.path.exists(RECORDING_PATH):
+        with open(RECORDING_PATH) as f:
+            recording = json.load(f)
+        ProviderStub.recording = recording["responses"]
+        ProviderStub.recorded_requests = recording["requests"]
+    ProviderStub.delay = delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ProviderStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def start_app(app, port):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def itinerary_requests(count):
+    """Distinct itinerary bodies from the request log, so trips are not coalesced.
+
+    Once a recording is loaded, only the bodies it covers are used, so a
+    recorded run does not fall back to the synthetic fixtures.
+    """
+    with open(ITINERARY_LOG) as f:
+        logged = [json.loads(line) for line in f if line.strip()]
+    if ProviderStub.recording:
+        logged = [body for body in logged if body in ProviderStub.recorded_requests] or ProviderStub.recorded_requests
+    return [logged[i % len(logged)] for i in range(count)]
+
+
+async def drive(client, requests, concurrency):
+    """Send (method, path, payload) requests with at most concurrency in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(method, path, payload):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            if method == "GET":
+                response = await client.get(path, params=payload)
+            else:
+                response = await client.post(path, json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(*request) for request in requests))
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def max_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run_scenarios(base_url, args):
+    import httpx
+    import metrics
+
+    scenarios = {"generate-itinerary": [
+        ("POST", "/generate-itinerary", body) for body in itinerary_requests(args.requests)
+    ]}
+    for name, request in ENDPOINTS.items():
+        scenarios[name] = [request] * args.requests
+
+    report = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        for name, requests in scenarios.items():
+            if args.only and name not in args.only:
+                continue
+            before = metrics.stage_summary().get("embed_batch", {"seconds": 0.0})["seconds"]
+            latencies, errors, elapsed = await drive(client, requests, args.concurrency)
+            after = metrics.stage_summary().get("embed_batch", {"seconds": 0.0})["seconds"]
+            report[name] = {
+                "requests": len(requests),
+                "errors": errors,
+                "p50_ms": round(statistics.median(latencies) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+                "throughput_rps": round(len(requests) / elapsed, 2),
+                "embedding_s": round(after - before, 3),
+                "max_rss_mb": round(max_rss_mb(), 1),
+            }
+            print_row(name, report[name])
+    return report
+
+
+def print_row(name, row, baseline=None):
+    line = (f"{name:<19} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+            f"{row['throughput_rps']:>8.2f} {row['embedding_s']:>8.2f} {row['max_rss_mb']:>8.0f} {row['errors']:>6}")
+    if baseline:
+        change = (row["p95_ms"] - baseline["p95_ms"]) / max(baseline["p95_ms"], 1e-9)
+        line += f"  p95 {change:+.1%} vs baseline"
+    print(line)
+
+
+def compare(report, baseline, baseline_path):
+    print(f"\nCompared with {baseline_path} ({baseline['settings']}):")
+    for name, row in report["endpoints"].items():
+        if name in baseline["endpoints"]:
+            print_row(name, row, baseline["endpoints"][name])
+
+
+def save(report):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, time.strftime("e2e_%Y%m%d_%H%M%S.json"))
+    for target in (path, os.path.join(RESULTS_DIR, "latest.json")):
+        with open(target, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"\nSaved {path} (and bench_results/latest.json)")
+
+
+def main(args):
+    isolate(args)
+    baseline = None
+    if args.baseline:
+        # Read before this run's results overwrite latest.json
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if args.mode == "record":
+        record(args.requests)
+        return
+
+    stub, stub_url = start_stub(args.upstream_delay)
+    import providers
+    import resources
+    providers.SERPAPI_URL = f"{stub_url}/search.json"
+    providers.SCRAPINGANT_URL = f"{stub_url}/v2/markdown"
+    resources.override(llm=FakeLLM(ITINERARY, args.llm_delay))
+    if args.fake_models:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        from embeddings import BatchingEmbeddings, EmbeddingCache, EMBEDDING_CACHE_DIR
+        resources.override(embeddings=BatchingEmbeddings(
+            DeterministicFakeEmbedding(size=384), EmbeddingCache(EMBEDDING_CACHE_DIR)
+        ))
+
+    import main as app_module
+    server = start_app(app_module.app, args.port)
+    print(f"{len(ProviderStub.recording)} recorded responses, upstream delay {args.upstream_delay}s, "
+          f"LLM delay {args.llm_delay}s, concurrency {args.concurrency}")
+    if not ProviderStub.recording:
+        print(f"{SYNTHETIC_NOTE}; run the record mode for representative numbers")
+    else:
+        print(f"Itinerary bodies: {len(ProviderStub.recorded_requests)} with recorded provider calls")
+    print(f"{'endpoint':<19} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'embed s':>8} "
+          f"{'RSS MB':>8} {'errors':>6}")
+    endpoints = asyncio.run(run_scenarios(f"http://127.0.0.1:{args.port}", args))
+    server.should_exit = True
+    stub.shutdown()
+    fallback = ProviderStub.hits - ProviderStub.recorded_hits
+    print(f"\nUpstream: {ProviderStub.recorded_hits} of {ProviderStub.hits} responses from the recording, "
+          f"{fallback} from the synthetic fixtures")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {
+            "concurrency": args.concurrency, "requests": args.requests,
+            "upstream_delay": args.upstream_delay, "llm_delay": args.llm_delay,
+            "fake_models": args.fake_models, "response_cache": args.response_cache,
+            "itinerary_cache": args.itinerary_cache,
+        },
+        "upstream_calls": ProviderStub.hits,
+        "upstream_recorded": ProviderStub.recorded_hits,
+        "endpoints": endpoints,
+    }
+    save(report)
+    if baseline:
+        compare(report, baseline, args.baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("mode", nargs="?", choices=["replay", "record"], default="replay")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20, help="requests per endpoint")
+    parser.add_argument("--upstream-delay", type=float, default=0.2, help="seconds per stubbed provider call")
+    parser.add_argument("--llm-delay", type=float, default=2.0, help="seconds per fake LLM call")
+    parser.add_argument("--only", nargs="*", help="endpoints to run, e.g. generate-itinerary flights")
+    parser.add_argument("--fake-models", action="store_true", help="hash embeddings instead of the model")
+    parser.add_argument("--response-cache", action="store_true", help="keep the upstream response cache on")
+    parser.add_argument("--itinerary-cache", action="store_true", help="keep the itinerary cache on")
+    parser.add_argument("--baseline", help="earlier results file to compare with")
+    parser.add_argument("--port", type=int, default=8767)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,65 @@
+"""Benchmark micro-batched embedding under concurrent load.
+
+Uses a fake model whose cost is a fixed per-call overhead plus a small
+per-text cost, which is how MiniLM on CPU behaves for short chunks. Compares
+concurrent callers embedding directly against the shared BatchingEmbeddings
+service, then repeats the load to show the on-disk cache.
+
+Run from the API directory:
+    python bench_embeddings.py
+"""
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from embeddings import BatchingEmbeddings, EmbeddingCache
+
+CALL_OVERHEAD = 0.030
+PER_TEXT = 0.0005
+CONCURRENCY = [1, 4, 16, 32]
+CHUNKS_PER_REQUEST = 46
+
+
+class FakeModel:
+    """Single model instance; calls are serialised like a CPU-bound model."""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls += 1
+            time.sleep(CALL_OVERHEAD + PER_TEXT * len(texts))
+            return [[float(len(t)), 0.0, 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def request_texts(request_no):
+    return [f"Category: Hotels\nHotel {i} for request {request_no}" for i in range(CHUNKS_PER_REQUEST)]
+
+
+def run_load(embedder, concurrency, requests_per_worker=4):
+    def worker(w):
+        for r in range(requests_per_worker):
+            embedder.embed_documents(request_texts(w * requests_per_worker + r))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return concurrency * requests_per_worker * CHUNKS_PER_REQUEST / elapsed
+
+
+if __name__ == "__main__":
+    print(f"{'callers':>7} {'direct chunks/s':>16} {'batched chunks/s':>17} {'cached chunks/s':>16} {'model calls':>12}")
+    for concurrency in CONCURRENCY:
+        direct = run_load(FakeModel(), concurrency)
+        model = FakeModel()
+        batched_embedder = BatchingEmbeddings(model, EmbeddingCache(tempfile.mkdtemp()))
+        batched = run_load(batched_embedder, concurrency)
+        cached = run_load(batched_embedder, concurrency)
+        print(f"{concurrency:>7} {direct:>16.0f} {batched:>17.0f} {cached:>16.0f} {model.calls:>12}")
@@ -0,0 +1,79 @@
+"""Benchmark the provider fan-out and paged fetching against local fakes.
+
+Run from the API directory:
+    python bench_fetch.py
+"""
+import time
+from fetch import fan_out, fetch_pages
+
+# Simulated round-trip time per provider, in seconds
+PROVIDER_DELAYS = {
+    "flights": 1.2,
+    "hotels": 1.8,
+    "activities": 1.5,
+    "trains": 2.0,
+    "tourist_places": 1.4,
+}
+
+
+def fake_provider(name, delay, fail=False):
+    def call():
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError(f"{name} upstream error")
+        return [{"provider": name}]
+    return call
+
+
+def bench_sequential():
+    start = time.perf_counter()
+    for name, delay in PROVIDER_DELAYS.items():
+        fake_provider(name, delay)()
+    return time.perf_counter() - start
+
+
+def bench_fan_out():
+    calls = {name: fake_provider(name, delay) for name, delay in PROVIDER_DELAYS.items()}
+    start = time.perf_counter()
+    results, errors, _ = fan_out(calls)
+    assert not errors and len(results) == len(PROVIDER_DELAYS)
+    return time.perf_counter() - start
+
+
+def bench_partial_results():
+    calls = {name: fake_provider(name, delay) for name, delay in PROVIDER_DELAYS.items()}
+    calls["trains"] = fake_provider("trains", 5.0)
+    calls["hotels"] = fake_provider("hotels", 0.5, fail=True)
+    start = time.perf_counter()
+    results, errors, _ = fan_out(calls, timeouts={"trains": 2.5}, defaults={"hotels": [], "trains": {}})
+    elapsed = time.perf_counter() - start
+    print("Partial results errors:", errors)
+    print("Partial results keys:", sorted(k for k, v in results.items() if v))
+    return elapsed
+
+
+def fake_page(delay, total_pages, per_page=20):
+    def fetch_page(page):
+        time.sleep(delay)
+        if page >= total_pages:
+            return []
+        return [f"result-{page}-{i}" for i in range(per_page)]
+    return fetch_page
+
+
+def bench_pages(window, num_pages=5, total_pages=3, delay=0.8):
+    start = time.perf_counter()
+    items = fetch_pages(fake_page(delay, total_pages), num_pages, window=window)
+    elapsed = time.perf_counter() - start
+    assert items == [f"result-{p}-{i}" for p in range(total_pages) for i in range(20)]
+    return elapsed
+
+
+if __name__ == "__main__":
+    print(f"Sum of provider delays: {sum(PROVIDER_DELAYS.values()):.2f}s")
+    print(f"Slowest provider:       {max(PROVIDER_DELAYS.values()):.2f}s")
+    print(f"Sequential:             {bench_sequential():.2f}s")
+    print(f"Fan-out:                {bench_fan_out():.2f}s")
+    print(f"Fan-out with timeout:   {bench_partial_results():.2f}s")
+    for window in (1, 3, 5):
+        print(f"Pages (window={window}):      {bench_pages(window):.2f}s")
@@ -0,0 +1,68 @@
+"""Replay a request log through the semantic itinerary cache.
+
+Each request in the log (one TravelRequest JSON object per line) is looked up
+in a fresh ItineraryCache; a miss "generates" a placeholder itinerary and
+stores it. Reports the hit rate, exact and adapted hits, rejections and the
+LLM time saved at LLM_SECONDS per generation, for several similarity
+thresholds. Budget and adult tolerances come from the ITINERARY_CACHE_* env
+vars.
+
+Run from the API directory:
+    python bench_itinerary_cache.py [request_log.jsonl]
+    python bench_itinerary_cache.py --fake-models   # no model download; only identical requests match
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import resources
+from itinerary_cache import ItineraryCache
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DEFAULT_LOG = os.path.join(FIXTURES_DIR, "itinerary_requests.jsonl")
+THRESHOLDS = [0.9, 0.95, 0.98, 0.999]
+# Typical time for one full itinerary generation
+LLM_SECONDS = 25.0
+
+
+def load_log(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay(requests, embed, min_similarity):
+    cache = ItineraryCache(embed, path=os.path.join(tempfile.mkdtemp(), "itinerary_cache.db"),
+                           min_similarity=min_similarity)
+    latencies = []
+    for n, user_input in enumerate(requests):
+        start = time.perf_counter()
+        itinerary, state = cache.lookup(user_input)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if itinerary is None:
+            cache.store(state, f"Itinerary {n} for {user_input['to_city']}")
+    return cache.stats(), latencies
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if "--fake-models" in sys.argv:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        resources.override(embeddings=DeterministicFakeEmbedding(size=384))
+    requests = load_log(args[0] if args else DEFAULT_LOG)
+    embeddings = resources.get_embeddings()
+
+    def embed(texts):
+        return embeddings.embed_documents(texts)
+
+    print(f"Replaying {len(requests)} requests")
+    print(f"{'threshold':>9} {'hit rate':>9} {'exact':>6} {'adapted':>8} {'rej. sim':>9} "
+          f"{'rej. constr':>12} {'LLM saved':>10} {'lookup p50':>11} {'p95':>7}")
+    for threshold in THRESHOLDS:
+        stats, latencies = replay(requests, embed, threshold)
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        print(f"{threshold:>9} {stats['hit_rate']:>9.1%} {stats['exact_hits']:>6} {stats['adapted_hits']:>8} "
+              f"{stats['rejected_similarity']:>9} {stats['rejected_constraints']:>12} "
+              f"{stats['hits'] * LLM_SECONDS / 60:>8.1f}m {statistics.median(latencies):>9.2f}ms {p95:>5.2f}ms")
@@ -0,0 +1,119 @@
+"""Benchmark hotel and place searches on the local offer store.
+
+Calls providers.search_hotels and search_places with fake provider fetches
+that return the synthetic SerpAPI fixtures after LIVE_SECONDS, like a live
+call. The first search of a stay fetches it; every later filter, sort, top-k
+and radius query is answered from the SQLite indexes. The same queries are
+then timed on a store of --size synthetic hotels in one city to show how
+they scale.
+
+Run from the API directory:
+    python bench_offers.py [--size 20000] [--repeat 200]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("OFFER_DB_PATH", os.path.join(tempfile.mkdtemp(), "offers.db"))
+
+import providers
+from offers import OfferStore, stay_key
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# Typical time for three pages of a SerpAPI search
+LIVE_SECONDS = 1.5
+STAY = ("2025-05-15", "2025-05-18", 2)
+
+
+def load_fixture(name, key):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)[key]
+
+
+def fake_providers(fetches):
+    hotels = load_fixture("google_hotels.json", "properties")
+    places = load_fixture("google_local_attractions.json", "local_results")
+
+    def get_hotels(*args, **kwargs):
+        fetches.append("hotels")
+        time.sleep(LIVE_SECONDS)
+        return hotels
+
+    def get_local_results(query, num_pages=3):
+        fetches.append(query)
+        time.sleep(LIVE_SECONDS)
+        return places
+
+    providers.get_hotels = get_hotels
+    providers.get_local_results = get_local_results
+
+
+def timed(fn, repeat):
+    """(median ms, p95 ms, last result) over repeat calls."""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1], result
+
+
+QUERIES = {
+    "price 2000-6000, cheapest": dict(min_price=2000, max_price=6000, sort="price"),
+    "rating >= 4, best 5": dict(min_rating=4, sort="rating", limit=5),
+    "top 10 by rating": dict(sort="rating", limit=10),
+    "within 5 km, closest": dict(lat=15.5, lon=73.8, radius_km=5, sort="distance"),
+}
+
+
+def bench_endpoints(repeat):
+    fetches = []
+    fake_providers(fetches)
+    start = time.perf_counter()
+    first = providers.search_hotels("Goa", *STAY)
+    print(f"First hotel search: {first['source']}, {(time.perf_counter() - start) * 1000:.0f}ms, "
+          f"{first['count']} results")
+    for name, filters in QUERIES.items():
+        median, p95, result = timed(lambda: providers.search_hotels("goa", *STAY, **filters), repeat)
+        assert result["source"] == "store", result
+        print(f"  hotels {name:28} {median:6.2f}ms p50 {p95:6.2f}ms p95  {result['count']} results")
+    providers.search_places("Goa")
+    median, p95, result = timed(lambda: providers.search_places("Goa", min_rating=4.5, limit=5), repeat)
+    print(f"  places rating >= 4.5, best 5     {median:6.2f}ms p50 {p95:6.2f}ms p95  {result['count']} results")
+    print(f"Provider fetches: {len(fetches)} for {2 + repeat * (len(QUERIES) + 1)} searches")
+
+
+def bench_scale(size, repeat):
+    store = OfferStore(os.path.join(tempfile.mkdtemp(), "offers.db"))
+    rng = random.Random(0)
+    hotels = [
+        {"name": f"Hotel {i}", "property_token": str(i),
+         "rate_per_night": {"extracted_lowest": rng.randrange(800, 40000)},
+         "overall_rating": round(rng.uniform(2.5, 5), 1), "reviews": rng.randrange(0, 5000),
+         "gps_coordinates": {"latitude": 15.5 + rng.uniform(-0.4, 0.4), "longitude": 73.9 + rng.uniform(-0.3, 0.3)}}
+        for i in range(size)
+    ]
+    stay = stay_key(*STAY)
+    start = time.perf_counter()
+    store.add("hotel", "Goa", hotels, "hotels", stay, complete=True)
+    print(f"\nStored {size} synthetic hotels in {time.perf_counter() - start:.2f}s")
+    for name, filters in QUERIES.items():
+        filters = dict(filters)
+        near = (filters.pop("lat"), filters.pop("lon"), filters.pop("radius_km")) if "lat" in filters else None
+        median, p95, result = timed(lambda: store.query("hotel", "Goa", "hotels", stay, near=near, **filters),
+                                    repeat)
+        print(f"  {name:35} {median:6.2f}ms p50 {p95:6.2f}ms p95  {len(result)} results")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20000, help="synthetic hotels for the scale run")
+    parser.add_argument("--repeat", type=int, default=200, help="timed calls per query")
+    args = parser.parse_args()
+    bench_endpoints(args.repeat)
+    bench_scale(args.size, args.repeat)
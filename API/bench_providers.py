@@ -0,0 +1,141 @@
+"""Compare the old HTTP loopback provider path with the in-process client.
+
+The loopback path is what src/rag_endpoint.py used to do: one requests.get per
+provider against the provider API on localhost, one after another. The
+in-process path awaits the providers module directly through fan_out. Upstream
+responses come from the synthetic fixtures (optionally after a fixed delay), so
+the difference is the cost of the self-HTTP hop and double JSON encoding.
+
+Run from the API directory:
+    python bench_providers.py
+"""
+import json
+import os
+import statistics
+import threading
+import time
+
+import requests
+import uvicorn
+
+import providers
+from fetch import fan_out
+from providers import itinerary_calls, PROVIDER_DEFAULTS, get_iata_code, get_station_code
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+ROUNDS = 30
+UPSTREAM_DELAYS = [0.0, 0.2]
+
+USER_INPUT = {
+    "from_city": "Mumbai", "to_city": "Goa",
+    "departure_date": "2025-05-15", "return_date": "2025-05-20",
+    "num_adults": 2, "num_children": 0, "children_ages": [],
+    "min_price": 2000, "max_price": 8000,
+}
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f) if name.endswith(".json") else f.read()
+
+
+FIXTURES = {
+    "flights": load_fixture("google_flights.json"),
+    "hotels": {"properties": load_fixture("google_hotels.json")["properties"]},
+    "restaurants": load_fixture("google_local_restaurants.json"),
+    "attractions": load_fixture("google_local_attractions.json"),
+    "trains": load_fixture("railyatri_CSTM_MAO.md"),
+}
+upstream_delay = 0.0
+
+
+def fake_serp_search(params):
+    time.sleep(upstream_delay)
+    if params["engine"] == "google_flights":
+        return FIXTURES["flights"]
+    if params["engine"] == "google_hotels":
+        return FIXTURES["hotels"]
+    if int(params.get("start", 0)) > 0:
+        return {}
+    if params["q"].startswith("Restaurants"):
+        return FIXTURES["restaurants"]
+    return FIXTURES["attractions"]
+
+
+def fake_scrape_page(url):
+    time.sleep(upstream_delay)
+    return FIXTURES["trains"]
+
+
+def loopback(base_url, session):
+    """The removed fetch_data path: sequential self-HTTP calls"""
+    u = USER_INPUT
+    flights = session.get(f"{base_url}/flights", params={
+        "from_location_ID": get_iata_code(u["from_city"]),
+        "to_location_ID": get_iata_code(u["to_city"]),
+        "departure_date": u["departure_date"],
+    }).json()
+    # /hotels takes a JSON body; the old GET with query params was rejected
+    hotels = session.post(f"{base_url}/hotels", json={
+        "stay_city_and_type": u["to_city"] + " hotels",
+        "check_in_date": u["departure_date"], "check_out_date": u["return_date"],
+        "num_adults": u["num_adults"], "min_price": u["min_price"], "max_price": u["max_price"],
+        "num_children": u["num_children"], "children_ages": u["children_ages"], "max_pages": 3,
+    }).json()
+    activities = session.get(f"{base_url}/activities", params={
+        "activity_query": "Restaurants in " + u["to_city"], "destination_city": u["to_city"], "num_pages": 3,
+    }).json()
+    trains = session.get(f"{base_url}/train-details", params={
+        "departure_code": get_station_code(u["from_city"]), "departure_name": u["from_city"],
+        "destination_code": get_station_code(u["to_city"]), "destination_name": u["to_city"],
+        "journey_date": u["departure_date"],
+    }).json()
+    tourist_places = session.get(f"{base_url}/tourist-places", params={
+        "place_type": "tourist attractions", "destination_city": u["to_city"], "num_pages": 3,
+    }).json()
+    return flights, hotels, activities, trains, tourist_places
+
+
+def in_process():
+    results, errors, _ = fan_out(itinerary_calls(USER_INPUT), defaults=PROVIDER_DEFAULTS)
+    assert not errors, errors
+    return tuple(results.get(name, default) for name, default in PROVIDER_DEFAULTS.items())
+
+
+def time_calls(fn, rounds=ROUNDS):
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies), max(latencies)
+
+
+def start_server(port=8766):
+    from api_endpoints import app
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+if __name__ == "__main__":
+    providers.serp_search = fake_serp_search
+    providers.scrape_page = fake_scrape_page
+    server, base_url = start_server()
+    session = requests.Session()
+
+    # The loopback path predates the return searches, so only the outbound data is compared
+    assert loopback(base_url, session) == in_process()[:5], "paths returned different data"
+    payload = sum(len(json.dumps(part)) for part in in_process())
+    print(f"Travel data per request: {payload / 1024:.0f} KiB of JSON")
+
+    print(f"{'upstream delay':>14} {'loopback p50':>13} {'in-process p50':>15} {'loopback max':>13} {'in-process max':>15}")
+    for upstream_delay in UPSTREAM_DELAYS:
+        rounds = ROUNDS if upstream_delay == 0 else 5
+        loop_p50, loop_max = time_calls(lambda: loopback(base_url, session), rounds)
+        proc_p50, proc_max = time_calls(in_process, rounds)
+        print(f"{upstream_delay:>13.1f}s {loop_p50:>11.1f}ms {proc_p50:>13.1f}ms "
+              f"{loop_max:>11.1f}ms {proc_max:>13.1f}ms")
+    server.should_exit = True
@@ -0,0 +1,121 @@
+"""Micro-benchmark of the vectorized hotel and place ranking.
+
+Times ranking.rank_travel_data on synthetic candidate sets of growing size
+(hotels, restaurants and attractions in equal numbers) and compares the
+hotel scoring with a plain Python loop computing the same score, checking
+that both keep the same hotels. Then ranks the synthetic fixtures for a sample
+request and prints what would reach the prompt.
+
+Run from the API directory:
+    python bench_ranking.py [--sizes 100 1000 5000 20000] [--repeat 20]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import time
+
+import ranking
+from bench_e2e import SYNTHETIC_NOTE
+from locations import distance_km
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+USER_INPUT = {"budget": 60000, "days": 4, "num_adults": 2, "num_children": 0, "min_price": 1500, "max_price": 8000}
+
+
+def synthetic(n, rng):
+    def gps():
+        return {"latitude": 15.5 + rng.uniform(-0.3, 0.3), "longitude": 73.85 + rng.uniform(-0.2, 0.2)}
+
+    hotels = [{"name": f"Hotel {i}", "rate_per_night": {"extracted_lowest": rng.randrange(800, 30000)},
+               "overall_rating": round(rng.uniform(2.5, 5), 1), "reviews": rng.randrange(0, 5000),
+               "gps_coordinates": gps()} for i in range(n)]
+    places = [{"title": f"Place {i}", "rating": round(rng.uniform(3, 5), 1), "reviews": rng.randrange(0, 20000),
+               "price": "₹" * rng.randrange(1, 5), "gps_coordinates": gps()} for i in range(n)]
+    return hotels, places[:n // 2], places[n // 2:]
+
+
+def python_hotel_scores(hotels, user_input, anchors):
+    """The hotel score from ranking.py, one hotel at a time."""
+    limit = ranking.nightly_limit(user_input)
+    anchor_points = list(zip(*anchors)) if anchors is not None else []
+    scores = []
+    for hotel in hotels:
+        price = (hotel.get("rate_per_night") or {}).get("extracted_lowest")
+        if price is None:
+            fit = ranking.UNKNOWN_PRICE_FIT
+        elif price < (user_input.get("min_price") or 0):
+            fit = 0.8
+        elif price > limit:
+            fit = math.exp(-(price - limit) / (0.25 * limit))
+        else:
+            fit = 1.0
+        rating = hotel.get("overall_rating")
+        rating = min(max((rating - 3) / 2, 0), 1) if rating is not None else 0
+        reviews = min(math.log1p(hotel.get("reviews") or 0) / math.log1p(ranking.REVIEWS_SATURATION), 1)
+        gps = hotel.get("gps_coordinates") or {}
+        distance = 0
+        if anchor_points and gps.get("latitude") is not None:
+            mean_km = sum(distance_km(gps["latitude"], gps["longitude"], lat, lon)
+                          for lat, lon in anchor_points) / len(anchor_points)
+            distance = math.exp(-mean_km / ranking.DISTANCE_SCALE_KM)
+        weights = ranking.HOTEL_WEIGHTS
+        scores.append(weights["price"] * fit + weights["rating"] * rating + weights["reviews"] * reviews
+                      + weights["distance"] * distance)
+    return scores
+
+
+def median_ms(fn, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies), result
+
+
+def bench(sizes, repeat):
+    rng = random.Random(0)
+    print(f"{'candidates':>10} {'rank_travel_data':>17} {'hotels numpy':>13} {'hotels python':>14}")
+    for n in sizes:
+        hotels, restaurants, attractions = synthetic(n, rng)
+        total, _ = median_ms(lambda: ranking.rank_travel_data(USER_INPUT, hotels, restaurants, attractions), repeat)
+        anchors = ranking.attraction_anchors(attractions)
+        numpy_ms, numpy_scores = median_ms(lambda: ranking.score_hotels(hotels, USER_INPUT, anchors), repeat)
+        python_ms, python_scores = median_ms(lambda: python_hotel_scores(hotels, USER_INPUT, anchors),
+                                             max(repeat // 4, 1))
+        kept = ranking.top_n(hotels, numpy_scores, ranking.RANK_TOP_HOTELS)
+        expected = sorted(range(n), key=lambda i: -python_scores[i])[:ranking.RANK_TOP_HOTELS]
+        assert [h["name"] for h in kept] == [hotels[i]["name"] for i in expected], "numpy and python rankings differ"
+        print(f"{n * 2:>10} {total:>15.2f}ms {numpy_ms:>11.2f}ms {python_ms:>12.2f}ms")
+
+
+def show_fixtures():
+    def load(name, key):
+        with open(os.path.join(FIXTURES_DIR, name)) as f:
+            return json.load(f)[key]
+
+    hotels, restaurants, attractions = ranking.rank_travel_data(
+        USER_INPUT, load("google_hotels.json", "properties"), load("google_local_restaurants.json", "local_results"),
+        load("google_local_attractions.json", "local_results"), top_hotels=5, top_places=5,
+    )
+    print(f"\n{SYNTHETIC_NOTE}")
+    print(f"Top hotels for INR {USER_INPUT['budget']} over {USER_INPUT['days']} days, "
+          f"{USER_INPUT['num_adults']} adults (limit INR {ranking.nightly_limit(USER_INPUT):.0f}/night):")
+    for hotel in hotels:
+        print(f"  {hotel['name']}: INR {(hotel.get('rate_per_night') or {}).get('extracted_lowest')}, "
+              f"rating {hotel.get('overall_rating')}")
+    print("Top restaurants: " + ", ".join(p["title"] for p in restaurants))
+    print("Top attractions: " + ", ".join(p["title"] for p in attractions))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000],
+                        help="hotels per run; restaurants and attractions add as many again")
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per size")
+    args = parser.parse_args()
+    bench(args.sizes, args.repeat)
+    show_fixtures()
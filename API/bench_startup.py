@@ -0,0 +1,85 @@
+"""Measure import time, startup time and first-request latency of main.py.
+
+Each measurement runs in a fresh interpreter with empty cache directories so
+nothing is already loaded. Startup is the lifespan hook (resource warm-up,
+compaction, job resume); the first and second requests are full
+/generate-itinerary calls with providers served from the recorded fixtures
+and a fake LLM. Runs once with RESOURCE_WARM_UP=1 and once with lazy loading.
+
+Run from the API directory:
+    python bench_startup.py
+    python bench_startup.py --fake-models   # no model download, e.g. in CI
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def child(fake_models):
+    start = time.perf_counter()
+    import main
+    import_seconds = time.perf_counter() - start
+
+    import bench_stream
+    import providers
+    import resources
+    from fastapi.testclient import TestClient
+
+    bench_stream.PROVIDER_DELAY = 0
+    providers.serp_search = bench_stream.fake_serp_search
+    providers.scrape_page = bench_stream.fake_scrape_page
+    resources.override(llm=bench_stream.FakeStreamingLLM("Day 1: beach.", 0))
+    if fake_models:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        from embeddings import BatchingEmbeddings, EmbeddingCache, EMBEDDING_CACHE_DIR
+        resources.override(embeddings=BatchingEmbeddings(
+            DeterministicFakeEmbedding(size=384), EmbeddingCache(EMBEDDING_CACHE_DIR)
+        ))
+
+    timings = {"import": import_seconds}
+    start = time.perf_counter()
+    with TestClient(main.app) as client:
+        timings["startup"] = time.perf_counter() - start
+        for label in ("first_request", "second_request"):
+            start = time.perf_counter()
+            client.post("/generate-itinerary", json=bench_stream.REQUEST).raise_for_status()
+            timings[label] = time.perf_counter() - start
+    print(json.dumps(timings))
+
+
+def measure(warm_up, fake_models):
+    workdir = tempfile.mkdtemp()
+    env = {
+        **os.environ,
+        "RESOURCE_WARM_UP": "1" if warm_up else "0",
+        "CHROMA_DB_PATH": os.path.join(workdir, "chroma_db"),
+        "CACHE_DB_PATH": os.path.join(workdir, "response_cache.db"),
+        "EMBEDDING_CACHE_DIR": os.path.join(workdir, "embedding_cache"),
+        "JOB_DB_PATH": os.path.join(workdir, "jobs.db"),
+        "QUOTA_DB_PATH": os.path.join(workdir, "quota.db"),
+        "ITINERARY_CACHE_DB_PATH": os.path.join(workdir, "itinerary_cache.db"),
+        "OFFER_DB_PATH": os.path.join(workdir, "offers.db"),
+    }
+    args = [sys.executable, os.path.abspath(__file__), "--child"]
+    if fake_models:
+        args.append("--fake-models")
+    output = subprocess.run(args, cwd=API_DIR, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    fake_models = "--fake-models" in sys.argv
+    if "--child" in sys.argv:
+        child(fake_models)
+        sys.exit(0)
+
+    print(f"{'mode':>6} {'import':>8} {'startup':>8} {'1st request':>12} {'2nd request':>12}")
+    for warm_up in (True, False):
+        t = measure(warm_up, fake_models)
+        print(f"{'warm' if warm_up else 'lazy':>6} {t['import']:>7.2f}s {t['startup']:>7.2f}s "
+              f"{t['first_request']:>11.2f}s {t['second_request']:>11.2f}s")
@@ -0,0 +1,128 @@
+"""Compare time-to-first-byte of the streaming and blocking itinerary endpoints.
+
+Providers are served from the synthetic fixtures with an injected delay and the
+LLM is a local fake that streams one word at a time, so no API keys are used.
+State lives in a temporary directory, and the response and itinerary caches
+are off so the warm-up run does not answer the measured ones.
+
+Run from the API directory:
+    python bench_stream.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+
+from bench_e2e import isolate
+
+# Fresh state without the response or itinerary cache, so every run fetches
+# the providers and calls the LLM instead of replaying the warm-up
+isolate(argparse.Namespace(response_cache=False, itinerary_cache=False))
+
+import httpx
+import uvicorn
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+import main
+import providers
+import resources
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PROVIDER_DELAY = 0.5
+TOKEN_DELAY = 0.02
+ITINERARY = " ".join(["Day 1: Morning at Fort Aguada, lunch at Thalassa, sunset at Baga Beach."] * 40)
+
+REQUEST = {
+    "from_city": "Mumbai", "to_city": "Goa",
+    "departure_date": "2025-05-15", "return_date": "2025-05-20",
+    "num_adults": 2, "num_children": 0, "children_ages": [],
+    "min_price": 2000, "max_price": 8000, "budget": 50000, "days": 5,
+    "from_station": "CSTM", "to_station": "MAO",
+}
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f) if name.endswith(".json") else f.read()
+
+
+def fake_serp_search(params):
+    time.sleep(PROVIDER_DELAY)
+    if params["engine"] == "google_flights":
+        return load_fixture("google_flights.json")
+    if params["engine"] == "google_hotels":
+        return {"properties": load_fixture("google_hotels.json")["properties"]}
+    if int(params.get("start", 0)) > 0:
+        return {}
+    if params["q"].startswith("Restaurants"):
+        return load_fixture("google_local_restaurants.json")
+    return load_fixture("google_local_attractions.json")
+
+
+def fake_scrape_page(url):
+    time.sleep(PROVIDER_DELAY)
+    return load_fixture("railyatri_CSTM_MAO.md")
+
+
+class FakeStreamingLLM:
+    """Emits the itinerary word by word with a fixed delay per token."""
+
+    def __init__(self, text, token_delay):
+        self.tokens = text.split(" ")
+        self.token_delay = token_delay
+
+    def invoke(self, prompt):
+        time.sleep(self.token_delay * len(self.tokens))
+        return AIMessage(content=" ".join(self.tokens))
+
+    async def astream(self, prompt):
+        for i, token in enumerate(self.tokens):
+            await asyncio.sleep(self.token_delay)
+            yield AIMessageChunk(content=token if i == 0 else " " + token)
+
+
+def bench_blocking(client):
+    start = time.perf_counter()
+    response = client.post("/generate-itinerary", json=REQUEST)
+    response.raise_for_status()
+    total = time.perf_counter() - start
+    return total, total
+
+
+def bench_streaming(client):
+    start = time.perf_counter()
+    first_event = first_token = None
+    with client.stream("POST", "/generate-itinerary/stream", json=REQUEST) as response:
+        for line in response.iter_lines():
+            now = time.perf_counter() - start
+            if line.startswith("event:") and first_event is None:
+                first_event = now
+            if line == "event: token" and first_token is None:
+                first_token = now
+    return first_event, first_token, time.perf_counter() - start
+
+
+def start_server(port=8765):
+    # A real server is needed: the ASGI test client buffers whole responses
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+if __name__ == "__main__":
+    providers.serp_search = fake_serp_search
+    providers.scrape_page = fake_scrape_page
+    resources.override(llm=FakeStreamingLLM(ITINERARY, TOKEN_DELAY))
+    server, base_url = start_server()
+    with httpx.Client(base_url=base_url, timeout=120) as client:
+        # Warm the vector store so both runs pay the same storage cost
+        bench_blocking(client)
+        first_byte, total = bench_blocking(client)
+        print(f"Blocking:  first byte {first_byte:.2f}s, total {total:.2f}s")
+        first_event, first_token, total = bench_streaming(client)
+        print(f"Streaming: first event {first_event:.2f}s, first token {first_token:.2f}s, total {total:.2f}s")
+    server.should_exit = True
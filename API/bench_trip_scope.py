@@ -0,0 +1,122 @@
+"""Benchmark retrieval as the vector store grows.
+
+Simulates a stream of itinerary requests against two temporary Chroma stores:
+- global: every trip is appended forever and queries search everything
+- scoped: each trip gets its own collection via trip_store and the
+  compaction job drops trips past their TTL
+
+For each round reports stored chunks, p50 query latency and the share of
+retrieved chunks that belong to a different trip. Chroma's HNSW index keeps
+query latency nearly flat as the global collection grows, so the difference
+scoping makes shows up in the foreign share and the stored size, not in speed.
+
+Uses a deterministic fake embedding so no model download is needed.
+
+Run from the API directory:
+    python bench_trip_scope.py [--rounds 8] [--trips-per-round 50] [--chunks-per-trip 40]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+import chromadb
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from trips import trip_scope, trip_store, evict_expired
+
+CITIES = ["Mumbai", "Goa", "New Delhi", "Jaipur", "Bangalore", "Chennai", "Kolkata", "Pune"]
+QUERIES_PER_ROUND = 20
+# Simulated seconds between rounds; trips older than TRIP_TTL are evicted
+ROUND_SECONDS = 3600
+TRIP_TTL = 2 * ROUND_SECONDS
+
+
+def make_trip(i):
+    from_city, to_city = random.sample(CITIES, 2)
+    day = 1 + i % 28
+    return {
+        "from_city": from_city,
+        "to_city": to_city,
+        "departure_date": f"2025-05-{day:02d}",
+        "return_date": f"2025-05-{min(day + 4, 28):02d}",
+        "num_adults": 2,
+        "num_children": 0,
+        "children_ages": [],
+        "min_price": 2000,
+        "max_price": 8000,
+    }
+
+
+def trip_documents(user_input, scope, chunks):
+    return [
+        Document(
+            page_content=f"Category: Hotels\nHotel {n} in {user_input['to_city']} "
+                         f"for {user_input['departure_date']}",
+            metadata={**scope, "category": "Hotels"},
+        )
+        for n in range(chunks)
+    ]
+
+
+def time_queries(retriever_for, scopes):
+    """Return p50 latency in ms and the share of results from other trips."""
+    latencies, foreign, retrieved = [], 0, 0
+    for scope in random.sample(scopes, min(QUERIES_PER_ROUND, len(scopes))):
+        retriever = retriever_for(scope)
+        # Itineraries query their trip right after storing it, so time warm queries
+        retriever.invoke("warm up")
+        start = time.perf_counter()
+        docs = retriever.invoke("hotels within budget near the beach")
+        latencies.append((time.perf_counter() - start) * 1000)
+        foreign += sum(d.metadata.get("trip_id") != scope["trip_id"] for d in docs)
+        retrieved += len(docs)
+    return statistics.median(latencies), foreign / max(retrieved, 1)
+
+
+def run(rounds, trips_per_round, chunks):
+    random.seed(7)
+    embedding = DeterministicFakeEmbedding(size=384)
+    global_store = Chroma(collection_name="global", embedding_function=embedding,
+                          persist_directory=tempfile.mkdtemp())
+    client = chromadb.PersistentClient(path=tempfile.mkdtemp())
+
+    clock = time.time()
+    recent_scopes = []
+    print(f"{'round':>5} {'global docs':>12} {'global p50':>11} {'foreign':>8} "
+          f"{'scoped docs':>12} {'scoped p50':>11} {'foreign':>8}")
+    for round_no in range(rounds):
+        for i in range(trips_per_round):
+            user_input = make_trip(round_no * trips_per_round + i)
+            scope = trip_scope(user_input, ttl=TRIP_TTL)
+            scope["expires_at"] = clock + TRIP_TTL
+            docs = trip_documents(user_input, scope, chunks)
+            global_store.add_documents([
+                Document(page_content=d.page_content, metadata={"trip_id": scope["trip_id"]}) for d in docs
+            ])
+            trip_store(client, embedding, scope).add_documents(docs)
+            recent_scopes.append(scope)
+
+        clock += ROUND_SECONDS
+        evict_expired(client, now=clock)
+        recent_scopes = [s for s in recent_scopes if s["expires_at"] >= clock]
+
+        global_p50, global_foreign = time_queries(lambda scope: global_store.as_retriever(), recent_scopes)
+        scoped_p50, scoped_foreign = time_queries(
+            lambda scope: trip_store(client, embedding, scope).as_retriever(), recent_scopes
+        )
+        scoped_docs = sum(c.count() for c in client.list_collections())
+        print(f"{round_no:>5} {len(global_store.get(include=[])['ids']):>12} {global_p50:>9.2f}ms "
+              f"{global_foreign:>8.0%} {scoped_docs:>12} {scoped_p50:>9.2f}ms {scoped_foreign:>8.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=8)
+    parser.add_argument("--trips-per-round", type=int, default=50)
+    parser.add_argument("--chunks-per-trip", type=int, default=40)
+    args = parser.parse_args()
+    run(args.rounds, args.trips_per_round, args.chunks_per_trip)
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "./response_cache.db")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 5000))
+
+# Time-to-live per upstream engine, in seconds. Prices go stale quickly while
+# places and train timetables change rarely.
+ENGINE_TTLS = {
+    "google_flights": 30 * 60,
+    "google_hotels": 6 * 60 * 60,
+    "google_local": 3 * 24 * 60 * 60,
+    # Scraped train pages carry seat availability; the parsed timetable
+    # without it is kept per station pair and weekday for a week
+    "scrapingant": 15 * 60,
+    "train_schedule": 7 * 24 * 60 * 60,
+}
+DEFAULT_TTL = 60 * 60
+
+# Params that identify the caller rather than the query
+EXCLUDED_PARAMS = ("api_key",)
+
+
+def _canonical(value):
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, str):
+        return value.strip()
+    return str(value)
+
+
+def make_key(params, exclude=EXCLUDED_PARAMS):
+    """Hash request params into a stable cache key, ignoring credentials."""
+    canonical = {
+        k: _canonical(v) for k, v in params.items()
+        if k not in exclude and v is not None
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(value):
+    """Empty responses and SerpAPI error payloads are never cached."""
+    if not value:
+        return False
+    if isinstance(value, dict) and "error" in value:
+        return False
+    return True
+
+
+class LazyConnection:
+    """SQLite connection that is opened, and its schema created, on first use.
+
+    The stores are module-level singletons, so connecting lazily keeps
+    importing an app from creating database files before a request or the
+    startup hook uses them. Attribute access (execute, commit, ...) goes to
+    the underlying connection.
+    """
+
+    def __init__(self, path, schema=(), row_factory=None):
+        self.path = path
+        self.schema = schema
+        self.row_factory = row_factory
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        with self._lock:
+            if self._conn is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                if self.row_factory is not None:
+                    conn.row_factory = self.row_factory
+                for statement in self.schema:
+                    conn.execute(statement)
+                conn.commit()
+                self._conn = conn
+        return self._conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn or self._connect(), name)
+
+
+class ResponseCache:
+    """LRU-bounded TTL cache for upstream responses, persisted in SQLite."""
+
+    def __init__(self, path=CACHE_DB_PATH, max_entries=CACHE_MAX_ENTRIES, ttls=None):
+        self.max_entries = max_entries
+        self.ttls = {**ENGINE_TTLS, **(ttls or {})}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = LazyConnection(path, [
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, engine TEXT, value TEXT, "
+            "expires_at REAL, accessed_at REAL)",
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)",
+        ])
+
+    def get(self, key, count_miss=True):
+        """Cached value for key, or None. count_miss=False suits a check that is followed by a fetch."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+            value, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                if count_miss:
+                    self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, engine, value):
+        now = time.time()
+        ttl = self.ttls.get(engine, DEFAULT_TTL)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, engine, json.dumps(value), now + ttl, now),
+            )
+            # Evict least recently used entries beyond the size bound
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def get_or_fetch(self, engine, params, fetch):
+        """Return the cached response for params, calling fetch() on a miss."""
+        key = make_key({"engine": engine, **params})
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = fetch()
+        if is_cacheable(value):
+            self.set(key, engine, value)
+        return value
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "size": size}
@@ -0,0 +1,83 @@
+"""Check that batch items for the same trip keep their own ranked hotels.
+
+Runs /generate-itinerary/batch's generator on two requests for the same
+trip that differ only in budget, with RANK_TOP_HOTELS=3 so the two ranked
+sets do not overlap. Uses the bench_e2e provider stub, hash embeddings and a
+fake LLM that records prompts. Checks that both items share one provider
+fetch and that each prompt only names hotels from its own ranked set.
+
+Run from the API directory:
+    python check_batch.py [--budgets 30000 200000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+
+os.environ.setdefault("RANK_TOP_HOTELS", "3")
+
+from bench_e2e import FakeLLM, ITINERARY, REQUEST, isolate, start_stub
+
+
+class RecordingLLM(FakeLLM):
+    """Fake LLM that keeps every prompt it is given."""
+
+    def __init__(self, text):
+        super().__init__(text, 0)
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        return await super().ainvoke(prompt)
+
+
+def prompt_hotels(prompt):
+    return set(re.findall(r"^\s*Hotel: (.+)$", prompt, re.M))
+
+
+async def collect(lines):
+    return [json.loads(line) async for line in lines]
+
+
+def check(budgets):
+    # Keep the response cache so the expected ranking below sees the same data
+    isolate(argparse.Namespace(response_cache=True, itinerary_cache=False))
+    stub, stub_url = start_stub(0)
+    import providers
+    import resources
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from embeddings import BatchingEmbeddings, EmbeddingCache, EMBEDDING_CACHE_DIR
+    providers.SERPAPI_URL = f"{stub_url}/search.json"
+    providers.SCRAPINGANT_URL = f"{stub_url}/v2/markdown"
+    llm = RecordingLLM(ITINERARY)
+    resources.override(llm=llm, embeddings=BatchingEmbeddings(
+        DeterministicFakeEmbedding(size=384), EmbeddingCache(EMBEDDING_CACHE_DIR)
+    ))
+
+    import main
+    from ranking import rank_travel_data
+    requests = [{**REQUEST, "budget": budget} for budget in budgets]
+    lines = asyncio.run(collect(main.batch_travel_plans(requests)))
+    summary = lines[-1]
+    assert summary["ok"] == len(requests) and summary["trips_fetched"] == 1, summary
+    assert len(llm.prompts) == len(requests), f"{len(llm.prompts)} prompts for {len(requests)} requests"
+
+    _, hotels, activities, _, places, _, _ = main.get_travel_data(REQUEST)
+    ranked = [{h["name"] for h in rank_travel_data(r, hotels, activities, places)[0]} for r in requests]
+    assert all(a != b for i, a in enumerate(ranked) for b in ranked[i + 1:]), "budgets rank the same hotels"
+    for request, own in zip(requests, ranked):
+        budget_line = f"Budget: INR {request['budget']}"
+        prompt = next(p for p in llm.prompts if budget_line in p)
+        seen = prompt_hotels(prompt)
+        print(f"Budget {request['budget']}: ranked {sorted(own)}, prompt names {sorted(seen)}")
+        assert seen and seen <= own, f"prompt for budget {request['budget']} has {sorted(seen - own)}"
+    stub.shutdown()
+    print("Each prompt only names its own ranked hotels")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[30000, 200000])
+    args = parser.parse_args()
+    check(args.budgets)
@@ -0,0 +1,67 @@
+"""Check that jobs resumed by several workers run exactly once.
+
+Every uvicorn worker resumes unfinished jobs at startup. Simulates that with
+several JobQueues, each on its own connection to one SQLite file, over a
+database left behind by a stopped process: queued jobs, a running job whose
+lease lapsed and a running job still within its lease. Checks each job's
+handler runs once, the lapsed job is taken over at once and the fresh one
+only after its lease.
+
+Run from the API directory:
+    python check_jobs.py [--workers 4] [--jobs 20]
+"""
+import argparse
+import collections
+import os
+import tempfile
+import threading
+import time
+
+from jobs import JobQueue, JobStore, DONE, RUNNING
+
+LEASE = 2
+
+
+def check(workers, count):
+    path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    seed = JobStore(path)
+    ids = [seed.create(f"job-{n}", {"n": n})["id"] for n in range(count)]
+    stale, fresh = ids[-2:]
+    seed.update(stale, status=RUNNING, attempts=1)
+    seed._conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time() - 10 * LEASE, stale))
+    seed._conn.commit()
+    seed.update(fresh, status=RUNNING, attempts=1)
+
+    runs = collections.Counter()
+    lock = threading.Lock()
+
+    def handler(payload):
+        with lock:
+            runs[payload["n"]] += 1
+        time.sleep(0.05)
+        return {"n": payload["n"]}
+
+    queues = [JobQueue(JobStore(path), handler, lease=LEASE) for _ in range(workers)]
+    start = time.perf_counter()
+    for queue in queues:
+        queue.resume()
+    while seed.count(DONE) < count - 1 and time.perf_counter() - start < 10:
+        time.sleep(0.05)
+    assert seed.get(fresh)["status"] == RUNNING, "a job inside its lease was taken over"
+    while seed.count(DONE) < count and time.perf_counter() - start < 10 * LEASE:
+        time.sleep(0.05)
+    took_over = time.perf_counter() - start
+
+    assert seed.count(DONE) == count, f"{seed.count(DONE)} of {count} jobs done"
+    repeated = {n: times for n, times in runs.items() if times != 1}
+    assert not repeated, f"jobs run more than once: {repeated}"
+    print(f"{workers} workers resumed {count} jobs; each ran once, the job left within its lease "
+          f"after {took_over:.1f}s (lease {LEASE}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--jobs", type=int, default=20)
+    args = parser.parse_args()
+    check(args.workers, args.jobs)
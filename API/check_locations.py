@@ -0,0 +1,57 @@
+"""Check city resolution against the bundled location index.
+
+Exact names, aliases and codes must resolve to their city; common typos
+(swapped, missing or doubled letters) must resolve to the intended city; and
+cities outside the index must stay unknown rather than matching a
+look-alike. Also checks an uncached misspelt lookup takes under a millisecond.
+
+Run from the API directory:
+    python check_locations.py
+"""
+import argparse
+import time
+
+from locations import LocationIndex, locations
+
+EXACT = {
+    "Delhi": "New Delhi", "Bengaluru": "Bangalore", "Bombay": "Mumbai", "BLR": "Bangalore",
+    "NDLS": "New Delhi", "Goa": "Goa", "Mysore": "Mysuru",
+}
+TYPOS = {
+    "Dehli": "New Delhi", "Mumbia": "Mumbai", "Jaipor": "Jaipur", "Banglore": "Bangalore",
+    "Hyderbad": "Hyderabad", "Chenai": "Chennai", "Kolkatta": "Kolkata", "Ahmedbad": "Ahmedabad",
+    "Lucknw": "Lucknow", "Varansi": "Varanasi", "Trivandram": "Thiruvananthapuram", "Puna": "Pune",
+}
+UNKNOWN = ["Atlantis", "Paris", "London", "Dubai", "Rome", "Colombo", "Kathmandu", "Sydney", "Xyz"]
+
+
+def check():
+    failures = []
+    for cases in (EXACT, TYPOS):
+        for name, city in cases.items():
+            record = locations.resolve(name)
+            if record is None or record["city"] != city:
+                failures.append(f"{name!r} -> {record and record['city']}, expected {city}")
+    for name in UNKNOWN:
+        record = locations.resolve(name)
+        if record is not None:
+            failures.append(f"{name!r} -> {record['city']}, expected unknown")
+    assert not failures, "\n".join(failures)
+    print(f"{len(EXACT)} exact names, {len(TYPOS)} typos and {len(UNKNOWN)} unknown cities resolve as expected")
+
+
+def time_misses(rounds=20):
+    index = LocationIndex()
+    start = time.perf_counter()
+    for n in range(rounds):
+        index.resolve(f"Dehli{'x' * n}")
+    per_lookup = (time.perf_counter() - start) / rounds * 1000
+    print(f"Uncached misspelt lookup: {per_lookup:.2f}ms")
+    assert per_lookup < 1, f"misspelt lookups take {per_lookup:.2f}ms"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+    check()
+    time_misses()
@@ -0,0 +1,115 @@
+"""Check the day planner on the synthetic Google Local and Google Hotels fixtures.
+
+Ranks the fixture candidates, builds the plan twice to check it is
+reproducible, checks every attraction is used once and that 2-opt never
+lengthens a nearest-neighbour route, then prints the skeleton and its size
+against the restaurant and attraction documents it replaces in the prompt.
+Then plans the same trip around the first train of the synthetic RailYatri
+page (arriving 19:00) and an afternoon return flight, and checks nothing is
+booked before the arrival or after leaving for the return.
+
+Run from the API directory:
+    python check_planner.py [--days 3]
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+import planner
+from bench_e2e import SYNTHETIC_NOTE
+from documents import place_records
+from prompt_context import count_tokens
+from ranking import rank_travel_data
+from trains import parse_markdown
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load(name, key):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)[key]
+
+
+def check_routes(trials=200):
+    """2-opt routes are never longer than the nearest-neighbour start."""
+    rng = np.random.default_rng(0)
+    for _ in range(trials):
+        nodes = rng.uniform(0, 20, size=(int(rng.integers(3, 8)), 2))
+        dist = np.linalg.norm(nodes[:, None] - nodes[None, :], axis=2)
+        order = planner.route(dist, closed=True)
+        assert sorted(order) == list(range(len(nodes))) and order[0] == 0
+        nearest = [0]
+        while len(nearest) < len(nodes):
+            nearest.append(min((j for j in range(len(nodes)) if j not in nearest),
+                               key=lambda j: dist[nearest[-1], j]))
+        assert planner._path_length(order, dist, True) <= planner._path_length(nearest, dist, True) + 1e-9
+    print(f"2-opt routes no longer than nearest neighbour on {trials} random days")
+
+
+def ranked(user_input):
+    return rank_travel_data(
+        user_input, load("google_hotels.json", "properties"), load("google_local_restaurants.json", "local_results"),
+        load("google_local_attractions.json", "local_results"),
+    )
+
+
+def minutes(clock):
+    hours, mins = clock.split(":")
+    return int(hours) * 60 + int(mins)
+
+
+def check_plan(days):
+    user_input = {"days": days, "departure_date": "2025-05-15", "budget": 60000, "num_adults": 2,
+                  "min_price": 1500, "max_price": 8000}
+    hotels, restaurants, attractions = ranked(user_input)
+    plan = planner.plan_days(user_input, hotels, restaurants, attractions)
+    assert planner.plan_days(user_input, hotels, restaurants, attractions) == plan, "plan is not reproducible"
+    visited = [s["name"] for d in plan["days"] for s in d["stops"] if s["kind"] == "attraction"]
+    assert len(visited) == len(set(visited)) == min(len(attractions), days * planner.STOPS_PER_DAY)
+    assert len(plan["days"]) == days
+
+    skeleton = planner.skeleton_text(plan)
+    replaced = "\n\n".join(text for text, _ in place_records(restaurants) + place_records(attractions))
+    print(f"\n{SYNTHETIC_NOTE}\n{skeleton}\n")
+    print(f"Skeleton: {count_tokens(skeleton)} tokens, replacing {count_tokens(replaced)} tokens of "
+          f"restaurant and attraction documents")
+
+
+def check_journeys(days):
+    """Day 1 starts after the outbound arrives and the last day ends before the return leaves."""
+    user_input = {"days": days, "departure_date": "2025-05-15", "budget": 60000, "num_adults": 2,
+                  "min_price": 1500, "max_price": 8000}
+    with open(os.path.join(FIXTURES_DIR, "railyatri_CSTM_MAO.md"), encoding="utf-8") as f:
+        outbound = planner.journey({}, {"trains": parse_markdown(f.read())}, "2025-05-15")
+    last_date = planner._date(user_input, days - 1)
+    return_flight = {"best_flights": [{"flights": [{
+        "departure_airport": {"id": "GOX", "time": f"{last_date} 15:30"},
+        "arrival_airport": {"id": "BOM", "time": f"{last_date} 16:45"},
+        "airline": "IndiGo", "flight_number": "6E 5101",
+    }]}]}
+    inbound = planner.journey(return_flight, {}, last_date, prefer=outbound["mode"])
+    assert outbound["mode"] == "train" and inbound["mode"] == "flight"
+
+    plan = planner.plan_days(user_input, *ranked(user_input), outbound=outbound, inbound=inbound)
+    first, last = plan["days"][0], plan["days"][-1]
+    ready = minutes(outbound["arrives"][-5:]) + planner.ARRIVAL_MINUTES
+    assert all(minutes(s["time"]) >= ready for s in first["stops"] if s["kind"] in ("attraction", "lunch", "dinner"))
+    leave = next(s for s in last["stops"] if s["kind"] == "leave")
+    assert all(minutes(s["time"]) + s["minutes"] <= minutes(leave["time"])
+               for s in last["stops"] if s["kind"] in ("attraction", "lunch", "dinner"))
+    visited = [s["name"] for d in plan["days"] for s in d["stops"] if s["kind"] == "attraction"]
+    assert len(visited) == len(set(visited))
+    print(f"Around {outbound['name']} and {inbound['name']}:\n{planner.skeleton_text(plan)}\n")
+    print(f"Day 1 stops start after {outbound['arrives'][-5:]} + {planner.ARRIVAL_MINUTES} min; "
+          f"day {days} ends by {leave['time']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=3)
+    args = parser.parse_args()
+    check_routes()
+    check_plan(args.days)
+    check_journeys(args.days)
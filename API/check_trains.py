@@ -0,0 +1,130 @@
+"""Check the RailYatri parser and the train schedule cache.
+
+Parses the synthetic markdown (in the shape ScrapingAnt returns) and HTML
+versions of the Mumbai CSMT -> Madgaon page, checks they give the same train
+records, then calls providers.get_trains with a fake scraper to show that
+repeat lookups for the same station pair and weekday are served without
+scraping, while availability=True always scrapes.
+
+The fixtures are hand-written, so they only show the parser agrees with
+itself. --page parses a captured page instead, and --scrape fetches the live
+page through ScrapingAnt (needs ANT_SCRAPY_API_KEY) and saves it next to the
+fixtures. Any page that parses to zero trains fails the check.
+
+Run from the API directory:
+    python check_trains.py [--page PATH | --scrape]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("CACHE_DB_PATH", os.path.join(tempfile.mkdtemp(), "cache.db"))
+
+import providers
+from trains import parse_html, parse_markdown, parse_page, runs_on, weekday
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+EXPECTED_NUMBERS = ["10103", "12051", "22229", "10111", "11085", "20111"]
+ROUTE = ("CSTM", "Mumbai", "MAO", "Goa")
+LIVE_PAGE = os.path.join(FIXTURES_DIR, "railyatri_CSTM_MAO.live.md")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def parse_or_fail(name, page, parse=parse_page):
+    trains = parse(page)
+    if not trains:
+        sys.exit(f"FAIL: {name} ({len(page)} chars) parsed to zero trains; "
+                 f"the patterns in trains.py do not match this page")
+    return trains
+
+
+def check_page(path):
+    with open(path, encoding="utf-8") as f:
+        page = f.read()
+    trains = parse_or_fail(path, page)
+    missing = [t["number"] for t in trains if not t["classes"]]
+    for train in trains:
+        print(f"{train['number']} {train['name']}: {train['departs']} {train['from_station']} -> "
+              f"{train['arrives']} {train['to_station']}, {train['runs_on']}, {len(train['classes'])} classes")
+    print(f"Parsed {len(trains)} trains from {path}; {len(missing)} without fares")
+
+
+def scrape(journey_date):
+    url = providers.railyatri_url(*ROUTE, journey_date)
+    page = providers.scrape_page(url)
+    with open(LIVE_PAGE, "w", encoding="utf-8") as f:
+        f.write(page)
+    print(f"Saved {len(page)} chars from {url} to {LIVE_PAGE}")
+    return LIVE_PAGE
+
+
+def check_parsers():
+    markdown = load_fixture("railyatri_CSTM_MAO.md")
+    html = load_fixture("railyatri_CSTM_MAO.html")
+    from_markdown = parse_or_fail("railyatri_CSTM_MAO.md", markdown, parse_markdown)
+    from_html = parse_or_fail("railyatri_CSTM_MAO.html", html, parse_html)
+    assert [t["number"] for t in from_markdown] == EXPECTED_NUMBERS, from_markdown
+    assert from_markdown == from_html, "markdown and HTML pages parsed differently"
+
+    jan_shatabdi = from_markdown[1]
+    assert jan_shatabdi["name"] == "Jan Shatabdi Express"
+    assert (jan_shatabdi["departs"], jan_shatabdi["arrives"]) == ("05:10", "14:15")
+    assert jan_shatabdi["duration"] == "09h 05m"
+    assert jan_shatabdi["classes"][0] == {"class": "2S", "fare": 245, "availability": "AVL 42"}
+    # 12051 does not run on Sundays
+    assert not runs_on(jan_shatabdi, weekday("2025-05-18"))
+    assert runs_on(jan_shatabdi, weekday("15-05-2025"))
+    print(f"Parsed {len(from_markdown)} trains from both the synthetic markdown and HTML pages")
+    return markdown
+
+
+def check_schedule_cache(page):
+    scrapes = []
+
+    def fake_scrape_page(url):
+        scrapes.append(url)
+        time.sleep(0.2)
+        return page
+
+    providers.scrape_page = fake_scrape_page
+    args = ROUTE
+
+    start = time.perf_counter()
+    first = providers.get_trains(*args, "2025-05-15")
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    # A week later is the same weekday, so the cached timetable applies
+    second = providers.get_trains(*args, "2025-05-22")
+    warm = time.perf_counter() - start
+    assert len(scrapes) == 1, scrapes
+    assert first == second and len(first["trains"]) == 6
+    assert all("availability" not in c for t in first["trains"] for c in t["classes"])
+
+    sunday = providers.get_trains(*args, "2025-05-18")
+    assert len(scrapes) == 2 and len(sunday["trains"]) == 4, sunday
+
+    live = providers.get_trains(*args, "2025-05-15", availability=True)
+    assert len(scrapes) == 3 and live["trains"][0]["classes"][0]["availability"] == "AVL 42"
+    print(f"Schedule lookup: {cold * 1000:.1f}ms scraped, {warm * 1000:.2f}ms cached; "
+          f"{len(scrapes)} scrapes for 4 lookups")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--page", help="captured RailYatri page (markdown or HTML) to parse")
+    source.add_argument("--scrape", action="store_true", help="scrape the live CSTM -> MAO page first")
+    parser.add_argument("--date", default="2025-05-15", help="journey date for --scrape")
+    args = parser.parse_args()
+    if args.scrape:
+        check_page(scrape(args.date))
+    elif args.page:
+        check_page(args.page)
+    else:
+        check_schedule_cache(check_parsers())
@@ -0,0 +1,170 @@
+import functools
+
+from langchain_core.documents import Document
+
+from metrics import span
+
+
+@functools.lru_cache(maxsize=None)
+def text_splitter():
+    """Fallback splitter for unstructured page text such as the train page.
+
+    Created on first use: the splitter package is slow to import and most
+    requests never need it.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+
+
+def _record(lines, metadata):
+    """Join non-empty 'label: value' lines and drop metadata Chroma cannot store."""
+    text = "\n".join(f"{label}: {value}" for label, value in lines if value not in (None, "", []))
+    metadata = {k: v for k, v in metadata.items() if isinstance(v, (str, int, float, bool))}
+    return text, metadata
+
+
+def _gps(item):
+    gps = item.get("gps_coordinates") or {}
+    return gps.get("latitude"), gps.get("longitude")
+
+
+def flight_records(data):
+    """One record per flight option (best and other flights)."""
+    records = []
+    data = data or {}
+    options = data.get("best_flights", []) + data.get("other_flights", [])
+    booking_url = (data.get("search_metadata") or {}).get("google_flights_url")
+    for option in options:
+        legs = option.get("flights", [])
+        if not legs:
+            continue
+        first, last = legs[0], legs[-1]
+        airlines = ", ".join(dict.fromkeys(leg.get("airline", "") for leg in legs))
+        numbers = ", ".join(leg.get("flight_number", "") for leg in legs)
+        stops = [l.get("name") or l.get("id") for l in option.get("layovers", [])]
+        records.append(_record([
+            ("Flight", f"{airlines} {numbers}"),
+            ("From", f"{first['departure_airport'].get('name')} ({first['departure_airport'].get('id')})"),
+            ("Departs", first["departure_airport"].get("time")),
+            ("To", f"{last['arrival_airport'].get('name')} ({last['arrival_airport'].get('id')})"),
+            ("Arrives", last["arrival_airport"].get("time")),
+            ("Duration", f"{option.get('total_duration')} min"),
+            ("Stops", ", ".join(stops) if stops else "Non-stop"),
+            ("Class", first.get("travel_class")),
+            ("Price", f"INR {option['price']}" if option.get("price") else None),
+            ("Link", booking_url),
+        ], {
+            "name": f"{airlines} {numbers}",
+            "price": option.get("price"),
+            "departure_time": first["departure_airport"].get("time"),
+        }))
+    return records
+
+
+def hotel_records(data):
+    """One record per hotel property."""
+    records = []
+    for prop in data or []:
+        lat, lon = _gps(prop)
+        rate = prop.get("rate_per_night") or {}
+        records.append(_record([
+            ("Hotel", prop.get("name")),
+            ("Class", prop.get("hotel_class")),
+            ("Price per night", f"INR {rate['extracted_lowest']}" if rate.get("extracted_lowest") else rate.get("lowest")),
+            ("Rating", f"{prop['overall_rating']} ({prop.get('reviews', 0)} reviews)" if prop.get("overall_rating") else None),
+            ("Amenities", ", ".join(prop.get("amenities", [])[:8])),
+            ("Check-in", prop.get("check_in_time")),
+            ("Check-out", prop.get("check_out_time")),
+            ("GPS", f"{lat}, {lon}" if lat is not None else None),
+            ("Link", prop.get("link")),
+        ], {
+            "name": prop.get("name"),
+            "price": rate.get("extracted_lowest"),
+            "rating": prop.get("overall_rating"),
+            "reviews": prop.get("reviews"),
+            "latitude": lat,
+            "longitude": lon,
+            "property_token": prop.get("property_token"),
+        }))
+    return records
+
+
+def place_records(data):
+    """One record per Google Local result (restaurants and attractions)."""
+    records = []
+    for place in data or []:
+        lat, lon = _gps(place)
+        records.append(_record([
+            ("Place", place.get("title")),
+            ("Type", place.get("type")),
+            ("Price", place.get("price")),
+            ("Rating", f"{place['rating']} ({place.get('reviews', 0)} reviews)" if place.get("rating") else None),
+            ("Address", place.get("address")),
+            ("Hours", place.get("hours")),
+            ("Description", place.get("description")),
+            ("GPS", f"{lat}, {lon}" if lat is not None else None),
+            ("Link", (place.get("links") or {}).get("website")),
+        ], {
+            "name": place.get("title"),
+            "rating": place.get("rating"),
+            "reviews": place.get("reviews"),
+            "latitude": lat,
+            "longitude": lon,
+        }))
+    return records
+
+
+def train_records(data):
+    """One record per train; raw page text from an unparsed page goes through the splitter."""
+    data = data or {}
+    records = []
+    for train in data.get("trains", []):
+        fares = [c for c in train.get("classes", []) if c.get("fare") is not None]
+        records.append(_record([
+            ("Train", f"{train.get('number')} {train.get('name')}"),
+            ("From", train.get("from_station")),
+            ("Departs", train.get("departs")),
+            ("To", train.get("to_station")),
+            ("Arrives", train.get("arrives")),
+            ("Duration", train.get("duration")),
+            ("Runs on", train.get("runs_on")),
+            ("Fares", ", ".join(
+                f"{c['class']} INR {c['fare']}" + (f" ({c['availability']})" if c.get("availability") else "")
+                for c in fares
+            )),
+            ("Link", train.get("link")),
+        ], {
+            "name": train.get("name"),
+            "number": train.get("number"),
+            "price": min((c["fare"] for c in fares), default=None),
+            "departure_time": train.get("departs"),
+        }))
+    if not records:
+        text = data.get("page_content", "")
+        records = [(chunk, {}) for chunk in text_splitter().split_text(text)]
+    return records
+
+
+# Category name used in generate_travel_plan -> record extractor
+EXTRACTORS = {
+    "Flights": flight_records,
+    "Hotels": hotel_records,
+    "Activities": place_records,
+    "Tourist Places": place_records,
+    "Trains": train_records,
+}
+
+
+def build_documents(category, data, scope):
+    """Turn one category of provider data into compact per-entity documents."""
+    extractor = EXTRACTORS.get(category)
+    with span("split", category):
+        if extractor is None:
+            records = [(chunk, {}) for chunk in text_splitter().split_text(str(data))]
+        else:
+            records = extractor(data)
+    return [
+        Document(page_content=f"Category: {category}\n{text}",
+                 metadata={**scope, **metadata, "category": category})
+        for text, metadata in records if text
+    ]
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from metrics import span
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", 256))
+EMBED_MAX_WAIT_MS = int(os.getenv("EMBED_MAX_WAIT_MS", 20))
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk vector cache: a float32 matrix file plus a SQLite index.
+
+    Rows are appended to vectors.f32 and read back through a memory map, so
+    several processes (both apps, every uvicorn worker) can share one cache.
+    The SQLite index maps text hash -> row and serialises row allocation.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_DIR, dim=None):
+        os.makedirs(path, exist_ok=True)
+        self.dim = dim
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(path, "index.db"), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (hash TEXT PRIMARY KEY, row INTEGER)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self._conn.commit()
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        if row:
+            self.dim = row[0]
+        open(self._vectors_path, "ab").close()
+        self._mmap = None
+
+    def _rows(self, rows_needed):
+        """Memory map covering at least rows_needed rows, remapped as the file grows."""
+        if self._mmap is None or len(self._mmap) < rows_needed:
+            size = os.path.getsize(self._vectors_path) // (4 * self.dim)
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(size, self.dim))
+        return self._mmap
+
+    def _find_rows(self, hashes):
+        found = {}
+        for start in range(0, len(hashes), 500):
+            part = hashes[start:start + 500]
+            marks = ",".join("?" * len(part))
+            found.update(self._conn.execute(
+                f"SELECT hash, row FROM vectors WHERE hash IN ({marks})", part
+            ).fetchall())
+        return found
+
+    def get_many(self, hashes):
+        """Return {hash: vector} for the hashes present in the cache."""
+        if not hashes or self.dim is None:
+            return {}
+        with self._lock:
+            found = self._find_rows(hashes)
+            if not found:
+                return {}
+            matrix = self._rows(max(found.values()) + 1)
+            return {h: matrix[row].tolist() for h, row in found.items()}
+
+    def put_many(self, hashes, vectors):
+        if not hashes:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            # BEGIN IMMEDIATE takes the database write lock, so row numbers are
+            # unique even when several processes share the cache directory.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.dim is None:
+                    self.dim = matrix.shape[1]
+                    self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('dim', ?)", (self.dim,))
+                known = self._find_rows(hashes)
+                new = list({h: v for h, v in zip(hashes, matrix) if h not in known}.items())
+                next_row = self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM vectors").fetchone()[0]
+                if new:
+                    block = np.stack([v for _, v in new]).astype(np.float32)
+                    with open(self._vectors_path, "r+b") as f:
+                        f.seek(next_row * 4 * self.dim)
+                        f.write(block.tobytes())
+                    self._conn.executemany(
+                        "INSERT INTO vectors VALUES (?, ?)",
+                        [(h, next_row + i) for i, (h, _) in enumerate(new)],
+                    )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+
+class _Pending:
+    def __init__(self, texts):
+        self.texts = texts
+        self.vectors = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class BatchingEmbeddings(Embeddings):
+    """Embeddings wrapper adding a shared vector cache and micro-batching.
+
+    Texts already in the cache are served from disk. The rest are queued; a
+    single worker thread groups queued texts from all callers into batches of
+    up to max_batch, waiting at most max_wait_ms for a batch to fill, and
+    embeds each batch with one call to the underlying model.
+    """
+
+    def __init__(self, base, cache=None, max_batch=EMBED_MAX_BATCH, max_wait_ms=EMBED_MAX_WAIT_MS):
+        self.base = base
+        self.cache = cache
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.stats = {"cache_hits": 0, "embedded": 0, "batches": 0}
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item.texts)
+            self._embed_batch(batch)
+
+    def _embed_batch(self, batch):
+        unique = list(dict.fromkeys(t for item in batch for t in item.texts))
+        try:
+            with span("embed_batch"):
+                vectors = dict(zip(unique, self.base.embed_documents(unique)))
+        except Exception as e:
+            for item in batch:
+                item.error = e
+                item.done.set()
+            return
+        self.stats["batches"] += 1
+        self.stats["embedded"] += len(unique)
+        for item in batch:
+            item.vectors = [vectors[t] for t in item.texts]
+            item.done.set()
+        if self.cache is not None:
+            try:
+                self.cache.put_many([text_hash(t) for t in unique], [vectors[t] for t in unique])
+            except Exception as e:
+                print(f"Embedding cache write failed: {e}")
+
+    def embed_documents(self, texts):
+        with span("embed"):
+            return self._embed_documents(texts)
+
+    def _embed_documents(self, texts):
+        hashes = [text_hash(t) for t in texts]
+        cached = self.cache.get_many(list(set(hashes))) if self.cache is not None else {}
+        self.stats["cache_hits"] += sum(1 for h in hashes if h in cached)
+        missing = list(dict.fromkeys(t for t, h in zip(texts, hashes) if h not in cached))
+        embedded = {}
+        if missing:
+            # Split oversized requests so one caller cannot starve the others
+            pending = [_Pending(missing[i:i + self.max_batch]) for i in range(0, len(missing), self.max_batch)]
+            for item in pending:
+                self._queue.put(item)
+            for item in pending:
+                item.done.wait()
+                if item.error is not None:
+                    raise item.error
+                embedded.update(zip(item.texts, item.vectors))
+        return [cached[h] if h in cached else embedded[t] for t, h in zip(texts, hashes)]
+
+    def embed_query(self, text):
+        # MiniLM embeds queries and documents the same way, so they share the cache
+        return self.embed_documents([text])[0]
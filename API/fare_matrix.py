@@ -0,0 +1,150 @@
+import asyncio
+import contextlib
+import datetime
+import functools
+import json
+import os
+
+import providers
+from cache import make_key
+from fetch import fan_out_iter, PROVIDER_TIMEOUTS
+from locations import locations, UnknownCity
+
+# Largest number of (origin, destination, date) cells in one matrix
+MATRIX_MAX_CELLS = int(os.getenv("MATRIX_MAX_CELLS", 60))
+# Flight searches in flight at once for one matrix; the SerpAPI rate limit still applies
+MATRIX_CONCURRENCY = int(os.getenv("MATRIX_CONCURRENCY", 4))
+
+
+def airport_code(value):
+    """IATA code for an airport code or a city name."""
+    code = value.strip().upper()
+    if code in locations.airports:
+        return code
+    iata = locations.require(value)["iata"]
+    if iata is None:
+        raise UnknownCity(f"No airport in range of {value!r}")
+    return iata
+
+
+def date_range(start_date, end_date):
+    start, end = datetime.date.fromisoformat(start_date), datetime.date.fromisoformat(end_date or start_date)
+    if end < start:
+        raise ValueError("end_date is before start_date")
+    return [(start + datetime.timedelta(days=n)).isoformat() for n in range((end - start).days + 1)]
+
+
+def _codes(values):
+    """Codes from repeated or comma separated values, in order and without repeats."""
+    codes = [airport_code(v) for value in values for v in value.split(",") if v.strip()]
+    return list(dict.fromkeys(codes))
+
+
+def matrix_cells(origins, destinations, start_date, end_date=None):
+    """(origin, destination, date) cells of a fare matrix, skipping same-airport routes.
+
+    Raises:
+        ValueError: For bad dates, unknown cities or more than MATRIX_MAX_CELLS cells.
+    """
+    dates = date_range(start_date, end_date)
+    cells = [(o, d, day) for o in _codes(origins) for d in _codes(destinations) if o != d for day in dates]
+    if not cells:
+        raise ValueError("No routes between different airports")
+    if len(cells) > MATRIX_MAX_CELLS:
+        raise ValueError(f"{len(cells)} cells requested; at most {MATRIX_MAX_CELLS} routes times dates")
+    return cells
+
+
+def cheapest_option(result):
+    """The cheapest priced flight in a Google Flights result, compacted, or None."""
+    options = [o for o in (result or {}).get("best_flights", []) + (result or {}).get("other_flights", [])
+               if o.get("price") and o.get("flights")]
+    if not options:
+        return None
+    option = min(options, key=lambda o: (o["price"], o.get("total_duration") or 0))
+    legs = option["flights"]
+    return {
+        "price": option["price"],
+        "airline": ", ".join(dict.fromkeys(leg.get("airline", "") for leg in legs)),
+        "flight_number": ", ".join(leg.get("flight_number", "") for leg in legs),
+        "departs": legs[0]["departure_airport"].get("time"),
+        "arrives": legs[-1]["arrival_airport"].get("time"),
+        "duration": option.get("total_duration"),
+        "stops": len(legs) - 1,
+    }
+
+
+def _cell(origin, destination, date, result=None, error=None, cached=False):
+    return {"route": f"{origin}-{destination}", "date": date, "cached": cached,
+            "option": cheapest_option(result) if error is None else None, "error": error}
+
+
+async def matrix_iter(cells, concurrency=MATRIX_CONCURRENCY):
+    """Yield a cell dict for each (origin, destination, date) cell as it completes.
+
+    Cells whose search is in the response cache come first without using a
+    concurrency slot; the rest are searched at most `concurrency` at a time.
+    Closing the generator, e.g. when the client disconnects, cancels the
+    searches that have not started.
+    """
+    calls = {}
+    for origin, destination, date in cells:
+        key = make_key(providers.flight_params(origin, destination, date))
+        cached = await asyncio.to_thread(providers.response_cache.get, key, False)
+        if cached is not None:
+            yield _cell(origin, destination, date, cached, cached=True)
+        else:
+            calls[(origin, destination, date)] = functools.partial(providers.get_flights, origin, destination, date)
+    timeouts = dict.fromkeys(calls, PROVIDER_TIMEOUTS["flights"])
+    searches = fan_out_iter(calls, timeouts, limit=concurrency, detail="flights_matrix")
+    async with contextlib.aclosing(searches):
+        async for cell, result, error, _ in searches:
+            yield _cell(*cell, result, error)
+
+
+def build_grid(cells, results):
+    """Compact price grid: one row per route with the cheapest option per date, or null.
+
+    Args:
+        cells (list): The matrix cells, for the row and column order.
+        results (list): Cell dicts from matrix_iter, in any order.
+    """
+    dates = list(dict.fromkeys(date for _, _, date in cells))
+    routes = list(dict.fromkeys(f"{o}-{d}" for o, d, _ in cells))
+    by_cell = {(r["route"], r["date"]): r for r in results}
+    grid = {route: [(by_cell.get((route, date)) or {}).get("option") for date in dates] for route in routes}
+    priced = [r for r in results if r["option"]]
+    best = min(priced, key=lambda r: r["option"]["price"], default=None)
+    return {
+        "dates": dates,
+        "grid": grid,
+        "cheapest": {"route": best["route"], "date": best["date"], **best["option"]} if best else None,
+        "errors": [{"route": r["route"], "date": r["date"], "error": r["error"]} for r in results if r["error"]],
+        "cached_cells": sum(r["cached"] for r in results),
+        "searched_cells": sum(not r["cached"] for r in results),
+    }
+
+
+async def _collect(cells, concurrency):
+    return [cell async for cell in matrix_iter(cells, concurrency)]
+
+
+def fare_matrix(cells, concurrency=MATRIX_CONCURRENCY):
+    """Blocking: search every cell and return the grid."""
+    return build_grid(cells, asyncio.run(_collect(cells, concurrency)))
+
+
+async def matrix_events(cells, concurrency=MATRIX_CONCURRENCY):
+    """Server-sent events: a "cell" event per completed cell, then "done" with the grid."""
+    results = []
+    # The client going away cancels or closes this generator; closing
+    # matrix_iter with it cancels the searches nobody will read
+    cell_iter = matrix_iter(cells, concurrency)
+    async with contextlib.aclosing(cell_iter):
+        try:
+            async for cell in cell_iter:
+                results.append(cell)
+                yield f"event: cell\ndata: {json.dumps(cell)}\n\n"
+            yield f"event: done\ndata: {json.dumps(build_grid(cells, results))}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': f'{type(e).__name__}: {e}'})}\n\n"
@@ -0,0 +1,145 @@
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import span
+
+# Default per-provider timeouts in seconds
+DEFAULT_TIMEOUT = 30
+PROVIDER_TIMEOUTS = {
+    "flights": 20,
+    "hotels": 30,
+    "activities": 25,
+    "trains": 45,
+    "tourist_places": 25,
+}
+
+# Shared pool for blocking provider calls. Kept outside asyncio.run so that a
+# timed-out call still running in the background does not block the caller.
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="provider")
+
+# Number of result pages requested concurrently by fetch_pages. Page fetches use
+# their own pool because they are issued from inside provider calls.
+PAGE_WINDOW = int(os.getenv("PAGE_WINDOW", 3))
+_page_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="page")
+
+
+def run_blocking(call, *args):
+    """Run a blocking callable on the provider pool from a coroutine."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return loop.run_in_executor(_executor, functools.partial(ctx.run, call, *args))
+
+
+async def _run_provider(name, call, timeout, detail=None):
+    start = time.perf_counter()
+    with span("fetch", detail or name):
+        try:
+            if asyncio.iscoroutinefunction(call):
+                result = await asyncio.wait_for(call(), timeout)
+            else:
+                # Provider SDKs are blocking, so run them on the provider pool.
+                # A timed-out thread cannot be killed; its late result is dropped.
+                result = await asyncio.wait_for(run_blocking(call), timeout)
+            return name, result, None, time.perf_counter() - start
+        except asyncio.TimeoutError:
+            return name, None, f"timed out after {timeout}s", time.perf_counter() - start
+        except Exception as e:
+            return name, None, f"{type(e).__name__}: {e}", time.perf_counter() - start
+
+
+async def fan_out_async(calls, timeouts=None, defaults=None):
+    """Run provider calls concurrently and collect whatever finishes in time.
+
+    Args:
+        calls (dict): Provider name -> zero-argument callable (sync or async).
+        timeouts (dict, optional): Provider name -> timeout in seconds.
+        defaults (dict, optional): Provider name -> value used when it fails.
+
+    Returns:
+        tuple: (results, errors, timings) dicts keyed by provider name.
+    """
+    timeouts = {**PROVIDER_TIMEOUTS, **(timeouts or {})}
+    defaults = defaults or {}
+    tasks = [
+        _run_provider(name, call, timeouts.get(name, DEFAULT_TIMEOUT))
+        for name, call in calls.items()
+    ]
+    results, errors, timings = {}, {}, {}
+    for name, result, error, elapsed in await asyncio.gather(*tasks):
+        timings[name] = elapsed
+        if error is not None:
+            errors[name] = error
+            result = defaults.get(name)
+        results[name] = result
+    return results, errors, timings
+
+
+async def fan_out_iter(calls, timeouts=None, limit=None, detail=None):
+    """Yield (name, result, error, elapsed) for each provider as it finishes.
+
+    With a limit, at most that many calls run at once; a call's timeout
+    starts when it gets to run. detail replaces the call name in the fetch
+    span, for calls named per request. Closing the generator early cancels
+    the calls that have not finished, so calls still waiting for a slot
+    never start; close it with contextlib.aclosing when the consumer may stop.
+    """
+    timeouts = {**PROVIDER_TIMEOUTS, **(timeouts or {})}
+    semaphore = asyncio.Semaphore(limit) if limit else None
+
+    async def run(name, call):
+        timeout = timeouts.get(name, DEFAULT_TIMEOUT)
+        if semaphore is None:
+            return await _run_provider(name, call, timeout, detail)
+        async with semaphore:
+            return await _run_provider(name, call, timeout, detail)
+
+    tasks = [asyncio.ensure_future(run(name, call)) for name, call in calls.items()]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def fan_out(calls, timeouts=None, defaults=None):
+    """Blocking wrapper around fan_out_async for sync handlers."""
+    return asyncio.run(fan_out_async(calls, timeouts, defaults))
+
+
+def fetch_pages(fetch_page, num_pages, window=None):
+    """Fetch numbered result pages concurrently and merge them in page order.
+
+    Up to `window` pages are in flight at once. Pages after the first empty
+    page are discarded, matching a sequential loop that stops at that page.
+
+    Args:
+        fetch_page (callable): Page index -> list of results for that page.
+        num_pages (int): Maximum number of pages to fetch.
+        window (int, optional): Pages in flight at once. Defaults to PAGE_WINDOW.
+
+    Returns:
+        list: Results of all pages before the first empty one, in page order.
+    """
+    window = max(1, window or PAGE_WINDOW)
+    futures = {}
+    next_page = 0
+    all_items = []
+    try:
+        for page in range(num_pages):
+            while next_page < num_pages and next_page < page + window:
+                ctx = contextvars.copy_context()
+                futures[next_page] = _page_executor.submit(ctx.run, fetch_page, next_page)
+                next_page += 1
+            items = futures.pop(page).result()
+            if not items:
+                break
+            all_items.extend(items)
+    finally:
+        for future in futures.values():
+            future.cancel()
+    return all_items
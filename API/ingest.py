@@ -0,0 +1,65 @@
+import hashlib
+import threading
+
+from metrics import span, register_stats
+
+# Running totals across all ingestions in this process
+ingest_stats = {"embedded": 0, "skipped": 0, "deleted": 0}
+_stats_lock = threading.Lock()
+register_stats("ingest", lambda: dict(ingest_stats))
+
+
+def content_id(doc):
+    """Deterministic id from the chunk text and the trip/category it belongs to."""
+    meta = doc.metadata
+    key = f"{meta.get('trip_id', '')}\n{meta.get('category', '')}\n{doc.page_content}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def upsert_documents(vector_store, docs):
+    """Store documents, embedding only chunks that are not already stored.
+
+    Chunks already present keep their vectors and only get their metadata
+    (expiry, request id) refreshed. Chunks left over from an earlier fetch of
+    the same trip and category are deleted.
+
+    Returns:
+        dict: Counts of embedded, skipped and deleted chunks.
+    """
+    with span("chroma_add"):
+        return _upsert_documents(vector_store, docs)
+
+
+def _upsert_documents(vector_store, docs):
+    unique = {}
+    for doc in docs:
+        unique.setdefault(content_id(doc), doc)
+    ids = list(unique)
+    if not ids:
+        return {"embedded": 0, "skipped": 0, "deleted": 0}
+
+    existing = set(vector_store.get(ids=ids, include=[])["ids"])
+    new_ids = [i for i in ids if i not in existing]
+    if new_ids:
+        vector_store.add_documents([unique[i] for i in new_ids], ids=new_ids)
+    if existing:
+        kept = list(existing)
+        vector_store._collection.update(ids=kept, metadatas=[unique[i].metadata for i in kept])
+
+    stale = []
+    scopes = {(d.metadata.get("trip_id"), d.metadata.get("category")) for d in unique.values()}
+    for trip_id, category in scopes:
+        if trip_id is None or category is None:
+            continue
+        stored = vector_store.get(
+            where={"$and": [{"trip_id": trip_id}, {"category": category}]}, include=[]
+        )["ids"]
+        stale.extend(i for i in stored if i not in unique)
+    if stale:
+        vector_store.delete(ids=stale)
+
+    counts = {"embedded": len(new_ids), "skipped": len(docs) - len(new_ids), "deleted": len(stale)}
+    with _stats_lock:
+        for name, value in counts.items():
+            ingest_stats[name] += value
+    return counts
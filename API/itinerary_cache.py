@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from cache import LazyConnection
+from locations import locations
+from metrics import span
+
+ITINERARY_CACHE_DB_PATH = os.getenv("ITINERARY_CACHE_DB_PATH", "./itinerary_cache.db")
+# Seconds a generated itinerary may be reused; 0 turns the cache off. Hotel
+# prices are cached for 6 hours, so plans older than that quote stale prices.
+ITINERARY_CACHE_TTL = int(os.getenv("ITINERARY_CACHE_TTL", 6 * 60 * 60))
+ITINERARY_CACHE_MAX_ENTRIES = int(os.getenv("ITINERARY_CACHE_MAX_ENTRIES", 1000))
+# Cosine similarity of the request embeddings needed for a reuse
+ITINERARY_CACHE_MIN_SIMILARITY = float(os.getenv("ITINERARY_CACHE_MIN_SIMILARITY", 0.95))
+# Largest relative change of budget and hotel price range, and of adult count, that may reuse a plan
+ITINERARY_CACHE_PRICE_TOLERANCE = float(os.getenv("ITINERARY_CACHE_PRICE_TOLERANCE", 0.1))
+ITINERARY_CACHE_MAX_ADULT_DIFF = int(os.getenv("ITINERARY_CACHE_MAX_ADULT_DIFF", 1))
+
+# Fields that change what the plan has to contain; a plan is only reused for
+# the same values. Budget, prices and adults may differ within the tolerances.
+EXACT_FIELDS = ("from_city", "to_city", "departure_date", "return_date", "days",
+                "num_children", "children_ages")
+PRICE_FIELDS = ("budget", "min_price", "max_price")
+
+
+def _city(name):
+    record = locations.resolve(name)
+    return record["city"] if record else " ".join(str(name).lower().split())
+
+
+def normalize_request(user_input):
+    """The fields of a TravelRequest that matter to the plan, with cities resolved."""
+    request = {field: user_input.get(field) for field in EXACT_FIELDS + PRICE_FIELDS + ("num_adults",)}
+    request["from_city"] = _city(user_input["from_city"])
+    request["to_city"] = _city(user_input["to_city"])
+    request["children_ages"] = sorted(user_input.get("children_ages") or [])
+    return request
+
+
+def partition_key(request):
+    return json.dumps([request[field] for field in EXACT_FIELDS], separators=(",", ":"))
+
+
+def request_text(request):
+    """Sentence describing a request; its embedding is compared between requests."""
+    return (
+        f"Trip from {request['from_city']} to {request['to_city']} for {request['days']} days, "
+        f"{request['departure_date']} to {request['return_date']}, {request['num_adults']} adults and "
+        f"{request['num_children']} children, total budget INR {request['budget']}, "
+        f"hotels between INR {request['min_price']} and {request['max_price']} per night"
+    )
+
+
+def constraint_mismatch(request, cached):
+    """Name of the first soft constraint that rules out reuse, or None."""
+    for field in PRICE_FIELDS:
+        old, new = cached[field] or 0, request[field] or 0
+        if abs(new - old) > ITINERARY_CACHE_PRICE_TOLERANCE * max(abs(old), 1):
+            return field
+    if abs(request["num_adults"] - cached["num_adults"]) > ITINERARY_CACHE_MAX_ADULT_DIFF:
+        return "num_adults"
+    return None
+
+
+def adapt(itinerary, request, cached):
+    """Prefix a reused plan with the constraints it was made for when they differ."""
+    changes = [
+        f"{label} {cached[field]} (you asked for {request[field]})"
+        for field, label in (("budget", "a budget of INR"), ("num_adults", "adults:"),
+                             ("min_price", "hotels from INR"), ("max_price", "hotels up to INR"))
+        if request[field] != cached[field]
+    ]
+    if not changes:
+        return itinerary
+    return f"> Note: this plan was prepared for {'; '.join(changes)}.\n\n{itinerary}"
+
+
+class ItineraryCache:
+    """Semantic cache of generated itineraries, persisted in SQLite.
+
+    Requests are partitioned on the fields that must match exactly (route,
+    dates, days and children). Within a partition the closest earlier request
+    by embedding similarity is reused if it passes the similarity threshold
+    and the budget, price and adult tolerances. Entries expire after ttl
+    seconds and the least recently used ones are evicted beyond max_entries.
+
+    Args:
+        embed (callable): Maps a list of texts to a list of vectors.
+        namespace (str): Part of every partition, so apps that build their
+            prompts from different templates never reuse each other's plans
+            even when they share the database.
+    """
+
+    def __init__(self, embed, path=ITINERARY_CACHE_DB_PATH, ttl=ITINERARY_CACHE_TTL,
+                 max_entries=ITINERARY_CACHE_MAX_ENTRIES, min_similarity=ITINERARY_CACHE_MIN_SIMILARITY,
+                 namespace=""):
+        self.embed = embed
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        self.counts = {"lookups": 0, "exact_hits": 0, "adapted_hits": 0, "misses": 0,
+                       "rejected_similarity": 0, "rejected_constraints": 0, "stored": 0}
+        self._lock = threading.Lock()
+        self._conn = LazyConnection(path, [
+            "CREATE TABLE IF NOT EXISTS itineraries ("
+            "id INTEGER PRIMARY KEY, partition TEXT, request TEXT, vector BLOB, "
+            "itinerary TEXT, expires_at REAL, accessed_at REAL)",
+            "CREATE INDEX IF NOT EXISTS itineraries_partition ON itineraries (partition)",
+            "CREATE INDEX IF NOT EXISTS itineraries_accessed ON itineraries (accessed_at)",
+        ])
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _vector(self, request):
+        vector = np.asarray(self.embed([request_text(request)])[0], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _partition(self, request):
+        return f"{self.namespace}:{partition_key(request)}"
+
+    def lookup(self, user_input):
+        """Return (itinerary or None, lookup state to pass to store on a miss)."""
+        with span("itinerary_cache"):
+            return self._lookup(user_input)
+
+    def _lookup(self, user_input):
+        request = normalize_request(user_input)
+        if not self.enabled:
+            return None, (request, None)
+        self._count("lookups")
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, request, vector, itinerary FROM itineraries WHERE partition = ? AND expires_at > ?",
+                (self._partition(request), now),
+            ).fetchall()
+        vector = self._vector(request)
+        if not rows:
+            self._count("misses")
+            return None, (request, vector)
+
+        cached = [json.loads(row[1]) for row in rows]
+        similarities = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32).reshape(
+            len(rows), -1) @ vector
+        # An identical request wins over any near match
+        order = sorted(range(len(rows)), key=lambda i: (cached[i] != request, -similarities[i]))
+        rejected = None
+        for i in order:
+            exact = cached[i] == request
+            if not exact and similarities[i] < self.min_similarity:
+                rejected = rejected or "rejected_similarity"
+                break
+            if constraint_mismatch(request, cached[i]):
+                rejected = "rejected_constraints"
+                continue
+            row_id, itinerary = rows[i][0], rows[i][3]
+            with self._lock:
+                self._conn.execute("UPDATE itineraries SET accessed_at = ? WHERE id = ?", (now, row_id))
+                self._conn.commit()
+            self._count("exact_hits" if exact else "adapted_hits")
+            return (itinerary if exact else adapt(itinerary, request, cached[i])), (request, vector)
+        self._count(rejected)
+        self._count("misses")
+        return None, (request, vector)
+
+    def store(self, state, itinerary):
+        request, vector = state
+        if not self.enabled or not itinerary:
+            return
+        if vector is None:
+            vector = self._vector(request)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO itineraries (partition, request, vector, itinerary, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self._partition(request), json.dumps(request), vector.astype(np.float32).tobytes(),
+                 itinerary, now + self.ttl, now),
+            )
+            self._conn.execute("DELETE FROM itineraries WHERE expires_at <= ?", (now,))
+            # Evict least recently used entries beyond the size bound
+            self._conn.execute(
+                "DELETE FROM itineraries WHERE id IN ("
+                "SELECT id FROM itineraries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+            self.counts["stored"] += 1
+
+    def get_or_generate(self, user_input, generate):
+        """Return a reusable itinerary for user_input, calling generate() on a miss."""
+        itinerary, state = self.lookup(user_input)
+        if itinerary is not None:
+            return itinerary
+        itinerary = generate()
+        self.store(state, itinerary)
+        return itinerary
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+            size = self._conn.execute("SELECT COUNT(*) FROM itineraries").fetchone()[0]
+        hits = counts["exact_hits"] + counts["adapted_hits"]
+        return {**counts, "hits": hits, "hit_rate": round(hits / counts["lookups"], 3) if counts["lookups"] else None,
+                "size": size}
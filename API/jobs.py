@@ -0,0 +1,206 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from cache import make_key, LazyConnection
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "./jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", 500))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+# Finished jobs are reused for identical submissions for this many seconds
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", 60 * 60))
+# A running job's worker refreshes it every third of this; one left longer
+# belongs to a process that died and may be taken over
+JOB_LEASE = int(os.getenv("JOB_LEASE", 60))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobStore:
+    """Persistent job records in SQLite so results and retries survive restarts."""
+
+    def __init__(self, path=JOB_DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = LazyConnection(path, [
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, fingerprint TEXT, status TEXT, payload TEXT, "
+            "result TEXT, error TEXT, attempts INTEGER, created_at REAL, updated_at REAL)",
+            "CREATE INDEX IF NOT EXISTS jobs_fingerprint ON jobs (fingerprint)",
+        ], row_factory=sqlite3.Row)
+
+    def _row(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row)
+
+    def find_reusable(self, fingerprint, result_ttl):
+        """Latest job for the same submission that is pending or recently done."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE fingerprint = ? AND "
+                "(status IN (?, ?) OR (status = ? AND updated_at > ?)) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (fingerprint, QUEUED, RUNNING, DONE, time.time() - result_ttl),
+            ).fetchone()
+        return self._row(row)
+
+    def create(self, fingerprint, payload):
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, NULL, NULL, 0, ?, ?)",
+                (job_id, fingerprint, QUEUED, json.dumps(payload), now, now),
+            )
+            self._conn.commit()
+        return self.get(job_id)
+
+    def update(self, job_id, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id)
+            )
+            self._conn.commit()
+
+    def claim(self, job_id, stale_before):
+        """Mark a job running for this worker if it is queued or its lease lapsed before stale_before.
+
+        One conditional UPDATE, so when several processes share the database
+        exactly one of them gets the job.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ? AND (status = ? OR (status = ? AND updated_at < ?))",
+                (RUNNING, now, job_id, QUEUED, RUNNING, stale_before),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def touch(self, job_id):
+        """Refresh the lease of a running job."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING)
+            )
+            self._conn.commit()
+
+    def unfinished(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def count(self, *statuses):
+        marks = ",".join("?" * len(statuses))
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE status IN ({marks})", statuses
+            ).fetchone()[0]
+
+
+class JobQueue:
+    """Runs jobs on a bounded worker pool with retries and submission dedup.
+
+    Args:
+        store (JobStore): Where job state and results are persisted.
+        handler (callable): Payload dict -> JSON-serialisable result.
+        fingerprint (callable, optional): Payload -> dedup key.
+    """
+
+    def __init__(self, store, handler, fingerprint=make_key, workers=JOB_WORKERS,
+                 max_pending=JOB_MAX_PENDING, max_attempts=JOB_MAX_ATTEMPTS,
+                 result_ttl=JOB_RESULT_TTL, lease=JOB_LEASE):
+        self.store = store
+        self.handler = handler
+        self.fingerprint = fingerprint
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self.lease = lease
+        self._submit_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def submit(self, payload):
+        """Queue a job, or return the existing job for an identical submission."""
+        fingerprint = self.fingerprint(payload)
+        with self._submit_lock:
+            job = self.store.find_reusable(fingerprint, self.result_ttl)
+            if job is not None:
+                return job
+            if self.store.count(QUEUED, RUNNING) >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} jobs already pending")
+            job = self.store.create(fingerprint, payload)
+        self._executor.submit(self._run, job["id"])
+        return job
+
+    def resume(self):
+        """Pick up jobs left queued or running by a process that stopped.
+
+        Every uvicorn worker calls this at startup, so each job is claimed
+        before it runs and only one worker gets it. A running job is only
+        taken over once its lease lapses; one still fresh is checked again
+        when it could have lapsed, since its worker may have just died.
+        """
+        jobs = self.store.unfinished()
+        for job in jobs:
+            wait = job["updated_at"] + self.lease - time.time() if job["status"] == RUNNING else 0
+            if wait > 0:
+                timer = threading.Timer(wait + 1, self._executor.submit, (self._run, job["id"]))
+                timer.daemon = True
+                timer.start()
+            else:
+                self._executor.submit(self._run, job["id"])
+        return len(jobs)
+
+    def _heartbeat(self, job_id, finished):
+        while not finished.wait(self.lease / 3):
+            self.store.touch(job_id)
+
+    def _run(self, job_id):
+        if not self.store.claim(job_id, stale_before=time.time() - self.lease):
+            # Another worker has it, or it already finished
+            return
+        job = self.store.get(job_id)
+        attempts = job["attempts"]
+        finished = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job_id, finished), daemon=True).start()
+        try:
+            result = self.handler(job["payload"])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempts < self.max_attempts:
+                print(f"Job {job_id} attempt {attempts} failed, retrying: {error}")
+                self.store.update(job_id, status=QUEUED, error=error)
+                # Back off with jitter, off the worker pool so other jobs keep running
+                delay = 2 ** attempts + random.random()
+                threading.Timer(delay, self._executor.submit, (self._run, job_id)).start()
+            else:
+                self.store.update(job_id, status=FAILED, error=error)
+            return
+        finally:
+            finished.set()
+        self.store.update(job_id, status=DONE, result=result, error=None)
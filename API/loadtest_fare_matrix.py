@@ -0,0 +1,142 @@
+"""Load test the fare matrix against a local stub of SerpAPI.
+
+Starts an HTTP stub that answers Google Flights searches with the saved
+fixture after STUB_DELAY seconds, with prices varied per route and date.
+Searches a routes x dates matrix one cell at a time (what a client does with
+/flights), then with fare_matrix, then streams the same matrix again. Checks
+that no more than MATRIX_CONCURRENCY searches reach the stub at once, that
+the repeat is served from the response cache, and that a client leaving
+after the first cell stops the searches that have not started.
+
+Run from the API directory:
+    python loadtest_fare_matrix.py [--days 7] [--concurrency 4]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+_state_dir = tempfile.mkdtemp()
+os.environ.update({
+    "CACHE_DB_PATH": os.path.join(_state_dir, "cache.db"),
+    "QUOTA_DB_PATH": os.path.join(_state_dir, "quota.db"),
+    "SERPAPI_RATE": "1000",
+    "SERPAPI_BURST": "1000",
+})
+
+import providers
+import fare_matrix
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+STUB_DELAY = 0.5
+ORIGINS, DESTINATIONS = ["BOM", "DEL"], ["GOI"]
+stub = {"calls": 0, "active": 0, "peak": 0}
+stub_lock = threading.Lock()
+
+with open(os.path.join(FIXTURES_DIR, "google_flights.json")) as f:
+    FLIGHTS = json.load(f)
+
+
+class StubSerpApi(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        with stub_lock:
+            stub["calls"] += 1
+            stub["active"] += 1
+            stub["peak"] = max(stub["peak"], stub["active"])
+        time.sleep(STUB_DELAY)
+        with stub_lock:
+            stub["active"] -= 1
+        # A different price per route and date, so the grid has a cheapest cell
+        bump = sum(map(ord, query.get("departure_id", "") + query.get("outbound_date", ""))) % 17 * 100
+        result = json.loads(json.dumps(FLIGHTS))
+        for option in result["best_flights"] + result["other_flights"]:
+            option["price"] += bump
+        body = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+async def stream(cells, concurrency):
+    start, first = time.perf_counter(), None
+    events = 0
+    async for event in fare_matrix.matrix_events(cells, concurrency):
+        if event.startswith("event: cell"):
+            events += 1
+            first = first or time.perf_counter() - start
+    return events, first, time.perf_counter() - start
+
+
+async def leave_early(cells, concurrency):
+    """Read the first cell, then close the stream as a disconnecting client does."""
+    events = fare_matrix.matrix_events(cells, concurrency)
+    async for event in events:
+        if event.startswith("event: cell"):
+            break
+    await events.aclose()
+    # Searches already running finish; nothing else may start
+    await asyncio.sleep(STUB_DELAY * 2)
+
+
+def run(days, concurrency):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSerpApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    providers.SERPAPI_URL = f"http://127.0.0.1:{server.server_port}/search.json"
+    providers.session.trust_env = False
+
+    end_date = (datetime.date(2025, 6, 1) + datetime.timedelta(days=days - 1)).isoformat()
+    cells = fare_matrix.matrix_cells(ORIGINS, DESTINATIONS, "2025-06-01", end_date)
+    print(f"{len(cells)} cells: {', '.join(ORIGINS)} -> {', '.join(DESTINATIONS)} over {days} days")
+
+    # One /flights call per cell, as a client with flexible dates does today
+    serial_cells = fare_matrix.matrix_cells(ORIGINS, DESTINATIONS, "2025-07-01", "2025-07-01")
+    start = time.perf_counter()
+    for origin, destination, date in serial_cells:
+        providers.get_flights(origin, destination, date)
+    per_cell = (time.perf_counter() - start) / len(serial_cells)
+    print(f"Serial:   {per_cell * len(cells):.2f}s estimated ({per_cell:.2f}s per cell)")
+
+    stub.update(calls=0, peak=0)
+    start = time.perf_counter()
+    grid = fare_matrix.fare_matrix(cells, concurrency)
+    elapsed = time.perf_counter() - start
+    cheapest = grid["cheapest"]
+    print(f"Matrix:   {elapsed:.2f}s, {stub['calls']} searches, at most {stub['peak']} at once; "
+          f"cheapest {cheapest['route']} on {cheapest['date']} at INR {cheapest['price']}")
+    assert stub["calls"] == len(cells) and stub["peak"] <= concurrency, stub
+    assert not grid["errors"] and all(all(row) for row in grid["grid"].values()), grid
+
+    stub.update(calls=0)
+    events, first, total = asyncio.run(stream(cells, concurrency))
+    print(f"Repeat:   {events} cells streamed, first after {first * 1000:.1f}ms, all after {total * 1000:.1f}ms, "
+          f"{stub['calls']} searches")
+    assert stub["calls"] == 0 and events == len(cells)
+
+    stub.update(calls=0)
+    # Dates not searched above, so nothing is answered from the cache
+    later_end = (datetime.date(2025, 8, 1) + datetime.timedelta(days=days - 1)).isoformat()
+    later = fare_matrix.matrix_cells(ORIGINS, DESTINATIONS, "2025-08-01", later_end)
+    asyncio.run(leave_early(later, concurrency))
+    print(f"Leave:    client gone after the first of {len(later)} cells, {stub['calls']} searches made")
+    assert stub["calls"] <= concurrency + 1, stub
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--concurrency", type=int, default=fare_matrix.MATRIX_CONCURRENCY)
+    args = parser.parse_args()
+    run(args.days, args.concurrency)
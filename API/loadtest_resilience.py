@@ -0,0 +1,119 @@
+"""Load test the provider guard against a local stub that throttles and fails.
+
+Starts an HTTP stub on localhost and sends concurrent calls through a
+ProviderGuard in three phases:
+- healthy: calls are spread out by the per-key token bucket
+- outage: the stub returns 500s; the circuit opens after a few failures and
+  the remaining callers fail fast instead of hanging on retries
+- recovery: after the reset timeout one probe call closes the circuit again
+
+Run from the API directory:
+    python loadtest_resilience.py [num_callers]
+"""
+import json
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import os
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import resilience
+from resilience import CircuitBreaker, ProviderError, ProviderGuard, QuotaCounter, check_response
+
+STUB_DELAY = 0.05
+RATE = 20
+BURST = 5
+RESET_TIMEOUT = 1.0
+stub = {"status": 200, "hits": 0}
+stub_lock = threading.Lock()
+
+
+class StubProvider(BaseHTTPRequestHandler):
+    def do_GET(self):
+        with stub_lock:
+            stub["hits"] += 1
+            status = stub["status"]
+        time.sleep(STUB_DELAY)
+        body = json.dumps({"local_results": [{"title": "Baga Beach"}]} if status == 200 else {}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def phase(guard, url, num_callers, status):
+    with stub_lock:
+        stub["status"], stub["hits"] = status, 0
+    session = requests.Session()
+
+    def search(i):
+        def call():
+            response = session.get(url, timeout=5)
+            check_response("stub", response)
+            return response.json()
+        start = time.perf_counter()
+        try:
+            guard.call(call, api_key="test-key")
+            outcome = "ok"
+        except ProviderError as e:
+            outcome = type(e).__name__
+        return outcome, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_callers) as pool:
+        results = list(pool.map(search, range(num_callers)))
+    elapsed = time.perf_counter() - start
+    outcomes = {}
+    for outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    p50 = statistics.median(seconds for _, seconds in results)
+    return outcomes, stub["hits"], elapsed, p50
+
+
+def run(num_callers=40):
+    # Short backoff so the outage phase finishes quickly
+    resilience.RETRY_BASE_DELAY = 0.05
+    resilience.RETRY_MAX_DELAY = 0.2
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubProvider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/search.json"
+    guard = ProviderGuard(
+        "stub", RATE, BURST, QuotaCounter(os.path.join(tempfile.mkdtemp(), "quota.db")),
+        max_wait=10, breaker=CircuitBreaker(failure_threshold=5, reset_timeout=RESET_TIMEOUT),
+    )
+
+    print(f"{'phase':>9} {'outcomes':>40} {'upstream hits':>14} {'wall':>7} {'p50':>7}")
+    report = []
+    for name, status in (("healthy", 200), ("outage", 500)):
+        outcomes, hits, elapsed, p50 = phase(guard, url, num_callers, status)
+        report.append((name, outcomes, hits))
+        print(f"{name:>9} {json.dumps(outcomes):>40} {hits:>14} {elapsed:>6.2f}s {p50:>6.2f}s")
+
+    time.sleep(RESET_TIMEOUT)
+    outcomes, hits, elapsed, p50 = phase(guard, url, 1, 200)
+    report.append(("recovery", outcomes, hits))
+    print(f"{'recovery':>9} {json.dumps(outcomes):>40} {hits:>14} {elapsed:>6.2f}s {p50:>6.2f}s")
+    server.shutdown()
+    print(json.dumps(guard.stats(), indent=2))
+
+    healthy, outage, recovery = report
+    # Burst, then RATE per second
+    min_wall = (num_callers - BURST) / RATE
+    assert healthy[1] == {"ok": num_callers}, healthy
+    assert outage[2] < num_callers, f"expected the circuit to shed load, got {outage[2]} upstream hits"
+    assert outage[1].get("CircuitOpen", 0) > 0, outage
+    assert recovery[1] == {"ok": 1} and guard.breaker.state == CircuitBreaker.CLOSED
+    print(f"Healthy phase needed at least {min_wall:.2f}s at {RATE} calls/s")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 40)
@@ -0,0 +1,75 @@
+"""Load test request coalescing against a local stub provider.
+
+Starts a slow HTTP stub on localhost, fires N concurrent identical searches
+through SingleFlight and checks the stub served exactly one request.
+
+Run from the API directory:
+    python loadtest_singleflight.py [num_requests]
+"""
+import json
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cache import make_key
+from singleflight import SingleFlight
+
+STUB_DELAY = 1.0
+upstream_calls = 0
+upstream_lock = threading.Lock()
+
+
+class StubProvider(BaseHTTPRequestHandler):
+    def do_GET(self):
+        global upstream_calls
+        with upstream_lock:
+            upstream_calls += 1
+        time.sleep(STUB_DELAY)
+        body = json.dumps({"local_results": [{"title": "Baga Beach"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(num_requests=50):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubProvider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/search.json"
+    flight = SingleFlight()
+    start_gate = threading.Barrier(num_requests)
+
+    def search(i):
+        # Same query from every caller; only the api_key differs
+        params = {"engine": "google_local", "q": "beaches in Goa", "api_key": f"user-{i}"}
+        start_gate.wait()
+        return flight.do(
+            make_key(params),
+            lambda: json.load(urllib.request.urlopen(url, timeout=10))
+        )
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_requests) as pool:
+        results = list(pool.map(search, range(num_requests)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    stats = flight.stats()
+    print(f"Concurrent requests: {num_requests}")
+    print(f"Upstream calls:      {upstream_calls}")
+    print(f"Coalesced callers:   {stats['coalesced']}")
+    print(f"Wall time:           {elapsed:.2f}s (stub delay {STUB_DELAY:.2f}s)")
+    assert upstream_calls == 1, f"expected 1 upstream call, got {upstream_calls}"
+    assert stats["coalesced"] == num_requests - 1
+    assert all(r == results[0] for r in results)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
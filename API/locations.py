@@ -0,0 +1,171 @@
+import json
+import math
+import os
+import re
+import threading
+
+LOCATIONS_PATH = os.getenv(
+    "LOCATIONS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "locations.json"),
+)
+# Cities without their own airport fly from the nearest one within this distance
+MAX_AIRPORT_DISTANCE_KM = int(os.getenv("MAX_AIRPORT_DISTANCE_KM", 250))
+# Edits allowed between a misspelt city and a city name or alias, by length
+# of the input: one from 4 letters ("Dehli"), two from 8 ("Hyderbad")
+MAX_EDITS = ((4, 1), (8, 2))
+FUZZY_CACHE_SIZE = 10000
+
+
+class UnknownCity(ValueError):
+    pass
+
+
+def normalize(name):
+    """Lowercase, drop any ", state" suffix and punctuation, collapse spaces."""
+    name = name.split(",")[0].lower()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", name).split())
+
+
+def edit_distance(a, b, limit):
+    """Edits (insert, delete, substitute, swap adjacent letters) from a to b, or limit + 1 if more."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, row = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, row = previous, row, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            row[j] = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], before[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+    return row[-1]
+
+
+def allowed_edits(length):
+    return max((edits for at_least, edits in MAX_EDITS if length >= at_least), default=0)
+
+
+def deletions(word, depth):
+    """word and every string made by deleting up to depth of its letters."""
+    found, frontier = {word}, {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 6371 * 2 * math.asin(math.sqrt(a))
+
+
+class LocationIndex:
+    """Airport and railway station codes for Indian cities.
+
+    Built once from the bundled data file. Every city name, alias and code is
+    mapped to a prebuilt record, so a lookup is a dict access; nearest
+    airports are computed at load time. Misspelt names fall back to a small
+    edit distance from a city name or alias, and the result is remembered.
+    Names within the allowed edits of an input always share a string with it
+    once a few letters are deleted from each, so a deletion index built at
+    load time narrows the search to a handful of names.
+    """
+
+    def __init__(self, path=LOCATIONS_PATH, max_airport_km=MAX_AIRPORT_DISTANCE_KM):
+        with open(path) as f:
+            data = json.load(f)
+        self.airports = data["airports"]
+        self.stations = data["stations"]
+        self.max_airport_km = max_airport_km
+        self._by_name = {}
+        records = []
+        # Names and aliases, without codes, by the strings left after deleting
+        # letters from them, for the edit distance fallback
+        self._deletions = {}
+        for city in data["cities"]:
+            iata, airport_km = city.get("airport"), 0
+            if iata is None:
+                iata, airport_km = self.nearest_airport(city["lat"], city["lon"])
+            record = {
+                "city": city["name"],
+                "iata": iata,
+                "airport_distance_km": airport_km,
+                "station": city.get("station"),
+                "lat": city["lat"],
+                "lon": city["lon"],
+            }
+            records.append((record, [city.get("airport"), city.get("station")]))
+            for name in [city["name"], *city.get("aliases", [])]:
+                name = normalize(name)
+                self._by_name[name] = record
+                # Deep enough for the longest input that may still match this name
+                for variant in deletions(name, allowed_edits(len(name) + MAX_EDITS[-1][1])):
+                    self._deletions.setdefault(variant, set()).add(name)
+        # "BLR" or "NDLS" also resolve to their city, unless the code is a name
+        for record, codes in records:
+            for code in codes:
+                if code:
+                    self._by_name.setdefault(normalize(code), record)
+        self._fuzzy = {}
+        self._lock = threading.Lock()
+
+    def nearest_airport(self, lat, lon):
+        """(IATA code, km) of the closest airport, or (None, None) if none is in range."""
+        code, km = min(
+            ((code, distance_km(lat, lon, a["lat"], a["lon"])) for code, a in self.airports.items()),
+            key=lambda item: item[1],
+        )
+        if km > self.max_airport_km:
+            return None, None
+        return code, round(km)
+
+    def resolve(self, city):
+        """Location record for a city name, alias or code, or None if unknown."""
+        if not city:
+            return None
+        key = normalize(city)
+        record = self._by_name.get(key)
+        if record is not None:
+            return record
+        if key in self._fuzzy:
+            return self._fuzzy[key]
+        # Searched outside the lock, so concurrent lookups do not wait on each other
+        record = self._closest(key)
+        with self._lock:
+            if len(self._fuzzy) >= FUZZY_CACHE_SIZE:
+                self._fuzzy.clear()
+            self._fuzzy[key] = record
+        return record
+
+    def _closest(self, key):
+        """Record of the only city within the allowed edits of key, or None."""
+        limit = allowed_edits(len(key))
+        if not limit:
+            return None
+        candidates = set()
+        for variant in deletions(key, limit):
+            candidates |= self._deletions.get(variant, set())
+        best, found = limit, {}
+        for name in sorted(candidates):
+            distance = edit_distance(key, name, best)
+            if distance > best:
+                continue
+            if distance < best:
+                best, found = distance, {}
+            record = self._by_name[name]
+            found[id(record)] = record
+        # Two different cities equally close: do not guess
+        return next(iter(found.values())) if len(found) == 1 else None
+
+    def require(self, city):
+        record = self.resolve(city)
+        if record is None:
+            raise UnknownCity(f"Unknown city: {city!r}")
+        return record
+
+
+locations = LocationIndex()
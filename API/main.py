@@ -1,24 +1,51 @@
 import os
-import requests
-import chromadb
+import math
+import json
+import time
+import asyncio
 from dotenv import load_dotenv
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_groq import ChatGroq
-from langchain.schema import Document
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
-from fastapi import FastAPI, Request, Query
-from pydantic import BaseModel
+from fastapi import FastAPI, Request, Query, HTTPException
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from serpapi import GoogleSearch
-from langchain_community.document_loaders import ScrapingAntLoader
+from fastapi.responses import StreamingResponse, JSONResponse
 import uvicorn
+from contextlib import asynccontextmanager
+import providers
+from providers import itinerary_calls, check_cities, PROVIDER_DEFAULTS, response_cache, provider_flight
+from locations import UnknownCity
+from resilience import ProviderError, ProviderUnavailable, quota_report
+from fetch import fan_out, fan_out_iter
+from cache import make_key
+from singleflight import SingleFlight
+from trips import trip_key, trip_scope
+from documents import build_documents
+import resources
+from resources import get_embeddings, get_vector_store, get_llm, RESOURCE_WARM_UP
+from jobs import JobQueue, JobStore, QueueFull, JOB_DB_PATH
+from ingest import upsert_documents, ingest_stats
+from itinerary_cache import ItineraryCache
+from fare_matrix import matrix_cells, fare_matrix, matrix_events
+from prompt_context import build_context, record as record_prompt, context_stats, CATEGORY_QUERIES
+from ranking import rank_travel_data, ranking_stats
+from planner import plan_days, journeys, skeleton_text, public_plan, DAY_PLANNER, PLANNED_CATEGORIES
+import metrics
+from metrics import span
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load the embedding model, Chroma and the LLM client before serving so
+    # the first request does not pay for them; with RESOURCE_WARM_UP=0 they
+    # are created on first use instead.
+    if RESOURCE_WARM_UP:
+        await asyncio.to_thread(resources.warm_up)
+    resumed = job_queue.resume()
+    if resumed:
+        print(f"Resumed {resumed} unfinished itinerary jobs")
+    yield
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -27,103 +54,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Stage timings and counters on GET /metrics, and the Server-Timing header
+metrics.instrument(app)
+
 # Load environment variables
 load_dotenv()
-SERP_API_KEY = os.getenv("SERP_API_KEY")
-ANT_SCRAPY_API_KEY = os.getenv("ANT_SCRAPY_API_KEY")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-CHROMA_DB_PATH = "./chroma_db"
-
-# Initialize embeddings and ChromaDB
-embedding_function = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-chroma_client = Chroma(persist_directory=CHROMA_DB_PATH, 
-                      embedding_function=embedding_function, 
-                      collection_name="travel_data")
-retriever = chroma_client.as_retriever()
-
-# Initialize LLM
-llm = ChatGroq(model_name="llama-3.3-70b-versatile", api_key=GROQ_API_KEY)
-
-# City code lookups
-iata_code_lookup = {
-    "New Delhi": "DEL",
-    "Mumbai": "BOM",
-    "Bangalore": "BLR",
-    "Hyderabad": "HYD",
-    "Chennai": "MAA",
-    "Kolkata": "CCU",
-    "Pune": "PNQ",
-    "Ahmedabad": "AMD",
-    "Jaipur": "JAI",
-    "Bhopal": "BPL",
-    "Lucknow": "LKO",
-    "Goa": "GOI",
-    "Patna": "PAT",
-    "Guwahati": "GAU",
-    "Nagpur": "NAG",
-    "Visakhapatnam": "VTZ",
-    "Coimbatore": "CJB",
-    "Thiruvananthapuram": "TRV",
-    "Indore": "IDR",
-    "Varanasi": "VNS"
-}
-
-station_code_lookup = {
-    "New Delhi": "NDLS",
-    "Mumbai": "CSTM",   
-    "Bangalore": "SBC",
-    "Hyderabad": "HYB",
-    "Chennai": "MAS",
-    "Kolkata": "HWH",   
-    "Pune": "PUNE",
-    "Ahmedabad": "ADI",
-    "Jaipur": "JP",
-    "Bhopal": "BPL",
-    "Lucknow": "LKO",
-    "Goa": "MAO",        
-    "Patna": "PNBE",
-    "Guwahati": "GHY",
-    "Nagpur": "NGP",
-    "Visakhapatnam": "VSKP",
-    "Coimbatore": "CBE",
-    "Thiruvananthapuram": "TVC",
-    "Indore": "INDB",
-    "Varanasi": "BSB"
-}
-
-# Helper functions
-def get_station_code(city):
-    return station_code_lookup.get(city, None)
-
-def get_iata_code(city):
-    return iata_code_lookup.get(city, None)
-
-def fetch_data(endpoint, params=None):
-    base_url = "http://localhost:8000"  # Using the same app now
-    response = requests.get(f"{base_url}{endpoint}", params=params)
-    return response.json()
+
+# The embedder, Chroma client and LLM are lazy singletons in resources.py
+
+# Coalesce identical itinerary data fetches
+travel_data_flight = SingleFlight()
+
+# Batch endpoint limits: items per call, requests fetching and building
+# prompts at once, and LLM generations at once
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 50))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", 4))
+
+# Reuse itineraries generated for near-identical requests instead of calling the LLM
+# Namespaced because the other app shares the database but prompts from its own template
+itinerary_cache = ItineraryCache(lambda texts: get_embeddings().embed_documents(texts), namespace="main")
+metrics.register_stats("itinerary_cache", itinerary_cache.stats)
+metrics.register_stats("singleflight_travel_data", travel_data_flight.stats)
 
 # API Endpoints
 @app.get("/flights")
 def get_flight_details(from_location_ID: str, to_location_ID: str, departure_date: str):
-    params = {
-        "engine": "google_flights",
-        "hl": "en",
-        "gl": "us",
-        "departure_id": from_location_ID,
-        "arrival_id": to_location_ID,
-        "outbound_date": departure_date,
-        "currency": "INR",
-        "type": 2,
-        "api_key": SERP_API_KEY,
-    }
-    search = GoogleSearch(params)
-    results = search.get_dict()
-    return results
+    return providers.get_flights(from_location_ID, to_location_ID, departure_date)
+
+@app.get("/flights/matrix")
+def get_fare_matrix(origins: List[str] = Query(...), destinations: List[str] = Query(...),
+                    start_date: str = Query(...), end_date: Optional[str] = None):
+    """Cheapest flight per route and date; origins and destinations are airport codes or cities"""
+    return fare_matrix(matrix_request(origins, destinations, start_date, end_date))
+
+@app.get("/flights/matrix/stream")
+def stream_fare_matrix(origins: List[str] = Query(...), destinations: List[str] = Query(...),
+                       start_date: str = Query(...), end_date: Optional[str] = None):
+    """The fare matrix as server-sent events, one per cell as it completes"""
+    return StreamingResponse(
+        matrix_events(matrix_request(origins, destinations, start_date, end_date)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def matrix_request(origins, destinations, start_date, end_date):
+    try:
+        return matrix_cells(origins, destinations, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 class HotelRequest(BaseModel):
+    # Unknown fields get a 422 instead of being dropped; "page" was replaced by max_pages
+    model_config = ConfigDict(extra="forbid")
+
     stay_city_and_type: str
     check_in_date: str
     check_out_date: str
@@ -132,171 +119,59 @@ class HotelRequest(BaseModel):
     max_price: int
     num_children: int = 0
     children_ages: List[int] = [0]
-    page: int = 3
+    max_pages: int = 3
 
 @app.post("/hotels")
 def get_hotel_details(request: HotelRequest):
-    all_properties = []
-    for _ in range(3):
-        params = {
-            "engine": "google_hotels",
-            "hl": "en",
-            "gl": "us",
-            "q": request.stay_city_and_type,
-            "check_in_date": request.check_in_date,
-            "check_out_date": request.check_out_date,
-            "adults": request.num_adults,
-            "children": request.num_children,
-            "children_ages": request.children_ages,
-            "min_price": request.min_price,
-            "max_price": request.max_price,
-            "currency": "INR",
-            "api_key": SERP_API_KEY,
-            "start": request.page * 10,
-        }
-        search = GoogleSearch(params)
-        results = search.get_dict()
-        properties = results.get("properties", [])
-        print(properties)
-        if not properties:
-            break
-        all_properties.extend(properties)
-    return all_properties
+    hotels = providers.get_hotels(**request.model_dump())
+    # Store queries should find hotels users already searched live
+    providers.store_hotel_offers(request.stay_city_and_type, request.check_in_date, request.check_out_date,
+                                 request.num_adults, request.num_children, hotels,
+                                 complete=not request.min_price and not request.max_price and request.max_pages >= 3)
+    return hotels
 
 @app.get("/activities")
 def get_local_activities(activity_query: str, destination_city: str, num_pages: int = 3):
-    all_places = []
-    for page in range(num_pages):
-        params = {
-            "api_key": SERP_API_KEY,
-            "engine": "google_local",
-            "google_domain": "google.com",
-            "q": f"{activity_query} in {destination_city}",
-            "hl": "en",
-            "gl": "us",
-            "start": page * 20,
-        }
-        search = GoogleSearch(params)
-        results = search.get_dict()
-        places = results.get("local_results", [])
-        if not places:
-            break
-        all_places.extend(places)
-    return all_places
+    return providers.get_activities(activity_query, destination_city, num_pages)
 
 @app.get("/tourist-places")
 def get_tourist_places(place_type: str, destination_city: str, num_pages: int = 3):
-    all_places = []
-    for page in range(num_pages):
-        params = {
-            "api_key": SERP_API_KEY,
-            "engine": "google_local",
-            "google_domain": "google.com",
-            "q": f"{place_type} in {destination_city}",
-            "hl": "en",
-            "gl": "us",
-            "start": page * 20,
-        }
-        search = GoogleSearch(params)
-        results = search.get_dict()
-        places = results.get("local_results", [])
-        if not places:
-            break
-        all_places.extend(places)
-    return all_places
+    return providers.get_tourist_places(place_type, destination_city, num_pages)
 
 @app.get("/train-details")
 def get_train_details(departure_code: str, departure_name: str,
                     destination_code: str, destination_name: str,
-                    journey_date: str):
-    base_url = (
-        "https://www.railyatri.in/trains-between-stations-v2"
-        f"?from_code={departure_code}"
-        f"&from_name={departure_name.upper().replace(' ', '%20')}"
-        f"&to_code={destination_code}"
-        f"&to_name={destination_name.upper().replace(' ', '%20')}"
-        f"&journey_date={journey_date}"
-        f"&user_id=-1743734480&user_token=&device_type_id=6"
-        f"&src=ttb_landing&from_sta_code={departure_code}&to_sta_code={destination_code}"
-    )
-    loader = ScrapingAntLoader(
-        [base_url],
-        api_key=ANT_SCRAPY_API_KEY,
-        continue_on_failure=True
-    )
-    docs = loader.load()
-    return {"page_content": docs[0].page_content if docs else ""}
+                    journey_date: str, availability: bool = False):
+    return providers.get_trains(departure_code, departure_name, destination_code,
+                                destination_name, journey_date, availability)
+
+@app.get("/hotels/search")
+def search_hotels(city: str, check_in_date: str, check_out_date: str, num_adults: int = 2,
+                  num_children: int = 0, children_ages: List[int] = Query([0]),
+                  min_price: Optional[float] = None, max_price: Optional[float] = None,
+                  min_rating: Optional[float] = None, sort: str = "price", limit: int = Query(10, ge=1, le=100),
+                  lat: Optional[float] = None, lon: Optional[float] = None, radius_km: Optional[float] = None):
+    """Hotels from the local offer store; the provider is only called when the stay was not searched or expired"""
+    try:
+        return providers.search_hotels(city, check_in_date, check_out_date, num_adults, num_children,
+                                       children_ages, min_price, max_price, min_rating, sort, limit,
+                                       lat, lon, radius_km)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/places/search")
+def search_places(city: str, category: str = "tourist attractions", max_price_level: Optional[int] = None,
+                  min_rating: Optional[float] = None, sort: str = "rating", limit: int = Query(10, ge=1, le=100),
+                  lat: Optional[float] = None, lon: Optional[float] = None, radius_km: Optional[float] = None):
+    """Places such as restaurants or tourist attractions from the local offer store"""
+    try:
+        return providers.search_places(city, category, max_price_level, min_rating, sort, limit,
+                                       lat, lon, radius_km)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 # RAG functionality
-def store_in_chromadb(data_dict):
-    """Convert travel data to documents and store them in ChromaDB"""
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    for category, data in data_dict.items():
-        if not data:
-            continue
-        text = f"Category: {category}\n{str(data)}"
-        docs = [Document(page_content=chunk) for chunk in text_splitter.split_text(text)]
-        chroma_client.add_documents(docs)
-
-def get_travel_data(user_input):
-    from_iata = get_iata_code(user_input["from_city"])
-    to_iata = get_iata_code(user_input["to_city"])
-    
-    from_station_code = get_station_code(user_input["from_city"])
-    to_station_code = get_station_code(user_input["to_city"])
-
-    flight_data = get_flight_details(
-        from_location_ID=from_iata,
-        to_location_ID=to_iata,
-        departure_date=user_input["departure_date"]
-    )
-
-    hotel_data = get_hotel_details(HotelRequest(
-        stay_city_and_type=user_input["to_city"] + " hotels",
-        check_in_date=user_input["departure_date"],
-        check_out_date=user_input["return_date"],
-        num_adults=user_input["num_adults"],
-        min_price=user_input["min_price"],
-        max_price=user_input["max_price"],
-        num_children=user_input["num_children"],
-        children_ages=user_input["children_ages"],
-        page=3
-    ))
-
-    activities_data = get_local_activities(
-        activity_query="Restaurants in " + user_input["to_city"],
-        destination_city=user_input["to_city"],
-        num_pages=3
-    )
-
-    train_data = get_train_details(
-        departure_code=from_station_code,
-        departure_name=user_input["from_city"],
-        destination_code=to_station_code,
-        destination_name=user_input["to_city"],
-        journey_date=user_input["departure_date"]
-    )
-
-    tourist_places = get_tourist_places(
-        place_type="tourist attractions",
-        destination_city=user_input["to_city"],
-        num_pages=3
-    )
-
-    return flight_data, hotel_data, activities_data, train_data, tourist_places
-
-def generate_travel_plan(user_input):
-    """Generate a personalized travel plan using LLM and retrieved travel data"""
-    flight_data, hotel_data, activities_data, train_data, tourist_places = get_travel_data(user_input)
-    store_in_chromadb({
-        "Flights": flight_data,
-        "Hotels": hotel_data,
-        "Activities": activities_data,
-        "Trains": train_data,
-        "Tourist Places": tourist_places
-    })
-    
-    prompt_template = """
+PROMPT_TEMPLATE = """
     You are an expert AI Travel Assistant creating a comprehensive travel itinerary. Based on the user's constraints and the retrieved travel data, generate a detailed, day-by-day travel plan with all necessary information.
 
     USER REQUIREMENTS:
@@ -353,8 +228,67 @@ def generate_travel_plan(user_input):
     - source and links for all recommendations
     """
 
-    qa_chain = RetrievalQA.from_chain_type(llm, retriever=retriever)
-    response = qa_chain.run(prompt_template.format(
+# Used when the day plan was built by planner.py; the LLM only narrates it
+PLANNED_TEMPLATE = """
+    You are an expert AI Travel Assistant writing up a travel itinerary. The day plan below is fixed: keep its days, stops, order and times, and do not add stops. It is built around the journeys it names, so recommend those.
+
+    USER REQUIREMENTS:
+    - Traveling from: {from_city}
+    - Destination: {to_city}
+    - Trip duration: {days} days
+    - Budget: INR {budget}
+    - Departure date: {departure_date}
+    - Return date: {return_date}
+    - Travelers: {num_adults} adults, {num_children} children (ages: {children_ages})
+
+    DAY PLAN:
+    {plan}
+
+    TRAVEL DATA CONTEXT:
+    {context}
+
+    OUTPUT REQUIREMENTS:
+    - Start with a two-line summary of the trip
+    - Give the outbound and return journeys named in the day plan with prices and links from the travel data, and recommend 2-3 hotels
+    - Write each day of the plan with its times and one or two sentences per stop, including prices and locations
+    - End with a budget breakdown and total cost estimate
+    - Keep it concise and format it with clear section headers
+    """
+
+def store_in_chromadb(data_dict, vector_store, scope):
+    """Convert travel data to per-entity documents tagged with the trip scope and store them in ChromaDB"""
+    docs = []
+    for category, data in data_dict.items():
+        if not data:
+            continue
+        docs.extend(build_documents(category, data, scope))
+    counts = upsert_documents(vector_store, docs)
+    print(f"Stored trip {scope['trip_id']}: {counts['embedded']} chunks embedded, "
+          f"{counts['skipped']} unchanged, {counts['deleted']} stale removed")
+    return counts
+
+def get_travel_data(user_input):
+    # Providers are independent, so fetch them concurrently; a provider that
+    # fails or times out contributes an empty result instead of failing the plan.
+    results, errors, timings = fan_out(itinerary_calls(user_input), defaults=PROVIDER_DEFAULTS)
+    for name, error in errors.items():
+        print(f"Provider {name} failed after {timings[name]:.1f}s: {error}")
+    # Providers skipped for lack of an airport or station count as empty
+    results = {**PROVIDER_DEFAULTS, **results}
+
+    flight_data = results["flights"]
+    hotel_data = results["hotels"]
+    activities_data = results["activities"]
+    train_data = results["trains"]
+    tourist_places = results["tourist_places"]
+    providers.store_trip_offers(user_input, hotel_data, activities_data, tourist_places)
+
+    return (flight_data, hotel_data, activities_data, train_data, tourist_places,
+            results["return_flights"], results["return_trains"])
+
+def build_prompt(user_input, context, plan=None):
+    template = PROMPT_TEMPLATE if plan is None else PLANNED_TEMPLATE
+    return template.format(
         budget=user_input["budget"],
         days=user_input["days"],
         to_city=user_input["to_city"],
@@ -364,10 +298,166 @@ def generate_travel_plan(user_input):
         num_adults=user_input["num_adults"],
         num_children=user_input["num_children"],
         children_ages=user_input["children_ages"],
-        context="{context}"  
-    ))
+        context=context,
+        plan=skeleton_text(plan) if plan is not None else "",
+    )
 
-    return response
+def prepare_prompt(user_input, travel_data):
+    """Store the travel data for this trip and fill the prompt with the retrieved context.
+
+    Returns the prompt and a report of its token count, the documents used
+    and the day plan, if one was built.
+    """
+    (flight_data, hotel_data, activities_data, train_data, tourist_places,
+     return_flights, return_trains) = travel_data
+    # Only the best candidates for the budget and party are embedded and retrieved
+    hotel_data, activities_data, tourist_places = rank_travel_data(
+        user_input, hotel_data, activities_data, tourist_places
+    )
+    # Attractions and restaurants with coordinates are scheduled here rather than by the LLM,
+    # between the outbound arrival and the return departure
+    plan = None
+    if DAY_PLANNER:
+        outbound, inbound = journeys(user_input, flight_data, train_data, return_flights, return_trains)
+        plan = plan_days(user_input, hotel_data, activities_data, tourist_places, outbound, inbound)
+    data = {
+        "Flights": flight_data,
+        "Hotels": hotel_data,
+        "Activities": activities_data,
+        "Trains": train_data,
+        "Tourist Places": tourist_places
+    }
+    queries = CATEGORY_QUERIES
+    if plan is not None:
+        data = {c: d for c, d in data.items() if c not in PLANNED_CATEGORIES}
+        queries = {c: q for c, q in CATEGORY_QUERIES.items() if c not in PLANNED_CATEGORIES}
+    scope = trip_scope(user_input)
+    vector_store = get_vector_store(scope)
+    store_in_chromadb(data, vector_store, scope)
+
+    # Retrieval queries describe each category; the instruction template is not embedded
+    context, report = build_context(vector_store, get_embeddings(), user_input, queries=queries)
+    prompt = build_prompt(user_input, context, plan)
+    report["plan"] = public_plan(plan) if plan is not None else None
+    return prompt, record_prompt(report, prompt)
+
+def generate_travel_plan(user_input):
+    """Generate a personalized travel plan using LLM and retrieved travel data"""
+    def generate():
+        travel_data = travel_data_flight.do(
+            trip_key(user_input), lambda: get_travel_data(user_input)
+        )
+        prompt, _ = prepare_prompt(user_input, travel_data)
+        with span("llm"):
+            return get_llm().invoke(prompt).content
+    return itinerary_cache.get_or_generate(user_input, generate)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_travel_plan(user_input):
+    """Server-sent events: one per finished provider, then the itinerary token by token"""
+    try:
+        itinerary, cache_state = await asyncio.to_thread(itinerary_cache.lookup, user_input)
+        if itinerary is not None:
+            # A plan made for a near-identical request: no provider calls or generation
+            yield sse_event("cached", {})
+            yield sse_event("token", {"text": itinerary})
+            yield sse_event("done", {})
+            return
+
+        results = dict(PROVIDER_DEFAULTS)
+        async for name, result, error, elapsed in fan_out_iter(itinerary_calls(user_input)):
+            if error is not None:
+                print(f"Provider {name} failed after {elapsed:.1f}s: {error}")
+                result = PROVIDER_DEFAULTS[name]
+            results[name] = result
+            yield sse_event("provider", {
+                "provider": name,
+                "ok": error is None,
+                "error": error,
+                "seconds": round(elapsed, 2),
+            })
+
+        travel_data = tuple(results[name] for name in PROVIDER_DEFAULTS)
+        await asyncio.to_thread(providers.store_trip_offers, user_input, results["hotels"],
+                                results["activities"], results["tourist_places"])
+        prompt, report = await asyncio.to_thread(prepare_prompt, user_input, travel_data)
+        yield sse_event("generating", {"prompt_tokens": report["prompt_tokens"], "plan": report["plan"]})
+
+        chunks = []
+        with span("llm"):
+            async for chunk in get_llm().astream(prompt):
+                if chunk.content:
+                    chunks.append(chunk.content)
+                    yield sse_event("token", {"text": chunk.content})
+        await asyncio.to_thread(itinerary_cache.store, cache_state, "".join(chunks))
+        yield sse_event("done", {})
+    except Exception as e:
+        yield sse_event("error", {"error": f"{type(e).__name__}: {e}"})
+
+async def batch_travel_plans(user_inputs):
+    """NDJSON lines, one per request as soon as its itinerary or error is ready, then a summary.
+
+    Requests for the same trip share one provider fetch, and overlapping
+    searches such as hotels in the same city and dates are shared by the
+    provider cache. Prompts are built concurrently, so the embedding
+    batcher embeds documents from several requests in one model call. At
+    most BATCH_LLM_CONCURRENCY generations run at once.
+    """
+    start = time.perf_counter()
+    prepare_slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    llm_slots = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+    fetches, generations = {}, {}
+
+    def travel_data(user_input):
+        key = trip_key(user_input)
+        if key not in fetches:
+            fetches[key] = asyncio.ensure_future(asyncio.to_thread(
+                travel_data_flight.do, key, lambda: get_travel_data(user_input)
+            ))
+        return fetches[key]
+
+    async def generate(user_input):
+        itinerary, cache_state = await asyncio.to_thread(itinerary_cache.lookup, user_input)
+        if itinerary is not None:
+            return itinerary, True
+        async with prepare_slots:
+            prompt, _ = await asyncio.to_thread(prepare_prompt, user_input, await travel_data(user_input))
+        async with llm_slots:
+            with span("llm"):
+                itinerary = (await get_llm().ainvoke(prompt)).content
+        await asyncio.to_thread(itinerary_cache.store, cache_state, itinerary)
+        return itinerary, False
+
+    async def run(index, user_input):
+        item_start = time.perf_counter()
+        try:
+            check_cities(user_input)
+            # Identical requests in the batch get the same itinerary
+            key = itinerary_fingerprint(user_input)
+            if key not in generations:
+                generations[key] = asyncio.ensure_future(generate(user_input))
+            itinerary, cached = await generations[key]
+            result = {"index": index, "ok": True, "cached": cached, "itinerary": itinerary}
+        except Exception as e:
+            result = {"index": index, "ok": False, "error": f"{type(e).__name__}: {e}"}
+        result["seconds"] = round(time.perf_counter() - item_start, 2)
+        return result
+
+    tasks = [asyncio.ensure_future(run(index, user_input)) for index, user_input in enumerate(user_inputs)]
+    ok = 0
+    try:
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            ok += result["ok"]
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"done": True, "items": len(tasks), "ok": ok, "failed": len(tasks) - ok,
+                          "itineraries": len(generations), "trips_fetched": len(fetches), "seconds": round(time.perf_counter() - start, 2)}) + "\n"
+    finally:
+        # The client went away: stop items that have not finished
+        for task in [*tasks, *generations.values(), *fetches.values()]:
+            task.cancel()
 
 class TravelRequest(BaseModel):
     from_city: str
@@ -384,10 +474,114 @@ class TravelRequest(BaseModel):
     from_station: str
     to_station: str
 
+def itinerary_fingerprint(user_input):
+    """Identical submissions (ignoring city name case) share one job"""
+    return make_key({
+        **user_input,
+        "from_city": user_input["from_city"].lower(),
+        "to_city": user_input["to_city"].lower(),
+    })
+
+# Job-based itinerary generation on a bounded worker pool
+job_queue = JobQueue(
+    JobStore(JOB_DB_PATH),
+    lambda user_input: {"itinerary": generate_travel_plan(user_input)},
+    fingerprint=itinerary_fingerprint,
+)
+
+def job_response(job):
+    response = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+    if job["status"] == "done":
+        response["itinerary"] = job["result"]["itinerary"]
+    if job["error"]:
+        response["error"] = job["error"]
+    return response
+
+def validated_input(request):
+    """Request as a dict, rejected with 422 before any upstream call if a city is unknown"""
+    user_input = request.model_dump()
+    try:
+        check_cities(user_input)
+    except UnknownCity as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return user_input
+
 @app.post("/generate-itinerary")
 def generate_itinerary(request: TravelRequest):
-    result = generate_travel_plan(request.model_dump())
+    result = generate_travel_plan(validated_input(request))
     return {"itinerary": result}
 
+@app.post("/generate-itinerary/stream")
+def generate_itinerary_stream(request: TravelRequest):
+    return StreamingResponse(
+        stream_travel_plan(validated_input(request)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+class BatchRequest(BaseModel):
+    requests: List[TravelRequest]
+
+@app.post("/generate-itinerary/batch")
+def generate_itinerary_batch(request: BatchRequest):
+    """Many itineraries in one call, returned as NDJSON lines in completion order"""
+    if not 0 < len(request.requests) <= BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"Send between 1 and {BATCH_MAX_ITEMS} requests")
+    return StreamingResponse(
+        batch_travel_plans([item.model_dump() for item in request.requests]),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/itineraries", status_code=202)
+def submit_itinerary(request: TravelRequest):
+    try:
+        job = job_queue.submit(validated_input(request))
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return job_response(job)
+
+@app.get("/itineraries/{job_id}")
+def get_itinerary_job(job_id: str):
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+@app.exception_handler(ProviderError)
+def provider_error_handler(request: Request, exc: ProviderError):
+    # Refused locally (circuit open, rate limit, quota) -> 503; upstream failed -> 502
+    if isinstance(exc, ProviderUnavailable):
+        headers = {"Retry-After": str(math.ceil(exc.retry_after))} if exc.retry_after else None
+        return JSONResponse(status_code=503, content={"detail": str(exc)}, headers=headers)
+    return JSONResponse(status_code=502, content={"detail": str(exc)})
+
+@app.get("/quota")
+def get_quota():
+    """Upstream calls this month, circuit state and guard counters per provider"""
+    return quota_report()
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    stats = {
+        "response_cache": response_cache.stats(),
+        "provider_calls": provider_flight.stats(),
+        "travel_data": travel_data_flight.stats(),
+        "ingest": ingest_stats,
+        "itineraries": itinerary_cache.stats(),
+        "prompt_context": context_stats,
+        "offers": providers.offer_store.stats(),
+        "ranking": ranking_stats,
+    }
+    if resources.is_loaded("embeddings"):
+        stats["embeddings"] = resources.embedding_stats()
+    return stats
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8080)
\ No newline at end of file
@@ -0,0 +1,195 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_PREFIX = "travel_agent"
+# Add a Server-Timing header with the stage breakdown to every response
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0").lower() not in ("0", "false", "no")
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines.extend(f"{self.name}{_label_text(k)} {v}" for k, v in self._values.items())
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_label_text(key + (('le', bound),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(key)} {total}")
+                lines.append(f"{self.name}_count{_label_text(key)} {cumulative}")
+        return lines
+
+
+stage_seconds = Histogram(f"{METRICS_PREFIX}_stage_seconds", "Time spent per pipeline stage")
+request_seconds = Histogram(f"{METRICS_PREFIX}_request_seconds", "HTTP request latency")
+upstream_requests = Counter(f"{METRICS_PREFIX}_upstream_requests_total", "Upstream HTTP calls by provider and status")
+upstream_bytes = Counter(f"{METRICS_PREFIX}_upstream_response_bytes_total", "Upstream response body bytes")
+_metrics = [stage_seconds, request_seconds, upstream_requests, upstream_bytes]
+# Name -> (callable returning a stats dict, label for nested dicts)
+_stats = {}
+
+# Per-request list of (stage, detail, seconds), set by the middleware. Worker
+# threads see it because fetch.py and the thread pools copy the context.
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def span(stage, detail=None):
+    """Time a pipeline stage into the stage histogram and the current request's breakdown."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if detail is None:
+            stage_seconds.observe(elapsed, stage=stage)
+        else:
+            stage_seconds.observe(elapsed, stage=stage, detail=detail)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, detail, elapsed))
+
+
+def record_upstream(provider, response):
+    upstream_requests.inc(provider=provider, status=response.status_code)
+    upstream_bytes.inc(len(response.content or b""), provider=provider)
+
+
+def register_stats(name, stats, label=None):
+    """Export a stats() callable's numeric values as metrics named after name.
+
+    Nested dicts, e.g. per-provider stats, become one series per key with the
+    key as the `label` label.
+    """
+    _stats[name] = (stats, label)
+
+
+def _render_stats(name, stats, label):
+    lines = []
+    try:
+        values = stats() or {}
+    except Exception as e:
+        print(f"Metrics for {name} failed: {e}")
+        return lines
+    series = {}
+    for key, value in values.items():
+        if isinstance(value, dict) and label:
+            for field, v in value.items():
+                series.setdefault(field, []).append((((label, key),), v))
+        else:
+            series.setdefault(key, []).append(((), value))
+    for field, samples in series.items():
+        samples = [(k, v) for k, v in samples if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if not samples:
+            continue
+        metric = f"{METRICS_PREFIX}_{name}_{field}"
+        lines.append(f"# TYPE {metric} untyped")
+        lines.extend(f"{metric}{_label_text(k)} {v}" for k, v in samples)
+    return lines
+
+
+def stage_summary():
+    """{stage: {"count", "seconds"}} summed over details, e.g. for benchmark reports."""
+    summary = {}
+    with stage_seconds._lock:
+        for key, (counts, total) in stage_seconds._values.items():
+            stage = dict(key)["stage"]
+            entry = summary.setdefault(stage, {"count": 0, "seconds": 0.0})
+            entry["count"] += sum(counts)
+            entry["seconds"] += total
+    return summary
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for name, (stats, label) in list(_stats.items()):
+        lines.extend(_render_stats(name, stats, label))
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(timings, total):
+    """Server-Timing header value, summing repeated stages such as result pages."""
+    summed = {}
+    for stage, detail, seconds in timings:
+        summed[(stage, detail)] = summed.get((stage, detail), 0) + seconds
+    parts = [
+        f'{stage};desc="{detail}";dur={seconds * 1000:.1f}' if detail else f"{stage};dur={seconds * 1000:.1f}"
+        for (stage, detail), seconds in summed.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def instrument(app):
+    """Add request timing, the optional Server-Timing header and GET /metrics to a FastAPI app."""
+    from fastapi.responses import PlainTextResponse
+
+    @app.middleware("http")
+    async def time_request(request, call_next):
+        timings = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            _request_timings.reset(token)
+        elapsed = time.perf_counter() - start
+        route = request.scope.get("route")
+        request_seconds.observe(elapsed, method=request.method,
+                                path=getattr(route, "path", "unmatched"), status=response.status_code)
+        # Streaming responses send headers before most stages have run
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = server_timing(timings, elapsed)
+        return response
+
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
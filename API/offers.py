@@ -0,0 +1,228 @@
+import json
+import math
+import os
+import threading
+import time
+
+from cache import ENGINE_TTLS, LazyConnection
+from locations import locations, distance_km
+from metrics import span
+
+OFFER_DB_PATH = os.getenv("OFFER_DB_PATH", "./offers.db")
+# Offers are as fresh as the provider responses they came from
+OFFER_TTLS = {"hotel": ENGINE_TTLS["google_hotels"], "place": ENGINE_TTLS["google_local"]}
+OFFER_SORTS = ("price", "rating", "distance")
+
+
+def city_key(name):
+    record = locations.resolve(name)
+    return record["city"] if record else " ".join(str(name).lower().split())
+
+
+def stay_key(check_in_date, check_out_date, num_adults, num_children=0):
+    """Hotel prices depend on the dates and party size; places have no stay."""
+    return f"{check_in_date}:{check_out_date}:{num_adults}:{num_children}"
+
+
+def _coordinates(item):
+    gps = item.get("gps_coordinates") or {}
+    return gps.get("latitude"), gps.get("longitude")
+
+
+def normalize_hotel(prop):
+    """Row fields for a Google Hotels property, or None without a name."""
+    if not prop.get("name"):
+        return None
+    lat, lon = _coordinates(prop)
+    return {
+        "id": prop.get("property_token") or prop["name"],
+        "name": prop["name"],
+        "price": (prop.get("rate_per_night") or {}).get("extracted_lowest"),
+        "rating": prop.get("overall_rating"),
+        "reviews": prop.get("reviews"),
+        "lat": lat,
+        "lon": lon,
+        "data": prop,
+    }
+
+
+def normalize_place(place):
+    """Row fields for a Google Local result; price is the level, 1 for "₹" to 4 for "₹₹₹₹"."""
+    if not place.get("title"):
+        return None
+    lat, lon = _coordinates(place)
+    level = sum(1 for c in place.get("price") or "" if c in "₹$")
+    return {
+        "id": place.get("place_id") or place["title"],
+        "name": place["title"],
+        "price": level or None,
+        "rating": place.get("rating"),
+        "reviews": place.get("reviews"),
+        "lat": lat,
+        "lon": lon,
+        "data": place,
+    }
+
+
+NORMALIZERS = {"hotel": normalize_hotel, "place": normalize_place}
+
+
+def _check_sort(sort, near):
+    if sort not in OFFER_SORTS:
+        raise ValueError(f"sort must be one of {', '.join(OFFER_SORTS)}")
+    if sort == "distance" and near is None:
+        raise ValueError("sort by distance needs a location")
+
+
+class OfferStore:
+    """Hotels and places from provider responses, normalized into indexed SQLite rows.
+
+    Rows are grouped in scopes of (kind, city, category, stay). A scope that
+    was fetched in full is recorded as searched until its TTL, so queries on
+    it are answered from the indexes alone; offers seen in other responses,
+    e.g. price-filtered itinerary fetches, are stored but do not complete
+    the scope.
+    """
+
+    def __init__(self, path=OFFER_DB_PATH, ttls=None):
+        self.ttls = {**OFFER_TTLS, **(ttls or {})}
+        self.counts = {"queries": 0, "hits": 0, "misses": 0, "stored": 0}
+        self._lock = threading.Lock()
+        self._conn = LazyConnection(path, [
+            "CREATE TABLE IF NOT EXISTS offers ("
+            "kind TEXT, city TEXT, category TEXT, stay TEXT, id TEXT, name TEXT, "
+            "price REAL, rating REAL, reviews INTEGER, lat REAL, lon REAL, data TEXT, expires_at REAL, "
+            "PRIMARY KEY (kind, city, category, stay, id))",
+            *(f"CREATE INDEX IF NOT EXISTS offers_{name} ON offers (kind, city, category, stay, {columns})"
+              for name, columns in (("price", "price"), ("rating", "rating, reviews"), ("geo", "lat, lon"))),
+            "CREATE TABLE IF NOT EXISTS searches ("
+            "kind TEXT, city TEXT, category TEXT, stay TEXT, expires_at REAL, "
+            "PRIMARY KEY (kind, city, category, stay))",
+        ])
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def add(self, kind, city, items, category="", stay="", complete=False):
+        """Store provider items in a scope; complete replaces the scope and marks it searched."""
+        scope = (kind, city_key(city), category.lower(), stay)
+        now = time.time()
+        expires_at = now + self.ttls[kind]
+        rows = []
+        for item in items or []:
+            offer = NORMALIZERS[kind](item)
+            if offer is None:
+                continue
+            rows.append(scope + (offer["id"], offer["name"], offer["price"], offer["rating"], offer["reviews"],
+                                 offer["lat"], offer["lon"], json.dumps(offer["data"]), expires_at))
+        with self._lock:
+            if complete:
+                self._conn.execute(
+                    "DELETE FROM offers WHERE kind = ? AND city = ? AND category = ? AND stay = ?", scope
+                )
+                self._conn.execute("INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?, ?)", scope + (expires_at,))
+            self._conn.executemany("INSERT OR REPLACE INTO offers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   rows)
+            self._conn.execute("DELETE FROM offers WHERE expires_at <= ?", (now,))
+            self._conn.execute("DELETE FROM searches WHERE expires_at <= ?", (now,))
+            self._conn.commit()
+            self.counts["stored"] += len(rows)
+        return len(rows)
+
+    def searched(self, kind, city, category="", stay=""):
+        """Whether the scope was fetched in full and has not expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM searches WHERE kind = ? AND city = ? AND category = ? AND stay = ? AND expires_at > ?",
+                (kind, city_key(city), category.lower(), stay, time.time()),
+            ).fetchone()
+        return row is not None
+
+    def query(self, kind, city, category="", stay="", min_price=None, max_price=None, min_rating=None,
+              sort="price", limit=10, near=None):
+        """Offers in a scope, filtered and sorted on the indexed columns.
+
+        Args:
+            sort (str): "price" (cheapest priced first), "rating" (best first, then most
+                reviewed) or "distance" (closest to near first).
+            near (tuple): Optional (lat, lon, radius_km). A bounding box narrows
+                the rows in SQL and the great-circle distance decides.
+
+        Returns:
+            list: Offer dicts with the provider item under "data" and
+            "distance_km" when near is given.
+        """
+        _check_sort(sort, near)
+        sql = ("SELECT id, name, price, rating, reviews, lat, lon, data FROM offers "
+               "WHERE kind = ? AND city = ? AND category = ? AND stay = ? AND expires_at > ?")
+        args = [kind, city_key(city), category.lower(), stay, time.time()]
+        if min_price is not None:
+            sql += " AND price >= ?"
+            args.append(min_price)
+        if max_price is not None:
+            sql += " AND price <= ?"
+            args.append(max_price)
+        if min_rating is not None:
+            sql += " AND rating >= ?"
+            args.append(min_rating)
+        if near is not None:
+            lat, lon, radius_km = near
+            dlat = radius_km / 111.0
+            dlon = radius_km / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+            sql += " AND lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?"
+            args += [lat - dlat, lat + dlat, lon - dlon, lon + dlon]
+        # Plain column orders so SQLite walks the index instead of sorting. Offers
+        # without a price are left out of price order; missing ratings sort last.
+        if sort == "price":
+            sql += " AND price IS NOT NULL ORDER BY price"
+        elif sort == "rating":
+            sql += " ORDER BY rating DESC, reviews DESC"
+        if near is None:
+            # Without a radius the SQL order is final, so only the top rows are read
+            sql += " LIMIT ?"
+            args.append(limit)
+
+        with span("offer_query", kind), self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        if near is not None:
+            lat, lon, radius_km = near
+            rows = [r + (distance_km(lat, lon, r[5], r[6]),) for r in rows]
+            rows = [r for r in rows if r[8] <= radius_km]
+            if sort == "distance":
+                rows.sort(key=lambda r: r[8])
+            rows = rows[:limit]
+        offers = []
+        for r in rows:
+            offer = {"id": r[0], "name": r[1], "price": r[2], "rating": r[3], "reviews": r[4], "lat": r[5],
+                     "lon": r[6], "data": json.loads(r[7])}
+            if near is not None:
+                offer["distance_km"] = round(r[8], 2)
+            offers.append(offer)
+        return offers
+
+    def search(self, kind, city, fetch, category="", stay="", **filters):
+        """Query a scope, first fetching it in full with fetch() if it was never searched or has expired.
+
+        Returns:
+            dict: "source" ("store" or "live"), "count" and "results".
+        """
+        # Reject bad queries before paying for a fetch
+        _check_sort(filters.get("sort", "price"), filters.get("near"))
+        self._count("queries")
+        source = "store"
+        if not self.searched(kind, city, category, stay):
+            self._count("misses")
+            self.add(kind, city, fetch(), category, stay, complete=True)
+            source = "live"
+        else:
+            self._count("hits")
+        results = self.query(kind, city, category, stay, **filters)
+        return {"source": source, "count": len(results), "results": results}
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+            size = self._conn.execute("SELECT COUNT(*) FROM offers").fetchone()[0]
+            scopes = self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+        return {**counts, "size": size, "searched_scopes": scopes}
@@ -0,0 +1,392 @@
+import datetime
+import math
+import os
+
+import numpy as np
+
+from metrics import span
+
+# Build the day-by-day schedule here and let the LLM only narrate it
+DAY_PLANNER = os.getenv("DAY_PLANNER", "1").lower() not in ("0", "false", "no")
+STOPS_PER_DAY = int(os.getenv("PLANNER_STOPS_PER_DAY", 3))
+VISIT_MINUTES = 90
+MEAL_MINUTES = 60
+DAY_START = 9 * 60
+LUNCH_AT = 12 * 60 + 30
+DINNER_AT = 19 * 60 + 30
+# A visit plus the travel to it, for how many stops fit in part of a day
+SLOT_MINUTES = VISIT_MINUTES + 30
+# Transfer to the hotel and check-in after arriving; leaving for the airport or station
+ARRIVAL_MINUTES = 90
+DEPARTURE_MINUTES = {"flight": 150, "train": 60}
+# Straight-line distance to travel time: roads are longer and city traffic slow
+ROAD_FACTOR = 1.3
+CITY_SPEED_KMH = 25
+KMEANS_ITERATIONS = 20
+# Categories the plan replaces in retrieval and the prompt
+PLANNED_CATEGORIES = ("Activities", "Tourist Places")
+
+
+def _located(items):
+    """Items with coordinates and their (lat, lon) array."""
+    kept, points = [], []
+    for item in items or []:
+        gps = item.get("gps_coordinates") or {}
+        lat, lon = gps.get("latitude"), gps.get("longitude")
+        if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
+            kept.append(item)
+            points.append((lat, lon))
+    return kept, np.array(points, dtype=np.float64).reshape(len(points), 2)
+
+
+def _project(points, origin):
+    """Equirectangular km coordinates around origin; accurate enough within a city."""
+    lat0 = math.radians(origin[0])
+    return np.column_stack(((points[:, 1] - origin[1]) * 111.32 * math.cos(lat0),
+                            (points[:, 0] - origin[0]) * 110.57))
+
+
+def travel_minutes(km):
+    return round(km * ROAD_FACTOR / CITY_SPEED_KMH * 60)
+
+
+def cluster(xy, k, capacities=None):
+    """Balanced k-means: labels for xy with at most ceil(n / k) points per cluster.
+
+    capacities, if given, caps each cluster instead and must add up to at
+    least n. Starts from farthest-point seeds (the first point, then the
+    point farthest from those chosen), so the result is reproducible. Each
+    assignment step hands out the closest (point, cluster) pairs first while
+    clusters have room.
+    """
+    n = len(xy)
+    seeds = [0]
+    nearest = np.linalg.norm(xy - xy[0], axis=1)
+    while len(seeds) < k:
+        seeds.append(int(nearest.argmax()))
+        nearest = np.minimum(nearest, np.linalg.norm(xy - xy[seeds[-1]], axis=1))
+    centroids = xy[seeds]
+    capacity = capacities if capacities is not None else [math.ceil(n / k)] * k
+    labels = None
+    for _ in range(KMEANS_ITERATIONS):
+        distances = np.linalg.norm(xy[:, None, :] - centroids[None, :, :], axis=2)
+        new_labels = np.full(n, -1)
+        sizes = np.zeros(k, dtype=int)
+        for flat in np.argsort(distances, axis=None, kind="stable"):
+            point, label = divmod(int(flat), k)
+            if new_labels[point] == -1 and sizes[label] < capacity[label]:
+                new_labels[point] = label
+                sizes[label] += 1
+        if labels is not None and (new_labels == labels).all():
+            break
+        labels = new_labels
+        centroids = np.array([xy[labels == c].mean(axis=0) if (labels == c).any() else centroids[c]
+                              for c in range(k)])
+    return labels
+
+
+def _path_length(order, dist, closed):
+    legs = sum(dist[a, b] for a, b in zip(order, order[1:]))
+    return legs + (dist[order[-1], order[0]] if closed else 0)
+
+
+def route(dist, closed):
+    """Visit order over a distance matrix, starting at node 0.
+
+    Nearest neighbour from node 0, then 2-opt segment reversals until no
+    reversal shortens the route. With closed=True the route returns to node 0.
+    """
+    n = len(dist)
+    order, unvisited = [0], set(range(1, n))
+    while unvisited:
+        last = order[-1]
+        nxt = min(unvisited, key=lambda j: (dist[last, j], j))
+        order.append(nxt)
+        unvisited.remove(nxt)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                if _path_length(candidate, dist, closed) < _path_length(order, dist, closed) - 1e-9:
+                    order, improved = candidate, True
+    return order
+
+
+def _clock(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _pick_restaurant(points, used, near):
+    """Index of the closest unused restaurant to near and its km, or (None, None)."""
+    if points is None:
+        return None, None
+    km = np.linalg.norm(points - near, axis=1)
+    for i in np.argsort(km, kind="stable"):
+        if int(i) not in used:
+            used.add(int(i))
+            return int(i), float(km[i])
+    return None, None
+
+
+def _date(user_input, offset):
+    try:
+        start = datetime.date.fromisoformat(str(user_input.get("departure_date")))
+    except ValueError:
+        return None
+    return (start + datetime.timedelta(days=offset)).isoformat()
+
+
+def _at(text):
+    return datetime.datetime.strptime(text, "%Y-%m-%d %H:%M")
+
+
+def _flight_journey(flights):
+    for option in (flights or {}).get("best_flights") or (flights or {}).get("other_flights") or []:
+        legs = option.get("flights") or []
+        try:
+            departs, arrives = _at(legs[0]["departure_airport"]["time"]), _at(legs[-1]["arrival_airport"]["time"])
+            route = (legs[0]["departure_airport"]["id"], legs[-1]["arrival_airport"]["id"])
+        except (IndexError, KeyError, TypeError, ValueError):
+            continue
+        name = " / ".join(f"{leg.get('airline', '')} {leg.get('flight_number', '')}".strip() for leg in legs)
+        return {"mode": "flight", "name": name, "from": route[0], "to": route[1],
+                "departs": f"{departs:%Y-%m-%d %H:%M}", "arrives": f"{arrives:%Y-%m-%d %H:%M}"}
+    return None
+
+
+def _train_journey(trains, journey_date):
+    for train in (trains or {}).get("trains") or []:
+        try:
+            departs = _at(f"{journey_date} {train['departs']}")
+            hours, minutes = (int(x) for x in train["duration"].replace("h", " ").replace("m", " ").split())
+        except (KeyError, ValueError, AttributeError):
+            continue
+        arrives = departs + datetime.timedelta(hours=hours, minutes=minutes)
+        return {"mode": "train", "name": f"{train['number']} {train['name']}",
+                "from": train.get("from_station"), "to": train.get("to_station"),
+                "departs": f"{departs:%Y-%m-%d %H:%M}", "arrives": f"{arrives:%Y-%m-%d %H:%M}"}
+    return None
+
+
+def journey(flights, trains, journey_date, prefer="flight"):
+    """The leg the plan is built around: Google's top flight or the first train listed.
+
+    The prefer mode is tried first, so the return can match the way out.
+    Returns a dict with "mode", "name", "from", "to" and "departs" and
+    "arrives" as "YYYY-MM-DD HH:MM", or None when neither can be read.
+    """
+    flight, train = _flight_journey(flights), _train_journey(trains, journey_date)
+    return (train or flight) if prefer == "train" else (flight or train)
+
+
+def journeys(user_input, flights, trains, return_flights, return_trains):
+    """(outbound, inbound) legs for a request; the return prefers the outbound's mode."""
+    outbound = journey(flights, trains, user_input.get("departure_date"))
+    inbound = journey(return_flights, return_trains, user_input.get("return_date"),
+                      prefer=outbound["mode"] if outbound else "flight")
+    return outbound, inbound
+
+
+def _day_windows(user_input, days, outbound, inbound):
+    """(start, end) minutes free for attractions on each day, or None while still travelling.
+
+    Day 1 starts after the outbound arrival plus ARRIVAL_MINUTES, and the
+    day of the return departure ends DEPARTURE_MINUTES before it.
+    """
+    arrives = _at(outbound["arrives"]) if outbound else None
+    departs = _at(inbound["departs"]) if inbound else None
+    windows = []
+    for day in range(days):
+        date = _date(user_input, day)
+        date = datetime.date.fromisoformat(date) if date else None
+        start, end = DAY_START, DINNER_AT + MEAL_MINUTES
+        if date and arrives:
+            if date < arrives.date():
+                windows.append(None)
+                continue
+            if date == arrives.date():
+                start = max(start, arrives.hour * 60 + arrives.minute + ARRIVAL_MINUTES)
+        if date and departs:
+            if date > departs.date():
+                windows.append(None)
+                continue
+            if date == departs.date():
+                end = min(end, departs.hour * 60 + departs.minute - DEPARTURE_MINUTES[inbound["mode"]])
+        windows.append((start, end))
+    return windows
+
+
+def _capacity(window, stops_per_day):
+    if window is None:
+        return 0
+    start, end = window
+    usable = min(end, DINNER_AT) - start - (MEAL_MINUTES if _has_lunch(window) else 0)
+    return max(0, min(stops_per_day, usable // SLOT_MINUTES))
+
+
+def _has_lunch(window):
+    return window is not None and window[0] <= LUNCH_AT + 60 and window[1] >= LUNCH_AT + MEAL_MINUTES
+
+
+def _journey_stops(day_date, outbound, inbound, window):
+    """Departure and arrival stops of the journeys that fall on day_date."""
+    stops = []
+    for leg, direction in ((outbound, "out"), (inbound, "back")):
+        if not leg:
+            continue
+        departs, arrives = _at(leg["departs"]), _at(leg["arrives"])
+        route = f"{leg['from']} -> {leg['to']}"
+        if direction == "back" and window is not None and departs.date().isoformat() == day_date:
+            leave = departs - datetime.timedelta(minutes=DEPARTURE_MINUTES[leg["mode"]])
+            stops.append(_stop(f"{leave:%H:%M}", "leave", f"Leave for {leg['from']}",
+                               DEPARTURE_MINUTES[leg["mode"]]))
+        if departs.date().isoformat() == day_date:
+            stops.append(_stop(f"{departs:%H:%M}", "depart", f"{leg['name']} ({route})",
+                               int((arrives - departs).total_seconds() // 60)))
+        if direction == "out" and arrives.date().isoformat() == day_date:
+            stops.append(_stop(f"{arrives:%H:%M}", "arrive", f"Arrive at {leg['to']}, transfer and check-in",
+                               ARRIVAL_MINUTES))
+    return stops
+
+
+def _stop(time, kind, name, minutes):
+    return {"time": time, "kind": kind, "name": name, "minutes": minutes, "travel_minutes": 0, "place": {}}
+
+
+def plan_days(user_input, hotels, activities, tourist_places, outbound=None, inbound=None,
+              stops_per_day=STOPS_PER_DAY):
+    """Group attractions into days, route each day and place meals along the way.
+
+    Candidates are expected best first, as ranked.rank_travel_data returns
+    them. outbound and inbound are journey() legs: day 1 starts after the
+    arrival and the last day ends in time for the return, so short days get
+    fewer attractions and days spent travelling none. The first hotel with
+    coordinates is the start and end of every day.
+
+    Returns:
+        dict: "base", the hotel item or None, "outbound" and "inbound", and
+        "days", one dict per day with "day", "date" and "stops". Each stop
+        has "time", "kind" (attraction, lunch, dinner, depart, arrive or
+        leave), "name", "minutes", "travel_minutes" from the previous stop
+        and the provider item as "place". None when no attraction has
+        coordinates.
+    """
+    with span("plan"):
+        return _plan_days(user_input, hotels, activities, tourist_places, outbound, inbound, stops_per_day)
+
+
+def _plan_days(user_input, hotels, activities, tourist_places, outbound, inbound, stops_per_day):
+    days = max(int(user_input.get("days") or 1), 1)
+    # A return that does not leave after the outbound arrives cannot be the way back
+    if outbound and inbound and _at(inbound["departs"]) <= _at(outbound["arrives"]):
+        inbound = None
+    windows = _day_windows(user_input, days, outbound, inbound)
+    capacities = [_capacity(window, stops_per_day) for window in windows]
+    attractions, points = _located(tourist_places)
+    attractions, points = attractions[:sum(capacities)], points[:sum(capacities)]
+    if not attractions:
+        return None
+    located_hotels, hotel_points = _located(hotels)
+    restaurants, restaurant_points = _located(activities)
+    origin = hotel_points[0] if located_hotels else points.mean(axis=0)
+    xy = _project(points, origin)
+    restaurant_xy = _project(restaurant_points, origin) if restaurants else None
+    hotel_xy = np.zeros(2) if located_hotels else None
+
+    # Spread the attractions over the days with room, no day above its own capacity
+    n = len(attractions)
+    active = [day for day, capacity in enumerate(capacities) if capacity][:n]
+    total = sum(capacities[day] for day in active)
+    room = [min(capacities[day], math.ceil(n * capacities[day] / total)) for day in active]
+    labels = cluster(xy, len(active), room)
+    # Among days with the same room, the group closest to the hotel goes first
+    day_of = {}
+    for size in set(room):
+        same = [c for c in range(len(active)) if room[c] == size]
+        closest = sorted(same, key=lambda c: (np.linalg.norm(xy[labels == c].mean(axis=0))
+                                              if (labels == c).any() else math.inf, c))
+        day_of.update({group: active[c] for c, group in zip(same, closest)})
+    groups = {day: group for group, day in day_of.items()}
+
+    used_restaurants = set()
+    plan = []
+    for day in range(days):
+        date, window = _date(user_input, day), windows[day]
+        journey_stops = _journey_stops(date, outbound, inbound, window) if date else []
+        members = np.flatnonzero(labels == groups[day]) if day in groups else np.array([], dtype=int)
+        if not len(members):
+            plan.append({"day": day + 1, "date": date, "stops": sorted(journey_stops, key=lambda s: s["time"])})
+            continue
+        nodes = xy[members] if hotel_xy is None else np.vstack([hotel_xy, xy[members]])
+        dist = np.linalg.norm(nodes[:, None, :] - nodes[None, :, :], axis=2)
+        order = route(dist, closed=hotel_xy is not None)
+        if hotel_xy is not None:
+            order = [i - 1 for i in order[1:]]
+        visits = [int(members[i]) for i in order]
+
+        start, end = window
+        stops, clock, previous = [], start, hotel_xy
+
+        def add_stop(kind, place, km, minutes, at=None):
+            nonlocal clock
+            travel = travel_minutes(km) if km is not None else 0
+            clock = max(clock + travel, at or 0)
+            stops.append({"time": _clock(clock), "kind": kind, "name": place.get("title"), "minutes": minutes,
+                          "travel_minutes": travel, "place": place})
+            clock += minutes
+
+        for n, index in enumerate(visits):
+            km = np.linalg.norm(xy[index] - previous) if previous is not None else None
+            # On the day home, a visit that would run into leaving is dropped
+            if end < DINNER_AT and clock + travel_minutes(km or 0) + VISIT_MINUTES > end:
+                continue
+            add_stop("attraction", attractions[index], km, VISIT_MINUTES)
+            previous = xy[index]
+            if n == (len(visits) - 1) // 2 and _has_lunch(window):
+                meal, km = _pick_restaurant(restaurant_xy, used_restaurants, previous)
+                if meal is not None:
+                    add_stop("lunch", restaurants[meal], km, MEAL_MINUTES, at=LUNCH_AT)
+                    previous = restaurant_xy[meal]
+        if end >= DINNER_AT + MEAL_MINUTES:
+            meal, km = _pick_restaurant(restaurant_xy, used_restaurants, previous)
+            if meal is not None:
+                add_stop("dinner", restaurants[meal], km, MEAL_MINUTES, at=DINNER_AT)
+        plan.append({"day": day + 1, "date": date, "stops": sorted(journey_stops + stops, key=lambda s: s["time"])})
+    return {"base": located_hotels[0] if located_hotels else None, "outbound": outbound, "inbound": inbound,
+            "days": plan}
+
+
+def _describe(place):
+    details = [place.get("type"), place.get("price"),
+               f"{place['rating']}/5" if place.get("rating") else None, place.get("address")]
+    return ", ".join(str(d) for d in details if d)
+
+
+def skeleton_text(plan):
+    """The plan as compact lines for the prompt, one line per stop."""
+    base = plan["base"]
+    lines = [f"Base: {base.get('name')}" if base else "Base: hotel of choice"]
+    for day in plan["days"]:
+        lines.append(f"Day {day['day']}" + (f" ({day['date']})" if day["date"] else "") + ":")
+        if not day["stops"]:
+            lines.append("- Free day")
+        for stop in day["stops"]:
+            label = {"lunch": "Lunch at ", "dinner": "Dinner at ", "depart": "Depart by "}.get(stop["kind"], "")
+            travel = f", {stop['travel_minutes']} min travel" if stop["travel_minutes"] else ""
+            description = _describe(stop["place"])
+            lines.append(f"- {stop['time']} {label}{stop['name']} ({stop['minutes']} min{travel})"
+                         + (f": {description}" if description else ""))
+    return "\n".join(lines)
+
+
+def public_plan(plan):
+    """The plan without provider items, e.g. for an SSE event."""
+    return {
+        "base": plan["base"].get("name") if plan["base"] else None,
+        "outbound": plan["outbound"],
+        "inbound": plan["inbound"],
+        "days": [{**day, "stops": [{k: v for k, v in stop.items() if k != "place"} for stop in day["stops"]]}
+                 for day in plan["days"]],
+    }
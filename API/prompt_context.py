@@ -0,0 +1,111 @@
+import math
+import os
+import re
+import threading
+
+from metrics import span, register_stats
+
+# Tokens of retrieved travel data allowed in one prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 3000))
+# Documents sharing this fraction of their words count as duplicates
+CONTEXT_DEDUP_SIMILARITY = float(os.getenv("CONTEXT_DEDUP_SIMILARITY", 0.85))
+# Rough token estimate; Llama and GPT tokenizers average about 4 characters per token on this data
+CHARS_PER_TOKEN = 4
+
+# Category -> (retrieval query, most documents kept). The queries describe the
+# data wanted and never include the instruction template.
+CATEGORY_QUERIES = {
+    "Flights": ("Flights from {from_city} to {to_city} on {departure_date}, cheapest and fastest", 4),
+    "Trains": ("Trains from {from_city} to {to_city} departure time duration fare", 3),
+    "Hotels": ("Hotels in {to_city} from INR {min_price} to {max_price} per night, good rating, "
+               "for {num_adults} adults and {num_children} children", 5),
+    "Activities": ("Restaurants in {to_city}, popular and well rated", 5),
+    "Tourist Places": ("Tourist attractions and things to do in {to_city}", 6),
+}
+
+context_stats = {"requests": 0, "prompt_tokens": 0, "context_tokens": 0, "dropped_duplicates": 0,
+                 "dropped_over_budget": 0}
+_stats_lock = threading.Lock()
+register_stats("context", lambda: dict(context_stats))
+
+
+def count_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _words(text):
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _is_duplicate(words, kept):
+    for other in kept:
+        union = words | other
+        if union and len(words & other) / len(union) >= CONTEXT_DEDUP_SIMILARITY:
+            return True
+    return False
+
+
+def retrieve(vector_store, embeddings, user_input, queries=CATEGORY_QUERIES):
+    """Ranked documents per category, from one batched embedding of the category queries."""
+    categories = list(queries)
+    texts = [queries[c][0].format(**user_input) for c in categories]
+    vectors = embeddings.embed_documents(texts)
+    ranked = {}
+    for category, vector in zip(categories, vectors):
+        with span("chroma_query", category):
+            ranked[category] = vector_store.similarity_search_by_vector(
+                vector, k=queries[category][1], filter={"category": category}
+            )
+    return ranked
+
+
+def pack(ranked, budget=CONTEXT_TOKEN_BUDGET):
+    """Pick documents round-robin by rank across categories within the token budget.
+
+    Every category gets its best document before any gets its second.
+    Near-identical documents, e.g. a place listed as both a restaurant and an
+    attraction, are kept once. Returns (context, report).
+    """
+    chosen = {category: [] for category in ranked}
+    kept_words = []
+    used = dropped_duplicates = dropped_over_budget = 0
+    for rank in range(max((len(docs) for docs in ranked.values()), default=0)):
+        for category, docs in ranked.items():
+            if rank >= len(docs):
+                continue
+            text = docs[rank].page_content
+            words = _words(text)
+            if _is_duplicate(words, kept_words):
+                dropped_duplicates += 1
+                continue
+            tokens = count_tokens(text) + 1
+            if used + tokens > budget:
+                dropped_over_budget += 1
+                continue
+            chosen[category].append(text)
+            kept_words.append(words)
+            used += tokens
+    context = "\n\n".join(text for texts in chosen.values() for text in texts)
+    return context, {
+        "context_tokens": count_tokens(context),
+        "documents": {category: len(texts) for category, texts in chosen.items()},
+        "dropped_duplicates": dropped_duplicates,
+        "dropped_over_budget": dropped_over_budget,
+    }
+
+
+def build_context(vector_store, embeddings, user_input, budget=CONTEXT_TOKEN_BUDGET, queries=CATEGORY_QUERIES):
+    """Retrieve per category and pack the results into at most budget tokens."""
+    return pack(retrieve(vector_store, embeddings, user_input, queries), budget)
+
+
+def record(report, prompt):
+    """Add the prompt's token count to the report, log it and update the totals."""
+    report["prompt_tokens"] = count_tokens(prompt)
+    with _stats_lock:
+        context_stats["requests"] += 1
+        for name in ("prompt_tokens", "context_tokens", "dropped_duplicates", "dropped_over_budget"):
+            context_stats[name] += report[name]
+    print(f"Prompt: {report['prompt_tokens']} tokens ({report['context_tokens']} of travel data "
+          f"from {sum(report['documents'].values())} documents)")
+    return report
@@ -0,0 +1,399 @@
+import functools
+import os
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from fetch import fetch_pages, run_blocking
+from cache import ResponseCache, CACHE_DB_PATH, make_key
+from singleflight import SingleFlight
+from locations import locations
+from resilience import guards, check_response, ProviderError, UpstreamError
+from trains import parse_page, weekday, runs_on, schedule_of
+from metrics import span, record_upstream, register_stats
+from offers import OfferStore, OFFER_DB_PATH, stay_key
+
+load_dotenv()
+SERP_API_KEY = os.getenv("SERP_API_KEY")
+ANT_SCRAPY_API_KEY = os.getenv("ANT_SCRAPY_API_KEY")
+
+SERPAPI_URL = "https://serpapi.com/search.json"
+SCRAPINGANT_URL = "https://api.scrapingant.com/v2/markdown"
+SERPAPI_TIMEOUT = int(os.getenv("SERPAPI_TIMEOUT", 30))
+SCRAPINGANT_TIMEOUT = int(os.getenv("SCRAPINGANT_TIMEOUT", 60))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 32))
+
+# One keep-alive connection pool per upstream host, shared by every provider
+# call in the process, so repeated searches skip the TCP and TLS handshakes.
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE))
+
+# Cache for upstream SerpAPI and ScrapingAnt responses
+response_cache = ResponseCache(CACHE_DB_PATH)
+
+# Coalesce identical in-flight upstream calls
+provider_flight = SingleFlight()
+register_stats("response_cache", response_cache.stats)
+register_stats("singleflight_provider", provider_flight.stats)
+
+# Normalized hotels and places for the indexed search endpoints
+offer_store = OfferStore(OFFER_DB_PATH)
+register_stats("offers", offer_store.stats)
+
+# City codes come from the bundled location index
+def get_station_code(city):
+    location = locations.resolve(city)
+    return location["station"] if location else None
+
+def get_iata_code(city):
+    location = locations.resolve(city)
+    return location["iata"] if location else None
+
+def check_cities(user_input):
+    """Raise UnknownCity for an origin or destination not in the location index"""
+    locations.require(user_input["from_city"])
+    locations.require(user_input["to_city"])
+
+
+def serp_search(params):
+    """Run a SerpAPI search through the response cache and the provider guard"""
+    def search():
+        with span("upstream", params["engine"]):
+            response = session.get(SERPAPI_URL, params=params, timeout=SERPAPI_TIMEOUT)
+        record_upstream("serpapi", response)
+        try:
+            results = response.json()
+        except ValueError:
+            check_response("serpapi", response)
+            raise UpstreamError("serpapi returned a body that is not JSON")
+        error = results.get("error")
+        # SerpAPI reports an empty result page as an error
+        if error and "hasn't returned any results" in error:
+            return {}
+        check_response("serpapi", response, detail=error)
+        if error:
+            raise UpstreamError(f"serpapi: {error}", status=response.status_code)
+        return results
+    return provider_flight.do(make_key(params), lambda: response_cache.get_or_fetch(
+        params["engine"], params, lambda: guards["serpapi"].call(search, api_key=params.get("api_key"))
+    ))
+
+def scrape_page(url):
+    """Scrape a page as markdown with ScrapingAnt through the response cache and the provider guard"""
+    def load():
+        with span("upstream", "scrapingant"):
+            response = session.get(
+                SCRAPINGANT_URL,
+                params={"url": url, "browser": "true"},
+                headers={"x-api-key": ANT_SCRAPY_API_KEY},
+                timeout=SCRAPINGANT_TIMEOUT,
+            )
+        record_upstream("scrapingant", response)
+        # 423 means too many concurrent requests for the plan
+        check_response("scrapingant", response, retry_statuses=(423,))
+        return response.json().get("markdown", "")
+    params = {"url": url}
+    return provider_flight.do(
+        make_key({"engine": "scrapingant", **params}),
+        lambda: response_cache.get_or_fetch(
+            "scrapingant", params, lambda: guards["scrapingant"].call(load, api_key=ANT_SCRAPY_API_KEY)
+        )
+    )
+
+
+def flight_params(from_location_ID, to_location_ID, departure_date):
+    """SerpAPI params of a one-way Google Flights search; also the response cache key."""
+    return {
+        "engine": "google_flights",
+        "hl": "en",
+        "gl": "us",
+        "departure_id": from_location_ID,
+        "arrival_id": to_location_ID,
+        "outbound_date": departure_date,
+        "currency": "INR",
+        "type": 2,
+        "api_key": SERP_API_KEY,
+    }
+
+def get_flights(from_location_ID, to_location_ID, departure_date):
+    return serp_search(flight_params(from_location_ID, to_location_ID, departure_date))
+
+def get_hotels(stay_city_and_type, check_in_date, check_out_date, num_adults,
+               min_price, max_price, num_children=0, children_ages=(0,), max_pages=3):
+    # Google Hotels pages with a next_page_token cursor rather than an offset,
+    # so pages are followed in order. The same property can appear on more
+    # than one page; property_token identifies it.
+    all_properties = []
+    seen_tokens = set()
+    next_page_token = None
+    for _ in range(max_pages):
+        params = {
+            "engine": "google_hotels",
+            "hl": "en",
+            "gl": "us",
+            "q": stay_city_and_type,
+            "check_in_date": check_in_date,
+            "check_out_date": check_out_date,
+            "adults": num_adults,
+            "children": num_children,
+            "children_ages": list(children_ages),
+            "min_price": min_price,
+            "max_price": max_price,
+            "currency": "INR",
+            "api_key": SERP_API_KEY,
+        }
+        if next_page_token:
+            params["next_page_token"] = next_page_token
+        try:
+            results = serp_search(params)
+        except ProviderError:
+            # Keep the pages already fetched when a later one fails
+            if not all_properties:
+                raise
+            break
+        new_properties = []
+        for prop in results.get("properties", []):
+            token = prop.get("property_token") or prop.get("name")
+            if token in seen_tokens:
+                continue
+            seen_tokens.add(token)
+            new_properties.append(prop)
+        if not new_properties:
+            break
+        all_properties.extend(new_properties)
+        next_page_token = results.get("serpapi_pagination", {}).get("next_page_token")
+        if not next_page_token:
+            break
+    return all_properties
+
+def get_local_results(query, num_pages=3):
+    """Google Local results for a query, 20 per page"""
+    def fetch_page(page):
+        params = {
+            "api_key": SERP_API_KEY,
+            "engine": "google_local",
+            "google_domain": "google.com",
+            "q": query,
+            "hl": "en",
+            "gl": "us",
+            "start": page * 20,
+        }
+        try:
+            results = serp_search(params)
+        except ProviderError:
+            # A failed later page ends the results like an empty one
+            if page == 0:
+                raise
+            return []
+        return results.get("local_results", [])
+
+    return fetch_pages(fetch_page, num_pages)
+
+def get_activities(activity_query, destination_city, num_pages=3):
+    return get_local_results(f"{activity_query} in {destination_city}", num_pages)
+
+def get_tourist_places(place_type, destination_city, num_pages=3):
+    return get_local_results(f"{place_type} in {destination_city}", num_pages)
+
+def railyatri_url(departure_code, departure_name, destination_code, destination_name, journey_date):
+    """The RailYatri trains-between-stations page for a station pair and date."""
+    return (
+        "https://www.railyatri.in/trains-between-stations-v2"
+        f"?from_code={departure_code}"
+        f"&from_name={departure_name.upper().replace(' ', '%20')}"
+        f"&to_code={destination_code}"
+        f"&to_name={destination_name.upper().replace(' ', '%20')}"
+        f"&journey_date={journey_date}"
+        f"&user_id=-1743734480&user_token=&device_type_id=6"
+        f"&src=ttb_landing&from_sta_code={departure_code}&to_sta_code={destination_code}"
+    )
+
+
+def get_trains(departure_code, departure_name, destination_code, destination_name, journey_date,
+               availability=False):
+    """Trains between two stations on journey_date, parsed from the RailYatri page.
+
+    Timetables and fares are cached per station pair and weekday, so most
+    requests make no scrape at all. Seat availability changes by the hour and
+    is only scraped when asked for. If the page cannot be parsed, the raw
+    page_content is returned instead and nothing is cached.
+    """
+    day = weekday(journey_date)
+    schedule_key = make_key({
+        "engine": "train_schedule", "from_code": departure_code, "to_code": destination_code, "weekday": day,
+    })
+    if day and not availability:
+        schedule = response_cache.get(schedule_key)
+        if schedule is not None:
+            return {"trains": schedule}
+
+    page = scrape_page(railyatri_url(departure_code, departure_name, destination_code, destination_name,
+                                     journey_date))
+    parsed = parse_page(page)
+    if page and not parsed:
+        # The page layout no longer matches trains.py, so no timetable can be cached
+        print(f"No trains parsed from the RailYatri page for {departure_code}-{destination_code} "
+              f"({len(page)} chars)")
+    found = [train for train in parsed if runs_on(train, day)]
+    if not found:
+        return {"trains": [], "page_content": page}
+    schedule = schedule_of(found)
+    if day:
+        response_cache.set(schedule_key, "train_schedule", schedule)
+    return {"trains": found if availability else schedule}
+
+
+def _near(city, lat, lon, radius_km):
+    """(lat, lon, radius_km) for a radius search, centred on the city when no point is given."""
+    if radius_km is None:
+        return None
+    if lat is None or lon is None:
+        location = locations.require(city)
+        lat, lon = location["lat"], location["lon"]
+    return lat, lon, radius_km
+
+def search_hotels(city, check_in_date, check_out_date, num_adults, num_children=0, children_ages=(0,),
+                  min_price=None, max_price=None, min_rating=None, sort="price", limit=10,
+                  lat=None, lon=None, radius_km=None):
+    """Hotels in a city for a stay from the offer store, fetching all price ranges on a miss or expiry"""
+    return offer_store.search(
+        "hotel", city,
+        lambda: get_hotels(f"{city} hotels", check_in_date, check_out_date, num_adults,
+                           None, None, num_children, children_ages),
+        category="hotels", stay=stay_key(check_in_date, check_out_date, num_adults, num_children),
+        min_price=min_price, max_price=max_price, min_rating=min_rating, sort=sort, limit=limit,
+        near=_near(city, lat, lon, radius_km),
+    )
+
+def search_places(city, category="tourist attractions", max_price_level=None, min_rating=None,
+                  sort="rating", limit=10, lat=None, lon=None, radius_km=None):
+    """Places of a category in a city from the offer store, fetching on a miss or expiry"""
+    return offer_store.search(
+        "place", city, lambda: get_local_results(f"{category} in {city}"),
+        category=category, max_price=max_price_level, min_rating=min_rating, sort=sort, limit=limit,
+        near=_near(city, lat, lon, radius_km),
+    )
+
+def store_trip_offers(user_input, hotels, activities, tourist_places):
+    """Keep the offers fetched for an itinerary in the offer store.
+
+    Itinerary hotel searches are limited to the requested price range, so
+    they add to the store without marking the stay as searched.
+    """
+    city = user_input["to_city"]
+    stay = stay_key(user_input["departure_date"], user_input["return_date"],
+                    user_input["num_adults"], user_input["num_children"])
+    try:
+        offer_store.add("hotel", city, hotels, "hotels", stay)
+        offer_store.add("place", city, activities, "restaurants")
+        offer_store.add("place", city, tourist_places, "tourist attractions")
+    except Exception as e:
+        print(f"Storing offers for {city} failed: {e}")
+
+def store_hotel_offers(stay_city_and_type, check_in_date, check_out_date, num_adults, num_children, hotels,
+                       complete=False):
+    """Keep the hotels of a live /hotels search in the offer store.
+
+    Only "<city> hotels" searches for a known city are kept. A search
+    without a price range, as deep as the store's own, completes the stay so
+    /hotels/search answers from the store; price-limited ones are stored
+    like itinerary searches, without marking the stay as searched.
+    """
+    query = stay_city_and_type.strip()
+    city = query[:-len(" hotels")] if query.lower().endswith(" hotels") else query
+    if locations.resolve(city) is None:
+        return
+    try:
+        offer_store.add("hotel", city, hotels, "hotels",
+                        stay_key(check_in_date, check_out_date, num_adults, num_children), complete=complete)
+    except Exception as e:
+        print(f"Storing offers for {city} failed: {e}")
+
+
+# Async entry points. The fetchers above block on HTTP, so these run them on
+# the shared provider pool and can be awaited or handed to fan_out directly.
+async def fetch_flights(from_location_ID, to_location_ID, departure_date):
+    return await run_blocking(get_flights, from_location_ID, to_location_ID, departure_date)
+
+async def fetch_hotels(stay_city_and_type, check_in_date, check_out_date, num_adults,
+                       min_price, max_price, num_children=0, children_ages=(0,), max_pages=3):
+    return await run_blocking(
+        get_hotels, stay_city_and_type, check_in_date, check_out_date, num_adults,
+        min_price, max_price, num_children, children_ages, max_pages,
+    )
+
+async def fetch_activities(activity_query, destination_city, num_pages=3):
+    return await run_blocking(get_activities, activity_query, destination_city, num_pages)
+
+async def fetch_tourist_places(place_type, destination_city, num_pages=3):
+    return await run_blocking(get_tourist_places, place_type, destination_city, num_pages)
+
+async def fetch_trains(departure_code, departure_name, destination_code, destination_name, journey_date,
+                       availability=False):
+    return await run_blocking(
+        get_trains, departure_code, departure_name, destination_code, destination_name, journey_date,
+        availability,
+    )
+
+
+# Empty values used when a provider fails or times out
+PROVIDER_DEFAULTS = {
+    "flights": {},
+    "hotels": [],
+    "activities": [],
+    "trains": {"trains": []},
+    "tourist_places": [],
+    "return_flights": {},
+    "return_trains": {"trains": []},
+}
+
+def itinerary_calls(user_input):
+    """Zero-argument async provider fetches for one itinerary request, keyed like PROVIDER_DEFAULTS.
+
+    Flights are skipped when either city has no airport in range or both use
+    the same one, and trains when either station is unknown, so no paid
+    search is made with a missing code. Callers fall back to PROVIDER_DEFAULTS.
+    The return_ searches cover the way back on return_date, which the day
+    planner needs to end the last day in time.
+    """
+    from_city, to_city = user_input["from_city"], user_input["to_city"]
+    from_iata, to_iata = get_iata_code(from_city), get_iata_code(to_city)
+    # Station codes picked in the form take precedence when they are known
+    from_station = user_input.get("from_station")
+    if from_station not in locations.stations:
+        from_station = get_station_code(from_city)
+    to_station = user_input.get("to_station")
+    if to_station not in locations.stations:
+        to_station = get_station_code(to_city)
+
+    calls = {}
+    if from_iata and to_iata and from_iata != to_iata:
+        calls["flights"] = functools.partial(
+            fetch_flights, from_iata, to_iata, user_input["departure_date"],
+        )
+        calls["return_flights"] = functools.partial(
+            fetch_flights, to_iata, from_iata, user_input["return_date"],
+        )
+    calls["hotels"] = functools.partial(
+        fetch_hotels,
+        to_city + " hotels",
+        user_input["departure_date"],
+        user_input["return_date"],
+        user_input["num_adults"],
+        user_input["min_price"],
+        user_input["max_price"],
+        user_input["num_children"],
+        user_input["children_ages"],
+        3,
+    )
+    calls["activities"] = functools.partial(fetch_activities, "Restaurants in " + to_city, to_city, 3)
+    if from_station and to_station and from_station != to_station:
+        calls["trains"] = functools.partial(
+            fetch_trains, from_station, from_city, to_station, to_city, user_input["departure_date"],
+        )
+        calls["return_trains"] = functools.partial(
+            fetch_trains, to_station, to_city, from_station, from_city, user_input["return_date"],
+        )
+    calls["tourist_places"] = functools.partial(fetch_tourist_places, "tourist attractions", to_city, 3)
+    return calls
@@ -0,0 +1,178 @@
+import math
+import os
+import threading
+
+import numpy as np
+
+from metrics import span, register_stats
+
+# Candidates kept per category for retrieval and the prompt
+RANK_TOP_HOTELS = int(os.getenv("RANK_TOP_HOTELS", 10))
+RANK_TOP_PLACES = int(os.getenv("RANK_TOP_PLACES", 12))
+# Share of the total budget expected to go on the stay
+HOTEL_BUDGET_SHARE = float(os.getenv("HOTEL_BUDGET_SHARE", 0.4))
+ADULTS_PER_ROOM = 2
+# Attractions whose location the other candidates are scored against
+ATTRACTION_ANCHORS = 5
+# Distance at which the distance score drops to 1/e, and the review count
+# at which the review score saturates
+DISTANCE_SCALE_KM = 5.0
+REVIEWS_SATURATION = 2000
+# Price score of a hotel without a listed price
+UNKNOWN_PRICE_FIT = 0.3
+
+HOTEL_WEIGHTS = {"price": 0.4, "rating": 0.25, "reviews": 0.15, "distance": 0.2}
+PLACE_WEIGHTS = {"rating": 0.45, "reviews": 0.3, "distance": 0.25}
+
+ranking_stats = {"requests": 0, "candidates": 0, "kept": 0}
+_stats_lock = threading.Lock()
+register_stats("ranking", lambda: dict(ranking_stats))
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def columns(items, rating_key, price_path=()):
+    """Rating, reviews, coordinates and price of provider items as float arrays, NaN where missing.
+
+    Fields are read in one pass into a (len(items), 5) table; price is NaN
+    without a price_path.
+    """
+    rows = []
+    for item in items:
+        gps = item.get("gps_coordinates") or {}
+        price = item
+        for key in price_path:
+            price = price.get(key) if isinstance(price, dict) else None
+        rows.append((item.get(rating_key), item.get("reviews"), gps.get("latitude"), gps.get("longitude"),
+                     price if price_path else None))
+    try:
+        # None converts to NaN
+        table = np.array(rows, dtype=np.float64).reshape(len(rows), 5)
+    except (TypeError, ValueError):
+        # A field with text in it, e.g. a rating of "4.5"
+        table = np.array([[_number(v) for v in row] for row in rows], dtype=np.float64).reshape(len(rows), 5)
+    return dict(zip(("rating", "reviews", "lat", "lon", "price"), table.T))
+
+
+def haversine_km(lat, lon, lat2, lon2):
+    """Great-circle distances between every (lat, lon) and every (lat2, lon2), shape (len(lat), len(lat2))."""
+    lat, lon = np.radians(lat)[:, None], np.radians(lon)[:, None]
+    lat2, lon2 = np.radians(lat2)[None, :], np.radians(lon2)[None, :]
+    a = np.sin((lat2 - lat) / 2) ** 2 + np.cos(lat) * np.cos(lat2) * np.sin((lon2 - lon) / 2) ** 2
+    return 6371 * 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def rating_score(rating):
+    return np.nan_to_num(np.clip((rating - 3) / 2, 0, 1))
+
+
+def reviews_score(reviews):
+    return np.clip(np.log1p(np.nan_to_num(reviews)) / math.log1p(REVIEWS_SATURATION), 0, 1)
+
+
+def distance_score(cols, anchors):
+    """exp(-km / DISTANCE_SCALE_KM) of the mean distance to the anchor points; 0 without coordinates."""
+    if anchors is None:
+        return np.zeros(len(cols["lat"]))
+    distances = haversine_km(cols["lat"], cols["lon"], anchors[0], anchors[1]).mean(axis=1)
+    return np.nan_to_num(np.exp(-distances / DISTANCE_SCALE_KM))
+
+
+def nightly_limit(user_input):
+    """Highest fitting price per room and night: the hotel share of the budget, capped at max_price."""
+    nights = max(int(user_input.get("days") or 1) - 1, 1)
+    rooms = max(math.ceil((user_input.get("num_adults") or 1) / ADULTS_PER_ROOM), 1)
+    limit = (user_input.get("budget") or 0) * HOTEL_BUDGET_SHARE / (nights * rooms)
+    max_price = user_input.get("max_price")
+    if max_price:
+        limit = min(limit, max_price) if limit > 0 else max_price
+    return limit or np.inf
+
+
+def price_fit(price, user_input):
+    """1 inside [min_price, nightly limit], decaying above it and 0.8 below min_price."""
+    limit = nightly_limit(user_input)
+    fit = np.ones_like(price)
+    over = price > limit
+    if np.isfinite(limit):
+        fit[over] = np.exp(-(price[over] - limit) / (0.25 * limit))
+    min_price = user_input.get("min_price") or 0
+    fit[price < min_price] = 0.8
+    fit[np.isnan(price)] = UNKNOWN_PRICE_FIT
+    return fit
+
+
+def attraction_anchors(tourist_places, k=ATTRACTION_ANCHORS):
+    """(lats, lons) of the best rated and most reviewed attractions with coordinates, or None."""
+    if not tourist_places:
+        return None
+    cols = columns(tourist_places, "rating")
+    located = ~(np.isnan(cols["lat"]) | np.isnan(cols["lon"]))
+    if not located.any():
+        return None
+    quality = np.where(located, rating_score(cols["rating"]) + reviews_score(cols["reviews"]), -np.inf)
+    top = np.argsort(-quality, kind="stable")[:min(k, int(located.sum()))]
+    return cols["lat"][top], cols["lon"][top]
+
+
+def _weighted(scores, weights):
+    return sum(weights[name] * scores[name] for name in weights)
+
+
+def score_hotels(hotels, user_input, anchors):
+    cols = columns(hotels, "overall_rating", ("rate_per_night", "extracted_lowest"))
+    return _weighted({
+        "price": price_fit(cols["price"], user_input),
+        "rating": rating_score(cols["rating"]),
+        "reviews": reviews_score(cols["reviews"]),
+        "distance": distance_score(cols, anchors),
+    }, HOTEL_WEIGHTS)
+
+
+def score_places(places, anchors):
+    cols = columns(places, "rating")
+    return _weighted({
+        "rating": rating_score(cols["rating"]),
+        "reviews": reviews_score(cols["reviews"]),
+        "distance": distance_score(cols, anchors),
+    }, PLACE_WEIGHTS)
+
+
+def top_n(items, scores, n):
+    """The n highest scoring items, best first; ties keep the provider order."""
+    if len(items) <= n:
+        order = np.argsort(-scores, kind="stable")
+    else:
+        candidates = np.argpartition(-scores, n - 1)[:n]
+        order = candidates[np.lexsort((candidates, -scores[candidates]))]
+    return [items[i] for i in order]
+
+
+def rank_travel_data(user_input, hotels, activities, tourist_places,
+                     top_hotels=RANK_TOP_HOTELS, top_places=RANK_TOP_PLACES):
+    """Keep the best hotels, restaurants and attractions for the request.
+
+    Hotels are scored on how their nightly price fits the budget over the
+    trip and the party size, rating, review count and mean distance to the
+    top attractions; places on the same without price. Scores are computed
+    over NumPy columns, so thousands of candidates take a few milliseconds.
+
+    Returns:
+        tuple: (hotels, activities, tourist_places), each best first.
+    """
+    with span("rank"):
+        anchors = attraction_anchors(tourist_places)
+        ranked = (
+            top_n(hotels, score_hotels(hotels, user_input, anchors), top_hotels) if hotels else hotels,
+            top_n(activities, score_places(activities, anchors), top_places) if activities else activities,
+            top_n(tourist_places, score_places(tourist_places, anchors), top_places)
+            if tourist_places else tourist_places,
+        )
+    candidates = sum(len(items or []) for items in (hotels, activities, tourist_places))
+    with _stats_lock:
+        ranking_stats["requests"] += 1
+        ranking_stats["candidates"] += candidates
+        ranking_stats["kept"] += sum(len(items or []) for items in ranked)
+    return ranked
@@ -0,0 +1,312 @@
+import hashlib
+import os
+import random
+import threading
+import time
+
+import requests
+
+from cache import LazyConnection
+from metrics import register_stats
+
+# Requests per second and burst size allowed per API key
+SERPAPI_RATE = float(os.getenv("SERPAPI_RATE", 5))
+SERPAPI_BURST = int(os.getenv("SERPAPI_BURST", 10))
+SCRAPINGANT_RATE = float(os.getenv("SCRAPINGANT_RATE", 1))
+SCRAPINGANT_BURST = int(os.getenv("SCRAPINGANT_BURST", 3))
+# Longest a call waits for a rate limit token before failing fast
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", 5))
+# Consecutive failures that open a provider's circuit, and seconds it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", 30))
+# Extra attempts after a retryable failure, with jittered exponential backoff
+PROVIDER_RETRIES = int(os.getenv("PROVIDER_RETRIES", 2))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", 4))
+# Monthly call quotas; 0 means no limit is enforced
+QUOTA_DB_PATH = os.getenv("QUOTA_DB_PATH", "./quota.db")
+SERPAPI_MONTHLY_QUOTA = int(os.getenv("SERPAPI_MONTHLY_QUOTA", 0))
+SCRAPINGANT_MONTHLY_QUOTA = int(os.getenv("SCRAPINGANT_MONTHLY_QUOTA", 0))
+
+
+class ProviderError(Exception):
+    """An upstream call that failed or was refused."""
+
+
+class ProviderUnavailable(ProviderError):
+    """Refused locally without calling upstream; retry after retry_after seconds."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimited(ProviderUnavailable):
+    pass
+
+
+class CircuitOpen(ProviderUnavailable):
+    pass
+
+
+class QuotaExceeded(ProviderUnavailable):
+    pass
+
+
+class UpstreamError(ProviderError):
+    """Upstream answered with an error or could not be reached."""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        # Network errors, throttling and server errors; not bad requests
+        return self.status is None or self.status == 429 or self.status >= 500
+
+
+def check_response(provider, response, retry_statuses=(), detail=None):
+    """Raise UpstreamError for an HTTP error status."""
+    if response.status_code < 400:
+        return
+    retry_after = response.headers.get("Retry-After")
+    raise UpstreamError(
+        f"{provider} returned HTTP {response.status_code}" + (f": {detail}" if detail else ""),
+        # Some providers signal throttling with other codes, e.g. ScrapingAnt's 423
+        status=429 if response.status_code in retry_statuses else response.status_code,
+        retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+    )
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout, abort=None):
+        """Take a token, waiting up to timeout seconds or until abort() is true.
+
+        Returns False if no token was taken.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            if abort is not None and abort():
+                return False
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets one probe call through per reset_timeout."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def is_open(self):
+        """True while calls are being refused, without claiming the half-open probe."""
+        with self._lock:
+            return self.state == self.HALF_OPEN or (self.state == self.OPEN and self.retry_after() > 0)
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.retry_after() == 0:
+                # Let a single probe through; others keep failing fast until it reports
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class QuotaCounter:
+    """Upstream calls per provider per calendar month, persisted in SQLite."""
+
+    def __init__(self, path=QUOTA_DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = LazyConnection(path, [
+            "CREATE TABLE IF NOT EXISTS usage (provider TEXT, month TEXT, calls INTEGER, "
+            "PRIMARY KEY (provider, month))",
+        ])
+
+    @staticmethod
+    def month():
+        return time.strftime("%Y-%m", time.gmtime())
+
+    def used(self, provider):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT calls FROM usage WHERE provider = ? AND month = ?", (provider, self.month())
+            ).fetchone()
+        return row[0] if row else 0
+
+    def record(self, provider):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO usage VALUES (?, ?, 1) "
+                "ON CONFLICT (provider, month) DO UPDATE SET calls = calls + 1",
+                (provider, self.month()),
+            )
+            self._conn.commit()
+
+
+class ProviderGuard:
+    """Rate limit, circuit breaker, retries and quota accounting for one provider.
+
+    Args:
+        name (str): Provider name used in errors and stats.
+        rate (float): Calls per second allowed per API key.
+        burst (int): Calls allowed at once per API key.
+        quota (QuotaCounter): Shared monthly usage counter.
+        monthly_quota (int, optional): Calls allowed per month, 0 for no limit.
+    """
+
+    def __init__(self, name, rate, burst, quota, monthly_quota=0, retries=PROVIDER_RETRIES,
+                 max_wait=RATE_LIMIT_MAX_WAIT, breaker=None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.quota = quota
+        self.monthly_quota = monthly_quota
+        self.retries = retries
+        self.max_wait = max_wait
+        self.breaker = breaker or CircuitBreaker()
+        self.counts = {"calls": 0, "succeeded": 0, "failed": 0, "retried": 0,
+                       "rate_limited": 0, "short_circuited": 0, "over_quota": 0}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, api_key):
+        # Keyed by a hash so API keys are never held or reported in clear
+        key = hashlib.sha256((api_key or "").encode()).hexdigest()[:12]
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(self.rate, self.burst)
+            return self._buckets[key]
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _short_circuit(self):
+        self._count("short_circuited")
+        raise CircuitOpen(f"{self.name} circuit is open", retry_after=self.breaker.retry_after())
+
+    def call(self, fn, api_key=None):
+        """Call fn() under the guard and return its result.
+
+        Raises:
+            ProviderUnavailable: Refused locally (circuit open, rate limit, quota).
+            UpstreamError: Upstream kept failing or rejected the request.
+        """
+        bucket = self._bucket(api_key)
+        for attempt in range(self.retries + 1):
+            if self.monthly_quota and self.quota.used(self.name) >= self.monthly_quota:
+                self._count("over_quota")
+                raise QuotaExceeded(f"{self.name} monthly quota of {self.monthly_quota} calls used up")
+            # Checked before and after waiting for a token: the circuit may
+            # have opened while this call was queued behind the rate limit
+            if self.breaker.is_open():
+                self._short_circuit()
+            if not bucket.acquire(self.max_wait, abort=self.breaker.is_open):
+                if self.breaker.is_open():
+                    self._short_circuit()
+                self._count("rate_limited")
+                raise RateLimited(f"{self.name} rate limit reached", retry_after=1 / self.rate)
+            if not self.breaker.allow():
+                self._short_circuit()
+
+            self._count("calls")
+            self.quota.record(self.name)
+            try:
+                result = fn()
+            except requests.RequestException as e:
+                error = UpstreamError(f"{self.name} request failed: {e}")
+            except UpstreamError as e:
+                error = e
+            except Exception:
+                # Unexpected failure, e.g. an unparseable body; keep a half-open circuit from sticking
+                self.breaker.record_failure()
+                self._count("failed")
+                raise
+            else:
+                self.breaker.record_success()
+                self._count("succeeded")
+                return result
+
+            self._count("failed")
+            if not error.retryable:
+                # A rejected request says nothing about the provider's health
+                self.breaker.record_success()
+                raise error
+            self.breaker.record_failure()
+            if attempt == self.retries:
+                raise error
+            self._count("retried")
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+            time.sleep(min(RETRY_MAX_DELAY, max(delay, error.retry_after or 0)))
+
+    def stats(self):
+        used = self.quota.used(self.name)
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            **counts,
+            "circuit": self.breaker.state,
+            "month": QuotaCounter.month(),
+            "monthly_calls": used,
+            "monthly_quota": self.monthly_quota or None,
+            "remaining": max(0, self.monthly_quota - used) if self.monthly_quota else None,
+        }
+
+
+quota_counter = QuotaCounter()
+guards = {
+    "serpapi": ProviderGuard("serpapi", SERPAPI_RATE, SERPAPI_BURST, quota_counter, SERPAPI_MONTHLY_QUOTA),
+    "scrapingant": ProviderGuard("scrapingant", SCRAPINGANT_RATE, SCRAPINGANT_BURST, quota_counter,
+                                 SCRAPINGANT_MONTHLY_QUOTA),
+}
+
+
+def quota_report():
+    return {name: guard.stats() for name, guard in guards.items()}
+
+
+register_stats("provider", quota_report, label="provider")
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from embeddings import BatchingEmbeddings, EmbeddingCache, EMBEDDING_CACHE_DIR
+from trips import trip_store, start_compaction
+from metrics import register_stats
+
+# Heavy clients are created on first use (or by warm_up at startup) rather
+# than at import, so importing an app, starting a worker or running a script
+# does not pay for the model load and Chroma open until they are needed.
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+RESOURCE_WARM_UP = os.getenv("RESOURCE_WARM_UP", "1").lower() not in ("0", "false", "no")
+
+
+def _embeddings():
+    from langchain_huggingface import HuggingFaceEmbeddings
+    # Embeddings are micro-batched across requests and cached on disk by text hash
+    return BatchingEmbeddings(
+        HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL),
+        EmbeddingCache(EMBEDDING_CACHE_DIR),
+    )
+
+def _chroma_client():
+    import chromadb
+    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    # Expired trip collections are only worth sweeping once Chroma is open
+    start_compaction(client)
+    return client
+
+def _llm():
+    from langchain_groq import ChatGroq
+    return ChatGroq(model_name=LLM_MODEL, api_key=os.getenv("GROQ_API_KEY"))
+
+_FACTORIES = {
+    "embeddings": _embeddings,
+    "chroma_client": _chroma_client,
+    "llm": _llm,
+}
+_instances = {}
+_locks = {name: threading.Lock() for name in _FACTORIES}
+
+
+def get(name):
+    """Return the shared instance of a resource, creating it on first use."""
+    instance = _instances.get(name)
+    if instance is None:
+        # One lock per resource so loading the model does not block the LLM client
+        with _locks[name]:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = _FACTORIES[name]()
+    return instance
+
+def get_embeddings():
+    return get("embeddings")
+
+def get_chroma_client():
+    return get("chroma_client")
+
+def get_llm():
+    return get("llm")
+
+def get_vector_store(scope):
+    """Vector store for one trip, backed by the shared client and embedder"""
+    return trip_store(get_chroma_client(), get_embeddings(), scope)
+
+def is_loaded(name):
+    return name in _instances
+
+def override(**instances):
+    """Replace resources, e.g. with fakes in benchmarks"""
+    _instances.update(instances)
+
+def embedding_stats():
+    """Embedding counters, without loading the model just to report them"""
+    if not is_loaded("embeddings"):
+        return {}
+    embeddings = get_embeddings()
+    stats = dict(getattr(embeddings, "stats", {}))
+    if getattr(embeddings, "cache", None) is not None:
+        stats["cached_vectors"] = len(embeddings.cache)
+    return stats
+
+register_stats("embeddings", embedding_stats)
+
+
+def warm_up():
+    """Create every resource concurrently and return the seconds each took."""
+    def load(name):
+        start = time.perf_counter()
+        instance = get(name)
+        if name == "embeddings":
+            # The first forward pass initialises the model runtime
+            instance.embed_query("warm up")
+        return name, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=len(_FACTORIES)) as pool:
+        timings = dict(pool.map(load, _FACTORIES))
+    print("Warmed up " + ", ".join(f"{name} in {seconds:.2f}s" for name, seconds in timings.items()))
+    return timings
@@ -0,0 +1,57 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait and receive the same result (or exception). Nothing is
+    remembered once the call finishes, so this complements the response cache
+    rather than replacing it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._inflight[key] = call
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            inflight = len(self._inflight)
+        return {"calls": self.calls, "coalesced": self.coalesced, "inflight": inflight}
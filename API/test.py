@@ -32,7 +32,7 @@ def test_hotel_details():
         "max_price": 5000,
         "num_children": 0,
         "children_ages": [],
-        "page": 1
+        "max_pages": 1
     }
 
     response = requests.post(f"{BASE_URL}/hotels", json=payload)
@@ -0,0 +1,170 @@
+import datetime
+import re
+from html import unescape
+from html.parser import HTMLParser
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y")
+
+# Patterns for the text of a RailYatri "trains between stations" page. The
+# markdown from ScrapingAnt and the text of the HTML page share them.
+TRAIN_HEADER = re.compile(r"^(?:#+\s*)?(\d{5})\s+(.+)$")
+RUNS_ON = re.compile(r"^Runs on:\s*(.+)$", re.IGNORECASE)
+TIMING = re.compile(
+    r"(\d{1,2}:\d{2})\s+([A-Z]{1,5})\s*[—–-]+\s*(\d+h\s*\d+m)\s*[—–-]+\s*(\d{1,2}:\d{2})\s+([A-Z]{1,5})"
+)
+CLASS_ROW = re.compile(r"^\|?\s*(1A|2A|3A|3E|EA|EC|CC|FC|SL|2S)\s*\|\s*₹\s*([\d,]+)\s*\|\s*([^|]*?)\s*\|?$")
+AVAILABILITY_LINK = re.compile(r"https://www\.railyatri\.in/seat-availability\?train=\d+")
+
+
+class _TextExtractor(HTMLParser):
+    """HTML -> text lines, with table cells joined as '| a | b |' like the markdown."""
+
+    BLOCK_TAGS = {"div", "p", "h1", "h2", "h3", "h4", "li", "section", "article", "nav", "footer", "table"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines = []
+        self._line = []
+        self._row = None
+        self._skip = 0
+
+    def _flush(self):
+        text = " ".join("".join(self._line).split())
+        if text:
+            self.lines.append(text)
+        self._line = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip += 1
+        elif tag == "tr":
+            self._flush()
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            self._line = []
+        elif tag == "a":
+            href = dict(attrs).get("href") or ""
+            if AVAILABILITY_LINK.match(href):
+                self._flush()
+                self.lines.append(href)
+        elif tag == "br" or tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style"):
+            self._skip -= 1
+        elif tag in ("td", "th") and self._row is not None:
+            self._row.append(" ".join("".join(self._line).split()))
+            self._line = []
+        elif tag == "tr" and self._row is not None:
+            self.lines.append("| " + " | ".join(self._row) + " |")
+            self._row = None
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._line.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def html_to_lines(html):
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return parser.lines
+
+
+def parse_lines(lines):
+    """Train records from the text lines of a trains-between-stations page."""
+    trains = []
+    train = None
+    for line in lines:
+        line = unescape(line).strip()
+        header = TRAIN_HEADER.match(line)
+        if header:
+            train = {
+                "number": header.group(1),
+                "name": header.group(2).strip(),
+                "runs_on": "Daily",
+                "classes": [],
+            }
+            trains.append(train)
+            continue
+        if train is None:
+            continue
+        runs_on = RUNS_ON.match(line)
+        if runs_on:
+            train["runs_on"] = runs_on.group(1).strip()
+            continue
+        timing = TIMING.search(line)
+        if timing:
+            train.update({
+                "departs": timing.group(1),
+                "from_station": timing.group(2),
+                "duration": " ".join(timing.group(3).split()),
+                "arrives": timing.group(4),
+                "to_station": timing.group(5),
+            })
+            continue
+        row = CLASS_ROW.match(line)
+        if row:
+            train["classes"].append({
+                "class": row.group(1),
+                "fare": int(row.group(2).replace(",", "")),
+                "availability": row.group(3) or None,
+            })
+            continue
+        link = AVAILABILITY_LINK.search(line)
+        if link:
+            train["link"] = link.group(0)
+    # Headers without a timetable line are page furniture, not trains
+    return [t for t in trains if "departs" in t]
+
+
+def parse_markdown(text):
+    return parse_lines((text or "").splitlines())
+
+
+def parse_html(html):
+    return parse_lines(html_to_lines(html or ""))
+
+
+def parse_page(content):
+    """Parse a scraped page, whichever of HTML or markdown it is."""
+    if re.search(r"<(html|body|div|table)\b", content or "", re.IGNORECASE):
+        return parse_html(content)
+    return parse_markdown(content)
+
+
+def weekday(journey_date):
+    """'Mon'..'Sun' for a journey date, or None if the date cannot be read."""
+    for fmt in DATE_FORMATS:
+        try:
+            return WEEKDAYS[datetime.datetime.strptime(journey_date, fmt).weekday()]
+        except ValueError:
+            continue
+    return None
+
+
+def runs_on(train, day):
+    """Whether a train with a 'Daily', 'Except Sun' or 'Tue, Thu' pattern runs on day."""
+    pattern = train.get("runs_on", "Daily")
+    if pattern.lower() == "daily" or day is None:
+        return True
+    days = re.findall(r"Mon|Tue|Wed|Thu|Fri|Sat|Sun", pattern)
+    if pattern.lower().startswith("except"):
+        return day not in days
+    return day in days if days else True
+
+
+def schedule_of(trains):
+    """Trains without seat availability, which changes by the hour."""
+    return [
+        {**train, "classes": [{k: v for k, v in c.items() if k != "availability"} for c in train["classes"]]}
+        for train in trains
+    ]
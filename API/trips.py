@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+import uuid
+from cache import make_key
+
+# How long a trip's documents stay in the vector store, and how often the
+# compaction job looks for expired ones, in seconds
+TRIP_TTL = int(os.getenv("TRIP_TTL", 24 * 60 * 60))
+COMPACTION_INTERVAL = int(os.getenv("COMPACTION_INTERVAL", 15 * 60))
+TRIP_COLLECTION_PREFIX = "trip_"
+# Request fields besides the fetch that change which candidates
+# ranking.rank_travel_data keeps, and so which documents a trip stores
+RANKING_FIELDS = ("budget", "days")
+
+
+def trip_key(user_input):
+    """Key for the provider data of a request, ignoring fields the fetch does not use"""
+    return make_key({
+        "from_city": user_input["from_city"].lower(),
+        "to_city": user_input["to_city"].lower(),
+        "departure_date": user_input["departure_date"],
+        "return_date": user_input["return_date"],
+        "num_adults": user_input["num_adults"],
+        "num_children": user_input["num_children"],
+        "children_ages": user_input["children_ages"],
+        "min_price": user_input["min_price"],
+        "max_price": user_input["max_price"],
+    })
+
+
+def trip_scope(user_input, request_id=None, ttl=TRIP_TTL):
+    """Metadata attached to every document stored for one itinerary request.
+
+    Requests that fetch identical provider data and rank it the same way
+    share a trip_id and therefore a trip collection. Requests for the same
+    trip with another budget or length store a different ranked set, so they
+    get their own collection rather than replacing each other's documents.
+    """
+    return {
+        "trip_id": make_key({
+            "trip": trip_key(user_input), **{field: user_input.get(field) for field in RANKING_FIELDS}
+        })[:16],
+        "route": f"{user_input['from_city']} -> {user_input['to_city']}",
+        "departure_date": user_input["departure_date"],
+        "return_date": user_input["return_date"],
+        "request_id": request_id or uuid.uuid4().hex,
+        "expires_at": time.time() + ttl,
+    }
+
+
+def trip_store(client, embedding_function, scope):
+    """Vector store holding only the documents of one trip.
+
+    Each trip gets its own collection, so similarity search cost depends on
+    the size of the trip rather than on everything stored so far. The
+    collection metadata carries the trip's expiry for the compaction job.
+    """
+    # Imported here because langchain_chroma pulls in chromadb, which is slow to import
+    from langchain_chroma import Chroma
+    store = Chroma(
+        client=client,
+        collection_name=TRIP_COLLECTION_PREFIX + scope["trip_id"],
+        embedding_function=embedding_function,
+    )
+    store._collection.modify(metadata={
+        "route": scope["route"],
+        "departure_date": scope["departure_date"],
+        "return_date": scope["return_date"],
+        "expires_at": scope["expires_at"],
+    })
+    return store
+
+
+def evict_expired(client, now=None):
+    """Drop the collections of expired trips and return how many were removed."""
+    now = time.time() if now is None else now
+    removed = 0
+    for collection in client.list_collections():
+        if not collection.name.startswith(TRIP_COLLECTION_PREFIX):
+            continue
+        expires_at = (collection.metadata or {}).get("expires_at", 0)
+        if expires_at < now:
+            client.delete_collection(collection.name)
+            removed += 1
+    return removed
+
+
+def start_compaction(client, interval=COMPACTION_INTERVAL):
+    """Run evict_expired periodically on a daemon thread."""
+    def run():
+        while True:
+            try:
+                removed = evict_expired(client)
+                if removed:
+                    print(f"Evicted {removed} expired trip collections")
+            except Exception as e:
+                print(f"Trip compaction failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="trip-compaction", daemon=True)
+    thread.start()
+    return thread
@@ -1,5 +1,4 @@
 import React, { useState, useEffect } from 'react';
-import axios from 'axios';
 import ReactMarkdown from 'react-markdown'; // Ensure this is installed
 import './TravelForm.css';
 
@@ -20,6 +19,7 @@ const TravelForm = () => {
     to_station: '',
   });
   const [itinerary, setItinerary] = useState(null);
+  const [progress, setProgress] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
 
@@ -72,20 +72,56 @@ const TravelForm = () => {
     }));
   };
 
+  // Handle one server-sent event from the streaming endpoint
+  const handleStreamEvent = (rawEvent) => {
+    let event = 'message';
+    let data = '';
+    rawEvent.split('\n').forEach((line) => {
+      if (line.startsWith('event:')) event = line.slice(6).trim();
+      else if (line.startsWith('data:')) data += line.slice(5).trim();
+    });
+    const payload = data ? JSON.parse(data) : {};
+    if (event === 'provider') {
+      setProgress((prev) => [...prev, payload]);
+    } else if (event === 'token') {
+      setItinerary((prev) => (prev || '') + payload.text);
+    } else if (event === 'error') {
+      setError('Failed to generate itinerary. Please try again.');
+      console.error('Stream error:', payload.error);
+    }
+  };
+
   // Handle form submission
   const handleSubmit = async (e) => {
     e.preventDefault();
     setLoading(true);
     setError(null);
+    setItinerary(null);
+    setProgress([]);
     console.log('Sending form data:', formData); // Debug log
     try {
-      const response = await axios.post('http://localhost:8080/generate-itinerary', formData, {
+      // Stream progress and itinerary tokens as they are generated
+      const response = await fetch('http://localhost:8080/generate-itinerary/stream', {
+        method: 'POST',
         headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(formData),
       });
-      console.log('Response:', response.data); // Debug log
-      setItinerary(response.data.itinerary);
+      if (!response.ok) {
+        throw new Error(`Request failed with status ${response.status}`);
+      }
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        events.filter((rawEvent) => rawEvent.trim()).forEach(handleStreamEvent);
+      }
     } catch (error) {
-      console.error('Error details:', error.response ? error.response.data : error.message);
+      console.error('Error details:', error.message);
       setError('Failed to generate itinerary. Please try again.');
     } finally {
       setLoading(false);
@@ -299,6 +335,17 @@ const TravelForm = () => {
         </button>
       </form>
 
+      {/* Provider Progress */}
+      {progress.length > 0 && (
+        <div className="progress-container">
+          {progress.map((step) => (
+            <div key={step.provider} className="progress-step">
+              {step.ok ? '✓' : '✗'} {step.provider.replace('_', ' ')} ({step.seconds}s)
+            </div>
+          ))}
+        </div>
+      )}
+
       {/* Error Message */}
       {error && <div className="error-message">{error}</div>}
 
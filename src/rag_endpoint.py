@@ -1,19 +1,37 @@
 import os
-import requests
-import chromadb
+import sys
 from dotenv import load_dotenv
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_groq import ChatGroq
-from langchain.schema import Document
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-app = FastAPI()
+import asyncio
+from contextlib import asynccontextmanager
+
+# Shared helpers live next to the provider API
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "API"))
+from trips import trip_scope
+from documents import build_documents
+import resources
+from resources import get_embeddings, get_vector_store, get_llm, RESOURCE_WARM_UP
+from ingest import upsert_documents
+from fetch import fan_out
+from providers import itinerary_calls, check_cities, PROVIDER_DEFAULTS, store_trip_offers
+from locations import UnknownCity
+from itinerary_cache import ItineraryCache
+from prompt_context import build_context, record as record_prompt, CATEGORY_QUERIES
+from ranking import rank_travel_data
+from planner import plan_days, journeys, skeleton_text, DAY_PLANNER, PLANNED_CATEGORIES
+import metrics
+from metrics import span
+
+@asynccontextmanager
+async def lifespan(app):
+    if RESOURCE_WARM_UP:
+        await asyncio.to_thread(resources.warm_up)
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.add_middleware(
@@ -22,14 +40,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+metrics.instrument(app)
 
 load_dotenv()
-SERP_API_KEY = os.getenv("SERP_API_KEY")
-ANT_SCRAPY_API_KEY = os.getenv("ANT_SCRAPY_API_KEY")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-CHROMA_DB_PATH = "./chroma_db"
-embedding_function = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+# The embedder, Chroma client and LLM are lazy singletons in resources.py
+
+# Reuse itineraries generated for near-identical requests instead of calling the LLM
+# Namespaced because the other app shares the database but prompts from its own template
+itinerary_cache = ItineraryCache(lambda texts: get_embeddings().embed_documents(texts), namespace="rag_endpoint")
+metrics.register_stats("itinerary_cache", itinerary_cache.stats)
 
 
 # api_key = os.getenv("AVIATIONSTACK_API_KEY")
@@ -44,146 +65,60 @@ embedding_function = HuggingFaceEmbeddings(model_name="sentence-transformers/all
 
 
 
-iata_code_lookup = {
-    "New Delhi": "DEL",
-    "Mumbai": "BOM",
-    "Bangalore": "BLR",
-    "Hyderabad": "HYD",
-    "Chennai": "MAA",
-    "Kolkata": "CCU",
-    "Pune": "PNQ",
-    "Ahmedabad": "AMD",
-    "Jaipur": "JAI",
-    "Bhopal": "BPL",
-    "Lucknow": "LKO",
-    "Goa": "GOI",
-    "Patna": "PAT",
-    "Guwahati": "GAU",
-    "Nagpur": "NAG",
-    "Visakhapatnam": "VTZ",
-    "Coimbatore": "CJB",
-    "Thiruvananthapuram": "TRV",
-    "Indore": "IDR",
-    "Varanasi": "VNS"
-}
-station_code_lookup = {
-    "New Delhi": "NDLS",
-    "Mumbai": "CSTM",   
-    "Bangalore": "SBC",
-    "Hyderabad": "HYB",
-    "Chennai": "MAS",
-    "Kolkata": "HWH",   
-    "Pune": "PUNE",
-    "Ahmedabad": "ADI",
-    "Jaipur": "JP",
-    "Bhopal": "BPL",
-    "Lucknow": "LKO",
-    "Goa": "MAO",        
-    "Patna": "PNBE",
-    "Guwahati": "GHY",
-    "Nagpur": "NGP",
-    "Visakhapatnam": "VSKP",
-    "Coimbatore": "CBE",
-    "Thiruvananthapuram": "TVC",
-    "Indore": "INDB",
-    "Varanasi": "BSB"
-}
-
-def get_station_code(city):
-    return station_code_lookup.get(city, None)
-
-def get_iata_code(city):
-    return iata_code_lookup.get(city, None)
-
-
-llm = ChatGroq(model_name="llama-3.3-70b-versatile", api_key=GROQ_API_KEY)
-chroma_client = Chroma(persist_directory=CHROMA_DB_PATH, embedding_function=embedding_function, collection_name="travel_data")
-
-retriever = chroma_client.as_retriever()
-def get_iata_code(city):
-    return iata_code_lookup.get(city, None)
-
-def fetch_data(endpoint, params=None):
-
-    base_url = "http://localhost:8000"  
-    response = requests.get(f"{base_url}{endpoint}", params=params)
-    return response.json()
-
 def get_travel_data(user_input):
-    
-    from_iata = get_iata_code(user_input["from_city"])
-    to_iata = get_iata_code(user_input["to_city"])
-    
-    from_station_code = get_station_code(user_input["from_city"])
-    to_station_code = get_station_code(user_input["to_city"])
-
-    flight_data = fetch_data("/flights", {
-        "from_location_ID": from_iata,
-        "to_location_ID": to_iata,
-        "departure_date": user_input["departure_date"],
-    })
-
-
-    hotel_data = fetch_data("/hotels", {
-        "stay_city_and_type": user_input["to_city"] + " hotels",
-        "check_in_date": user_input["departure_date"],
-        "check_out_date": user_input["return_date"],
-        "num_adults": user_input["num_adults"],
-        "min_price": user_input["min_price"],
-        "max_price": user_input["max_price"],
-        "num_children": user_input["num_children"],
-        "children_ages": user_input["children_ages"],
-        "page": 3
-    })
-
-    activities_data = fetch_data("/activities", {
-        "activity_query": "Restaurants in " + user_input["to_city"],
-        "destination_city": user_input["to_city"],
-        "num_pages": 3
-    })
-
-    train_data = fetch_data("/train-details", {
-        "departure_code": from_station_code,
-        "departure_name": user_input["from_city"],
-        "destination_code": to_station_code ,
-        "destination_name": user_input["to_city"],
-        "journey_date": user_input["departure_date"]
-    })
-
-    tourist_places = fetch_data("/tourist-places", {
-        "place_type": "tourist attractions",
-        "destination_city": user_input["to_city"],
-        "num_pages": 3
-    })
-
-    return flight_data, hotel_data, activities_data, train_data, tourist_places
-
-
-
-
-def store_in_chromadb(data_dict):
-    """Convert travel data to documents and store them in ChromaDB"""
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    # Providers are called in-process and concurrently; a provider that fails
+    # or times out contributes an empty result.
+    results, errors, timings = fan_out(itinerary_calls(user_input), defaults=PROVIDER_DEFAULTS)
+    for name, error in errors.items():
+        print(f"Provider {name} failed after {timings[name]:.1f}s: {error}")
+
+    travel_data = tuple(results.get(name, default) for name, default in PROVIDER_DEFAULTS.items())
+    store_trip_offers(user_input, travel_data[1], travel_data[2], travel_data[4])
+    return travel_data
+
+
+
+
+def store_in_chromadb(data_dict, vector_store, scope):
+    """Convert travel data to per-entity documents tagged with the trip scope and store them in ChromaDB"""
+    docs = []
     for category, data in data_dict.items():
         if not data:
             continue
-        text = f"Category: {category}\n{str(data)}"
-        docs = [Document(page_content=chunk) for chunk in text_splitter.split_text(text)]
-        chroma_client.add_documents(docs)
+        docs.extend(build_documents(category, data, scope))
+    counts = upsert_documents(vector_store, docs)
+    print(f"Stored trip {scope['trip_id']}: {counts['embedded']} chunks embedded, "
+          f"{counts['skipped']} unchanged, {counts['deleted']} stale removed")
+    return counts
 
 
 
 def generate_travel_plan(user_input):
     
     """Generate a personalized travel plan using LLM and retrieved travel data"""
-    flight_data, hotel_data, activities_data, train_data, tourist_places = get_travel_data(user_input)
-    store_in_chromadb({
+    (flight_data, hotel_data, activities_data, train_data, tourist_places,
+     return_flights, return_trains) = get_travel_data(user_input)
+    hotel_data, activities_data, tourist_places = rank_travel_data(
+        user_input, hotel_data, activities_data, tourist_places
+    )
+    plan = None
+    if DAY_PLANNER:
+        outbound, inbound = journeys(user_input, flight_data, train_data, return_flights, return_trains)
+        plan = plan_days(user_input, hotel_data, activities_data, tourist_places, outbound, inbound)
+    data = {
         "Flights": flight_data,
         "Hotels": hotel_data,
         "Activities": activities_data,
         "Trains": train_data,
         "Tourist Places": tourist_places
-    })
+    }
+    queries = CATEGORY_QUERIES
+    if plan is not None:
+        data = {c: d for c, d in data.items() if c not in PLANNED_CATEGORIES}
+        queries = {c: q for c, q in CATEGORY_QUERIES.items() if c not in PLANNED_CATEGORIES}
+    scope = trip_scope(user_input)
+    vector_store = get_vector_store(scope)
+    store_in_chromadb(data, vector_store, scope)
 
     
     prompt_template = """
@@ -203,16 +138,20 @@ def generate_travel_plan(user_input):
     """
 
 
-    qa_chain = RetrievalQA.from_chain_type(llm, retriever=retriever)
-    response = qa_chain.run(prompt_template.format(
+    # Per-category retrieval within a token budget; the template is not used as the query
+    context, report = build_context(vector_store, get_embeddings(), user_input, queries=queries)
+    if plan is not None:
+        context = f"Day plan (keep its days, order and times):\n{skeleton_text(plan)}\n\n{context}"
+    prompt = prompt_template.format(
         budget=user_input["budget"],
         days=user_input["days"],
         to_city=user_input["to_city"],
         from_city=user_input["from_city"],
-        context="{context}"  
-    ))
-
-    return response
+        context=context
+    )
+    record_prompt(report, prompt)
+    with span("llm"):
+        return get_llm().invoke(prompt).content
 
 class TravelRequest(BaseModel):
     from_city: str
@@ -231,7 +170,12 @@ class TravelRequest(BaseModel):
 
 @app.post("/generate-itinerary")
 def generate_itinerary(request: TravelRequest):
-    result = generate_travel_plan(request.model_dump())
+    user_input = request.model_dump()
+    try:
+        check_cities(user_input)
+    except UnknownCity as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    result = itinerary_cache.get_or_generate(user_input, lambda: generate_travel_plan(user_input))
     return {"itinerary": result}
 
 